@@ -16,6 +16,7 @@
         "account_payment_partner",
         "base_facturx",
         "base_vat",
+        "pdf_helper",
     ],
     "external_dependencies": {"python": ["factur-x"]},
     "data": [
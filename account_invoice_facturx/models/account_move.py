@@ -10,6 +10,8 @@ from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.tools import float_compare, float_is_zero, float_round
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -857,7 +859,7 @@ class AccountMove(models.Model):
             root, pretty_print=True, encoding="UTF-8", xml_declaration=True
         )
         logger.debug("Factur-X XML file generated for invoice ID %d", self.id)
-        logger.debug(xml_byte.decode("utf-8"))
+        logger.debug("%s", LazyLogPayload(xml_byte))
         try:
             xml_check_xsd(xml_byte, flavor="factur-x", level=ns["level"])
         except Exception as e:
@@ -10,63 +10,339 @@ The module OCA/edi/account_invoice_import must be installed on Odoo.
 import argparse
 import base64
 import getpass
+import hashlib
+import http.client
 import logging
 import mimetypes
 import os
+import socket
 import sys
+import threading
+import time
+import urllib.error
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import odoorpc
+from odoorpc.error import RPCError
 
 __author__ = "Alexis de Lattre <alexis.delattre@akretion.com>"
 __date__ = "March 2021"
-__version__ = "0.2"
+__version__ = "0.3"
 
-FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+FORMAT = "%(asctime)s [%(levelname)s] %(threadName)s %(message)s"
 logging.basicConfig(format=FORMAT)
-logger = logging.getLogger("add_xivo_user")
+logger = logging.getLogger("mass_invoice_import")
 
-fail_subdir_ok = {}  # key = directory, value: failsubdir or False
-invoice_ids = []
-fail_files = []
+INV_MIME = ["application/xml", "text/xml", "application/pdf"]
+# Network errors. Errors raised by Odoo itself (RPCError) are not retried:
+# the same file would fail the same way.
+TRANSIENT_ERRORS = (OSError, http.client.HTTPException)
+# Network errors raised while connecting: the request has not been sent,
+# it is sent again on a new connection. With the other network errors
+# (timeout, connection reset...), Odoo may have created the invoice:
+# the invoice is looked up before sending the file again.
+CONNECT_ERRORS = (ConnectionRefusedError, socket.gaierror)
+# Invoice ID recorded in the state file when the result of the import
+# is unknown
+UNKNOWN = "unknown"
 
 
-def send_file(odoo, file_path):
+class ImportStats(object):
+    """Results of the import, shared by the workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.invoice_ids = []
+        self.fail_files = []
+        self.fail_reasons = Counter()
+        self.latencies = []
+        self.unknown_files = []
+        self.skipped = 0
+        self.retries = 0
+
+    def add_success(self, invoice_id, latency):
+        with self.lock:
+            self.invoice_ids.append(invoice_id)
+            self.latencies.append(latency)
+
+    def add_failure(self, file_path, reason, latency):
+        with self.lock:
+            self.fail_files.append(file_path)
+            self.fail_reasons[reason] += 1
+            self.latencies.append(latency)
+
+    def add_unknown(self, file_path, latency):
+        with self.lock:
+            self.unknown_files.append(file_path)
+            self.latencies.append(latency)
+
+    def add_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def add_skipped(self):
+        with self.lock:
+            self.skipped += 1
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return 0.0
+        values = sorted(self.latencies)
+        index = min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))
+        return values[index]
+
+    def report(self):
+        duration = time.monotonic() - self.start
+        processed = len(self.invoice_ids) + len(self.fail_files)
+        logger.info(
+            "RESULT: %d invoice%s created in Odoo, %d invoice import failure%s, "
+            "%d file%s skipped (already imported).",
+            len(self.invoice_ids),
+            len(self.invoice_ids) > 1 and "s" or "",
+            len(self.fail_files),
+            len(self.fail_files) > 1 and "s" or "",
+            self.skipped,
+            self.skipped > 1 and "s" or "",
+        )
+        logger.info(
+            "THROUGHPUT: %d file%s in %.1f s (%.2f files/s), %d retr%s. "
+            "Latency: p50=%.2f s, p90=%.2f s, p99=%.2f s, max=%.2f s.",
+            processed,
+            processed > 1 and "s" or "",
+            duration,
+            duration and processed / duration or 0.0,
+            self.retries,
+            self.retries > 1 and "ies" or "y",
+            self.percentile(50),
+            self.percentile(90),
+            self.percentile(99),
+            self.latencies and max(self.latencies) or 0.0,
+        )
+        for reason, count in self.fail_reasons.most_common():
+            logger.info("FAILURE REASON: %d x %s", count, reason)
+        for file_path in self.unknown_files:
+            logger.warning(
+                "UNKNOWN RESULT: %s may have been imported, check in Odoo. "
+                "It will be looked up again at the next run with the same "
+                "state file.",
+                file_path,
+            )
+        logger.debug("IDs of created invoices: %s", self.invoice_ids)
+        logger.debug("Fail invoice imports: %s", self.fail_files)
+
+
+class ImportState(object):
+    """Files already imported, stored in a state file so that the script
+    can be started again on the same directories after an interruption.
+    One line per imported file: <invoice ID> <tab> <absolute path>
+    The invoice ID is "unknown" when a network error occurred after the file
+    was sent and the invoice could not be found: such files are looked up
+    again at the next run."""
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.done = set()
+        self.unknown = set()
+        self.fileobj = None
+        if not state_file:
+            return
+        if os.path.exists(state_file):
+            with open(state_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.rstrip("\n")
+                    if "\t" in line:
+                        invoice_id, path = line.split("\t", 1)
+                        if invoice_id == UNKNOWN:
+                            self.unknown.add(path)
+                        else:
+                            self.done.add(path)
+                            self.unknown.discard(path)
+            logger.info(
+                "%d file(s) already imported according to state file %s",
+                len(self.done),
+                state_file,
+            )
+        self.fileobj = open(state_file, "a", encoding="utf-8")
+
+    def is_done(self, file_path):
+        return os.path.abspath(file_path) in self.done
+
+    def is_unknown(self, file_path):
+        return os.path.abspath(file_path) in self.unknown
+
+    def mark_done(self, file_path, invoice_id):
+        if not self.fileobj:
+            return
+        abs_path = os.path.abspath(file_path)
+        with self.lock:
+            if invoice_id == UNKNOWN:
+                self.unknown.add(abs_path)
+            else:
+                self.done.add(abs_path)
+                self.unknown.discard(abs_path)
+            self.fileobj.write("%s\t%s\n" % (invoice_id, abs_path))
+            self.fileobj.flush()
+
+    def close(self):
+        if self.fileobj:
+            self.fileobj.close()
+
+
+class OdooPool(object):
+    """One odoorpc connection per worker thread"""
+
+    def __init__(self, args, pwd):
+        self.args = args
+        self.pwd = pwd
+        self.local = threading.local()
+
+    def connect(self):
+        args = self.args
+        proto = args.no_ssl and "jsonrpc" or "jsonrpc+ssl"
+        odoo = odoorpc.ODOO(args.server, proto, args.port, timeout=args.timeout)
+        odoo.login(args.database, args.username, self.pwd)
+        return odoo
+
+    def get(self):
+        if getattr(self.local, "odoo", None) is None:
+            self.local.odoo = self.connect()
+        return self.local.odoo
+
+    def discard(self):
+        self.local.odoo = None
+
+
+def is_invoice_file(file_path):
     filename = os.path.basename(file_path)
     filetype = mimetypes.guess_type(filename)
     logger.debug("filetype of file %s=%s", filename, filetype)
-    inv_mime = ["application/xml", "text/xml", "application/pdf"]
-    if filetype and filetype[0] in inv_mime:
-        logger.info("Starting to upload file %s to Odoo", filename)
-        if not os.access(file_path, os.R_OK):
-            logger.error("No read access on file %s. Skipping.", filename)
-            return False
-        with open(file_path, "rb") as f:
-            f.seek(0)
-            invoice = f.read()
-        inv_b64 = base64.encodebytes(invoice)
-        aiio = odoo.env["account.invoice.import"]
+    if not filetype or filetype[0] not in INV_MIME:
+        logger.warning("Filetype of file %s is %s. Skipping.", filename, filetype)
+        return False
+    if not os.access(file_path, os.R_OK):
+        logger.error("No read access on file %s. Skipping.", filename)
+        return False
+    return True
+
+
+def failure_reason(error):
+    """Short description of an error, used to group the failures"""
+    if isinstance(error, RPCError):
+        msg = str(error.args and error.args[0] or error)
+    else:
+        msg = "%s: %s" % (error.__class__.__name__, error)
+    lines = msg.strip().splitlines()
+    return (lines and lines[0] or msg)[:200]
+
+
+def is_connect_error(error):
+    """Check if the error was raised before the request was sent"""
+    if isinstance(error, urllib.error.URLError) and isinstance(error.reason, Exception):
+        error = error.reason
+    return isinstance(error, CONNECT_ERRORS)
+
+
+def find_imported_invoice(odoo, filename, checksum):
+    """Return the ID of the invoice created from the file, if any.
+    The imported file is attached to the invoice."""
+    attachment_obj = odoo.env["ir.attachment"]
+    attachment_ids = attachment_obj.search(
+        [
+            ("res_model", "=", "account.move"),
+            ("name", "=", filename),
+            ("checksum", "=", checksum),
+        ],
+        limit=1,
+    )
+    if not attachment_ids:
+        return False
+    return attachment_obj.read(attachment_ids, ["res_id"])[0]["res_id"]
+
+
+def send_file(pool, args, stats, file_path, lookup_first=False):
+    """Upload a file to Odoo, retrying on network errors.
+
+    When the file may already have been imported (network error after it
+    was sent, or unknown result of a previous run), the invoice is looked
+    up first. If it can't be found after a timeout, the server may still be
+    importing it: the result is unknown and the file is not sent again.
+
+    Returns a tuple (invoice ID or "unknown" or False, failure reason)"""
+    filename = os.path.basename(file_path)
+    logger.info("Starting to upload file %s to Odoo", filename)
+    with open(file_path, "rb") as f:
+        invoice = f.read()
+    checksum = hashlib.sha1(invoice).hexdigest()
+    inv_b64 = base64.encodebytes(invoice).decode("utf8")
+    attempt = 0
+    last_error = None
+    while True:
         try:
+            odoo = pool.get()
+            if lookup_first:
+                invoice_id = find_imported_invoice(odoo, filename, checksum)
+                if invoice_id:
+                    logger.info(
+                        "File %s already imported in invoice ID %d",
+                        filename,
+                        invoice_id,
+                    )
+                    return invoice_id, None
+                if isinstance(last_error, socket.timeout):
+                    logger.warning(
+                        "Timeout on file %s and no invoice found: the import "
+                        "may still be running in Odoo. Not sent again.",
+                        filename,
+                    )
+                    return UNKNOWN, None
+                lookup_first = False
+            aiio = odoo.env["account.invoice.import"]
             invoice_id = aiio.create_invoice_webservice(
-                inv_b64.decode("utf8"), filename, "mass import script"
+                inv_b64, filename, "mass import script"
             )
-            if invoice_id:
-                logger.info("Invoice ID %d successfully created in Odoo", invoice_id)
-                invoice_ids.append(invoice_id)
-                return "success"
-            else:
-                logger.warning("Invoice import failed")
-                fail_files.append(filename)
-                return "failure"
+        except TRANSIENT_ERRORS as e:
+            pool.discard()
+            # If the lookup failed, do it again at the next attempt
+            lookup_first = lookup_first or not is_connect_error(e)
+            if not isinstance(last_error, socket.timeout):
+                last_error = e
+            if attempt >= args.retries:
+                logger.warning(
+                    "Odoo failed to import file %s after %d attempt(s). Reason: %s",
+                    filename,
+                    attempt + 1,
+                    e,
+                )
+                if lookup_first:
+                    return UNKNOWN, None
+                return False, failure_reason(e)
+            delay = args.retry_delay * (2**attempt)
+            attempt += 1
+            stats.add_retry()
+            logger.info(
+                "Network error on file %s (%s). Retry %d/%d in %.1f s",
+                filename,
+                e,
+                attempt,
+                args.retries,
+                delay,
+            )
+            time.sleep(delay)
         except Exception as e:
             logger.warning("Odoo failed to import file %s. Reason: %s", filename, e)
-            fail_files.append(filename)
-            return "failure"
-    else:
-        logger.warning("Filetype of file %s is %s. Skipping.", filename, filetype)
-        return False
+            return False, failure_reason(e)
+        else:
+            if invoice_id:
+                logger.info("Invoice ID %d successfully created in Odoo", invoice_id)
+                return invoice_id, None
+            logger.warning("Invoice import failed")
+            return False, "No invoice created"
 
 
-def update_fail_subdir(directory, fail_subdir):
+def update_fail_subdir(fail_subdir_ok, directory, fail_subdir):
     fail_subdir_ok[directory] = False
     # We need write access on directory not only to create a sub-dir but also
     # to move files out of it
@@ -94,36 +370,102 @@ def update_fail_subdir(directory, fail_subdir):
     return True
 
 
-def handle_failure(directory, entry, file_path):
-    if not args.no_move_failed:
-        if directory not in fail_subdir_ok:
-            update_fail_subdir(directory, args.fail_subdir)
-        fail_dir_path = fail_subdir_ok[directory]
+class FailHandler(object):
+    """Move the files that failed to import to a fail sub-directory"""
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()
+        self.fail_subdir_ok = {}  # key = directory, value: failsubdir or False
+
+    def handle_failure(self, directory, entry, file_path):
+        if self.args.no_move_failed or directory is None:
+            return
+        with self.lock:
+            if directory not in self.fail_subdir_ok:
+                update_fail_subdir(
+                    self.fail_subdir_ok, directory, self.args.fail_subdir
+                )
+            fail_dir_path = self.fail_subdir_ok[directory]
         if fail_dir_path:
             logger.info(
                 "Moving file %s to sub-directory %s",
                 entry,
-                args.fail_subdir,
+                self.args.fail_subdir,
             )
             os.rename(file_path, os.path.join(fail_dir_path, entry))
 
 
-def browse_directory(odoo, directory):
-    if os.path.isdir(directory):
-        logger.info("Start working on directory %s", directory)
-        for entry in os.listdir(directory):
-            file_path = os.path.join(directory, entry)
-            logger.debug("file_path=%s", entry)
-            if not os.path.isfile(file_path):
-                continue
-            res = send_file(odoo, file_path)
-            if res == "failure":
-                handle_failure(directory, entry, file_path)
+def browse_directories(dir_list):
+    """Yield (directory, entry, file_path) for each file to import.
+    directory is None for the files given directly on the command line."""
+    for directory in dir_list:
+        if os.path.isdir(directory):
+            logger.info("Start working on directory %s", directory)
+            for entry in os.listdir(directory):
+                file_path = os.path.join(directory, entry)
+                logger.debug("file_path=%s", entry)
+                if not os.path.isfile(file_path):
+                    continue
+                yield directory, entry, file_path
+        elif os.path.isfile(directory):
+            yield None, os.path.basename(directory), directory
+        else:
+            logger.warning("%s is not a directory nor a file. Skipped." % directory)
+
 
-    elif os.path.isfile(directory):
-        res = send_file(odoo, directory)
+def import_file(pool, args, stats, state, fail_handler, directory, entry, file_path):
+    start = time.monotonic()
+    invoice_id, reason = send_file(
+        pool, args, stats, file_path, lookup_first=state.is_unknown(file_path)
+    )
+    latency = time.monotonic() - start
+    if invoice_id == UNKNOWN:
+        stats.add_unknown(file_path, latency)
+        state.mark_done(file_path, invoice_id)
+    elif invoice_id:
+        stats.add_success(invoice_id, latency)
+        state.mark_done(file_path, invoice_id)
     else:
-        logger.warning("%s is not a directory nor a file. Skipped." % directory)
+        stats.add_failure(file_path, reason, latency)
+        fail_handler.handle_failure(directory, entry, file_path)
+
+
+def run_import(pool, args, stats, state):
+    fail_handler = FailHandler(args)
+    # Bound the number of queued files so that huge directories are not
+    # loaded in memory at once
+    max_pending = args.workers * 4
+    pending = set()
+    with ThreadPoolExecutor(
+        max_workers=args.workers, thread_name_prefix="worker"
+    ) as executor:
+        for directory, entry, file_path in browse_directories(args.dir_list):
+            if state.is_done(file_path):
+                logger.debug("File %s already imported. Skipping.", file_path)
+                stats.add_skipped()
+                continue
+            if not is_invoice_file(file_path):
+                continue
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(
+                executor.submit(
+                    import_file,
+                    pool,
+                    args,
+                    stats,
+                    state,
+                    fail_handler,
+                    directory,
+                    entry,
+                    file_path,
+                )
+            )
+        for future in wait(pending).done:
+            future.result()
 
 
 def main(args):
@@ -144,6 +486,9 @@ def main(args):
                 log_level,
             )
             sys.exit(1)
+    if args.workers < 1:
+        logger.error("The number of workers must be at least 1.")
+        sys.exit(1)
     pwd = args.password
     first_login = True
     while not pwd:
@@ -167,25 +512,22 @@ def main(args):
         args.database,
         args.username,
     )
+    pool = OdooPool(args, pwd)
     try:
-        odoo = odoorpc.ODOO(args.server, proto, args.port)
-        odoo.login(args.database, args.username, pwd)
+        # check the credentials before starting the workers
+        pool.connect()
         logger.info("Successfully connected to Odoo")
     except Exception as e:
         logger.error("Failed to connect to Odoo. Error: %s", e)
         sys.exit(1)
 
-    for directory in args.dir_list:
-        browse_directory(odoo, directory)
-    logger.info(
-        "RESULT: %d invoice%s created in Odoo, %d invoice import failure%s.",
-        len(invoice_ids),
-        len(invoice_ids) > 1 and "s" or "",
-        len(fail_files),
-        len(fail_files) > 1 and "s" or "",
-    )
-    logger.debug("IDs of created invoices: %s", invoice_ids)
-    logger.debug("Fail invoice imports: %s", fail_files)
+    stats = ImportStats()
+    state = ImportState(args.state_file)
+    try:
+        run_import(pool, args, stats, state)
+    finally:
+        state.close()
+        stats.report()
 
 
 if __name__ == "__main__":
@@ -268,6 +610,51 @@ if __name__ == "__main__":
         default="odoo-import_fail",
         help="Fail sub-directory name. Default value: 'odoo-import_fail'.",
     )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="Number of invoices imported in parallel, each worker using "
+        "its own connection to Odoo. Default value: 1.",
+    )
+    parser.add_argument(
+        "-r",
+        "--retries",
+        dest="retries",
+        type=int,
+        default=3,
+        help="Number of retries of a file on network errors. When the error "
+        "occurs after the file was sent, the invoice is looked up before "
+        "sending it again. Default value: 3.",
+    )
+    parser.add_argument(
+        "-b",
+        "--retry-delay",
+        dest="retry_delay",
+        type=float,
+        default=2.0,
+        help="Delay in seconds before the first retry, doubled at each "
+        "retry. Default value: 2.",
+    )
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        dest="timeout",
+        type=int,
+        default=300,
+        help="Timeout in seconds of the requests to Odoo. Default value: 300.",
+    )
+    parser.add_argument(
+        "-f",
+        "--state-file",
+        dest="state_file",
+        type=str,
+        help="File where the imported files are recorded. When the script is "
+        "started again with the same state file, the files already imported "
+        "are skipped.",
+    )
     parser.add_argument(
         "-l",
         "--log-level",
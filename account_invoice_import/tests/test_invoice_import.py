@@ -4,7 +4,9 @@
 # @author: Simone Orsi <simahawk@gmail.com>
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import base64
 import logging
+from types import SimpleNamespace
 from unittest import mock
 
 from odoo import fields
@@ -343,6 +345,117 @@ class TestInvoiceImport(SavepointCase):
                 fields.Date.to_string(inv.invoice_date), parsed_inv["date"]
             )
 
+    def test_update_invoice_lines(self):
+        product2, product3 = self.env["product.product"].create(
+            [
+                {
+                    "name": "Expense product %d" % i,
+                    "default_code": "AII-TEST-PRODUCT-%d" % i,
+                    "supplier_taxes_id": [(6, 0, [self.purchase_tax.id])],
+                    "property_account_expense_id": self.expense_account.id,
+                }
+                for i in (2, 3)
+            ]
+        )
+        invoice = self.env["account.move"].create(
+            {
+                "move_type": "in_invoice",
+                "partner_id": self.env.ref("base.res_partner_1").id,
+                "invoice_date": "2017-08-16",
+                "invoice_line_ids": [
+                    (0, 0, {"product_id": self.product.id, "price_unit": 10}),
+                    (0, 0, {"product_id": product2.id, "price_unit": 5}),
+                ],
+            }
+        )
+        parsed_inv = {
+            "chatter_msg": [],
+            "lines": [
+                {
+                    "product": {"code": "AII-TEST-PRODUCT"},
+                    "qty": 3,
+                    "price_unit": 10,
+                    "uom": {"unece_code": "C62"},
+                },
+                {
+                    "product": {"code": "AII-TEST-PRODUCT-3"},
+                    "qty": 2,
+                    "price_unit": 7,
+                    "uom": {"unece_code": "C62"},
+                },
+            ],
+        }
+        wiz_model = self.env["account.invoice.import"]
+        move_model = type(invoice)
+        with mock.patch.object(
+            move_model, "write", autospec=True, side_effect=move_model.write
+        ) as mocked:
+            wiz_model.update_invoice_lines(parsed_inv, invoice, False)
+        # All the lines are updated with one write on the invoice
+        self.assertEqual(set(mocked.call_args_list[0][0][1]), {"invoice_line_ids"})
+        lines = invoice.invoice_line_ids
+        self.assertEqual(lines.product_id, self.product | product3)
+        self.assertEqual(
+            lines.filtered(lambda x: x.product_id == product3).tax_ids,
+            self.purchase_tax,
+        )
+        self.assertFalse(
+            invoice.currency_id.compare_amounts(invoice.amount_untaxed, 44)
+        )
+        self.assertEqual(len(parsed_inv["chatter_msg"]), 3)
+
+    def test_parsed_invoice_cache(self):
+        wiz_model = self.env["account.invoice.import"]
+        wiz = wiz_model.create(
+            {"invoice_file": base64.b64encode(b"<xml/>"), "invoice_filename": "a.xml"}
+        )
+
+        def fake_parse(invoice_file_b64, invoice_filename, email_from=None):
+            return {
+                "type": "in_invoice",
+                "date": fields.Date.to_date("2017-08-16"),
+                "amount_total": 10.0,
+                "attachments": {
+                    invoice_filename: invoice_file_b64,
+                    "other.pdf": b"%PDF",
+                },
+            }
+
+        with mock.patch.object(
+            type(wiz_model), "parse_invoice", side_effect=fake_parse
+        ) as mocked:
+            parsed_inv = wiz.get_parsed_invoice()
+            # A step updates the parsed invoice, next steps get a fresh copy
+            parsed_inv["partner"] = {"recordset": self.env.user.partner_id}
+            parsed_inv2 = wiz.get_parsed_invoice()
+            self.assertEqual(mocked.call_count, 1)
+            self.assertNotIn("partner", parsed_inv2)
+            self.assertEqual(parsed_inv2["date"], parsed_inv["date"])
+            self.assertEqual(parsed_inv2["attachments"], parsed_inv["attachments"])
+            # Parsed again when the file changes
+            wiz.invoice_file = base64.b64encode(b"<xml2/>")
+            wiz.get_parsed_invoice()
+            self.assertEqual(mocked.call_count, 2)
+
+    def test_parsed_invoice_cache_lossy(self):
+        wiz_model = self.env["account.invoice.import"]
+        wiz = wiz_model.create(
+            {"invoice_file": base64.b64encode(b"<xml/>"), "invoice_filename": "a.xml"}
+        )
+        parsed_inv = {
+            "type": "in_invoice",
+            "lines": [{"taxes": ({"amount": 20.0},)}],
+            "by_tax": {1: 20.0},
+        }
+        with mock.patch.object(
+            type(wiz_model), "parse_invoice", return_value=parsed_inv
+        ) as mocked:
+            self.assertEqual(wiz.get_parsed_invoice(), parsed_inv)
+            # Tuples and integer keys would not be read back as-is: not cached
+            self.assertFalse(wiz.parsed_inv_cache)
+            self.assertEqual(wiz.get_parsed_invoice(), parsed_inv)
+            self.assertEqual(mocked.call_count, 2)
+
     _fake_email = """
 Received: by someone@example.com
 Message-Id: <v0214040cad6a13935723@foo.com>
@@ -364,6 +477,36 @@ Nina
             mail_channel_noautofollow=True
         ).message_process("account.invoice.import", self._fake_email)
 
+    def test_email_attachments_match_partners(self):
+        wiz_model = self.env["account.invoice.import"]
+        partner = self.env["res.partner"].create({"name": "Batch", "ref": "BATCH42"})
+        attachments = [
+            SimpleNamespace(fname="inv1.xml", content="<inv1/>"),
+            SimpleNamespace(fname="inv2.xml", content="<inv2/>"),
+            SimpleNamespace(fname="notes.txt", content="skipped"),
+        ]
+
+        def fake_parse(invoice_file_b64, invoice_filename, email_from=None):
+            return {"partner": {"ref": "BATCH42"}, "chatter_msg": []}
+
+        wiz_class = type(wiz_model)
+        with mock.patch.object(
+            wiz_class, "parse_invoice", side_effect=fake_parse
+        ), mock.patch.object(
+            wiz_class, "_match_partners", wraps=wiz_model._match_partners
+        ) as match_partners, mock.patch.object(
+            wiz_class, "create_invoice_webservice", return_value=1
+        ) as create:
+            wiz_model._import_email_attachments(
+                attachments, "origin", self.env.company.id, "nina@example.com"
+            )
+        # One bulk match for all the invoices of the email
+        self.assertEqual(match_partners.call_count, 1)
+        self.assertEqual(create.call_count, 2)
+        for call in create.call_args_list:
+            parsed_inv = call[1]["parsed_inv"]
+            self.assertEqual(parsed_inv["partner"]["recordset"], partner)
+
     def test_email_gateway_multi_comp_1_matching(self):
         comp = self.env["res.company"].create(
             {
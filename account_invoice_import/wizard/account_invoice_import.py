@@ -4,10 +4,14 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import base64
+import hashlib
 import html
+import json
 import logging
 import mimetypes
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
 from email.utils import parseaddr
 
 from lxml import etree
@@ -17,8 +21,54 @@ from odoo.exceptions import UserError
 from odoo.tools import config, float_compare, float_is_zero, float_round
 from odoo.tools.misc import format_amount
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
+# Compiled etree.XPath objects, keyed on (expression, namespaces).
+# lxml XPath evaluators are not meant to be shared between threads,
+# so each thread of the worker gets its own registry, of the most recently
+# used expressions: the namespaces vary with the senders of the documents.
+_xpath_registry = threading.local()
+_xpath_registry_size = 512
+
+
+def get_compiled_xpath(xpath, namespaces):
+    registry = getattr(_xpath_registry, "xpaths", None)
+    if registry is None:
+        registry = _xpath_registry.xpaths = OrderedDict()
+    key = (xpath, frozenset((namespaces or {}).items()))
+    compiled = registry.get(key)
+    if compiled is None:
+        compiled = registry[key] = etree.XPath(xpath, namespaces=namespaces)
+        if len(registry) > _xpath_registry_size:
+            registry.popitem(last=False)
+    else:
+        registry.move_to_end(key)
+    return compiled
+
+
+def _parsed_inv_json_default(obj):
+    """Encode the values of a parsed invoice that JSON does not support"""
+    if isinstance(obj, datetime):
+        return {"__datetime__": fields.Datetime.to_string(obj)}
+    if isinstance(obj, date):
+        return {"__date__": fields.Date.to_string(obj)}
+    if isinstance(obj, bytes):
+        return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+    raise TypeError("%r is not JSON serializable" % obj)
+
+
+def _parsed_inv_json_hook(obj):
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return fields.Datetime.to_datetime(obj["__datetime__"])
+        if "__date__" in obj:
+            return fields.Date.to_date(obj["__date__"])
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+    return obj
+
 
 class AccountInvoiceImport(models.TransientModel):
     _name = "account.invoice.import"
@@ -58,6 +108,10 @@ class AccountInvoiceImport(models.TransientModel):
         "account.move", string="Draft Supplier Invoice to Update"
     )
     message = fields.Text(readonly=True)
+    # Result of the parsing of the invoice file, reused by the next steps
+    # of the wizard as long as the file does not change
+    parsed_inv_cache = fields.Text(readonly=True)
+    parsed_inv_cache_key = fields.Char(readonly=True)
 
     @api.model
     def default_get(self, fields_list):
@@ -381,6 +435,19 @@ class AccountInvoiceImport(models.TransientModel):
             sproduct = import_config["product"]
             static_vals = {"product_id": sproduct.id, "move_id": vals}
             static_vals = line_model.play_onchanges(static_vals, ["product_id"])
+        if import_config["invoice_line_method"] == "nline_auto_product":
+            # Resolve the products of all the lines at once,
+            # memoized for the loop below
+            self = self._with_match_memo()
+            self._match_products(
+                [
+                    line["product"]
+                    for line in parsed_inv["lines"]
+                    if not line.get("line_note") and not line.get("sectionheader")
+                ],
+                parsed_inv["chatter_msg"],
+                seller=partner,
+            )
         for line in parsed_inv["lines"]:
             il_vals = static_vals.copy()
             if import_config["invoice_line_method"] == "nline_auto_product":
@@ -497,11 +564,10 @@ class AccountInvoiceImport(models.TransientModel):
                 xml_root = etree.fromstring(file_data)
             except Exception as e:
                 raise UserError(_("This XML file is not XML-compliant. Error: %s") % e)
-            pretty_xml_bytes = etree.tostring(
-                xml_root, pretty_print=True, encoding="UTF-8", xml_declaration=True
+            logger.debug(
+                "Starting to import the following XML file:\n%s",
+                LazyLogPayload(xml_root),
             )
-            logger.debug("Starting to import the following XML file:")
-            logger.debug(pretty_xml_bytes.decode("utf-8"))
             parsed_inv = self.parse_xml_invoice(xml_root)
             if parsed_inv is False:
                 raise UserError(
@@ -589,10 +655,9 @@ class AccountInvoiceImport(models.TransientModel):
             line["discount"] = float_round(
                 line.get("discount", 0), precision_digits=prec_disc
             )
-        parsed_inv_for_log = dict(parsed_inv)
-        if "attachments" in parsed_inv_for_log:
-            parsed_inv_for_log.pop("attachments")
-        logger.debug("Result of invoice parsing parsed_inv=%s", parsed_inv_for_log)
+        logger.debug(
+            "Result of invoice parsing parsed_inv=%s", LazyLogPayload(parsed_inv)
+        )
         # the 'company' dict in parsed_inv is NOT used to auto-detect
         # the company, but to check that we are not importing an
         # invoice for another company by mistake
@@ -654,7 +719,46 @@ class AccountInvoiceImport(models.TransientModel):
 
     def get_parsed_invoice(self):
         """Hook to change the method of retrieval for the invoice data"""
-        return self.parse_invoice(self.invoice_file, self.invoice_filename)
+        key = self._get_parsed_inv_cache_key()
+        if key and self.parsed_inv_cache and self.parsed_inv_cache_key == key:
+            return self._load_parsed_inv_cache()
+        parsed_inv = self.parse_invoice(self.invoice_file, self.invoice_filename)
+        if key:
+            self._store_parsed_inv_cache(key, parsed_inv)
+        return parsed_inv
+
+    def _get_parsed_inv_cache_key(self):
+        """Checksum of the file and of what the parsing depends on"""
+        if not self.invoice_file:
+            return False
+        checksum = hashlib.sha1(self.invoice_file).hexdigest()
+        return "{}-{}-{}".format(
+            checksum, self.env.company.id, self.invoice_filename or ""
+        )
+
+    def _store_parsed_inv_cache(self, key, parsed_inv):
+        # The invoice file is already on the wizard, don't store it twice
+        attachments = dict(parsed_inv.get("attachments") or {})
+        attachments.pop(self.invoice_filename, None)
+        to_store = dict(parsed_inv, attachments=attachments)
+        try:
+            data = json.dumps(to_store, default=_parsed_inv_json_default)
+        except (TypeError, ValueError) as e:
+            logger.debug("Parsed invoice not cached: %s", e)
+            return
+        # JSON has no tuples nor integer keys: only cache what is read back as-is
+        if json.loads(data, object_hook=_parsed_inv_json_hook) != to_store:
+            logger.debug("Parsed invoice not cached: not read back unchanged")
+            return
+        self.write({"parsed_inv_cache": data, "parsed_inv_cache_key": key})
+
+    def _load_parsed_inv_cache(self):
+        logger.info("Reusing the parsing of invoice %s", self.invoice_filename)
+        parsed_inv = json.loads(
+            self.parsed_inv_cache, object_hook=_parsed_inv_json_hook
+        )
+        parsed_inv["attachments"][self.invoice_filename] = self.invoice_file
+        return parsed_inv
 
     def goto_partner_not_found(self, parsed_inv, error_message):
         """Hook designed to add an action when no partner is found
@@ -925,6 +1029,7 @@ class AccountInvoiceImport(models.TransientModel):
 
     @api.model
     def create_invoice(self, parsed_inv, import_config=False, origin=None):
+        self = self._with_match_memo()
         amo = self.env["account.move"]
         parsed_inv = self.pre_process_parsed_inv(parsed_inv)
         vals = self._prepare_create_invoice_vals(parsed_inv, import_config)
@@ -950,7 +1055,12 @@ class AccountInvoiceImport(models.TransientModel):
         origin,
         company_id=None,
         email_from=None,
+        parsed_inv=None,
     ):
+        """Import an invoice file without user interaction.
+
+        :param parsed_inv: the invoice file already parsed, if any
+        """
         # for invoice_file_b64, we accept it as bytes AND str
         # to avoid "Object of type bytes is not JSON serializable"
         assert invoice_file_b64
@@ -966,9 +1076,10 @@ class AccountInvoiceImport(models.TransientModel):
             invoice_filename,
             company_id,
         )
-        parsed_inv = self.parse_invoice(
-            invoice_file_b64, invoice_filename, email_from=email_from
-        )
+        if parsed_inv is None:
+            parsed_inv = self.parse_invoice(
+                invoice_file_b64, invoice_filename, email_from=email_from
+            )
         partner = self._match_partner(
             parsed_inv["partner"], parsed_inv["chatter_msg"], raise_exception=False
         )
@@ -1239,7 +1350,6 @@ class AccountInvoiceImport(models.TransientModel):
 
     def update_invoice_lines(self, parsed_inv, invoice, seller):
         chatter = parsed_inv["chatter_msg"]
-        amlo = self.env["account.move.line"]
         qty_prec = self.env["decimal.precision"].precision_get(
             "Product Unit of Measure"
         )
@@ -1263,6 +1373,9 @@ class AccountInvoiceImport(models.TransientModel):
         )
         if not compare_res:
             return
+        # All the changes are applied with one write on the invoice,
+        # so that the invoice is recomputed once
+        line_commands = []
         for eline, cdict in list(compare_res["to_update"].items()):
             write_vals = {}
             if cdict.get("qty"):
@@ -1294,7 +1407,7 @@ class AccountInvoiceImport(models.TransientModel):
                 )
                 write_vals["price_unit"] = cdict["price_unit"][1]
             if write_vals:
-                eline.write(write_vals)
+                line_commands.append((1, eline.id, write_vals))
         if compare_res["to_remove"]:
             to_remove_label = [
                 "{} {} x {}".format(
@@ -1306,44 +1419,73 @@ class AccountInvoiceImport(models.TransientModel):
                 _("%d invoice line(s) deleted: %s")
                 % (len(compare_res["to_remove"]), ", ".join(to_remove_label))
             )
-            compare_res["to_remove"].unlink()
+            line_commands += [(2, line.id) for line in compare_res["to_remove"]]
         if compare_res["to_add"]:
-            to_create_label = []
-            for add in compare_res["to_add"]:
-                line_vals = self._prepare_create_invoice_line(
-                    add["product"], add["uom"], add["import_line"], invoice
-                )
-                new_line = amlo.create(line_vals)
-                to_create_label.append(
-                    "%s %s x %s"
-                    % (new_line.quantity, new_line.product_uom_id.name, new_line.name)
+            lines_vals = self._prepare_create_invoice_lines(
+                [
+                    (add["product"], add["uom"], add["import_line"])
+                    for add in compare_res["to_add"]
+                ],
+                invoice,
+            )
+            uom_model = self.env["uom.uom"]
+            to_create_label = [
+                "%s %s x %s"
+                % (
+                    vals["quantity"],
+                    uom_model.browse(vals.get("product_uom_id")).name,
+                    vals.get("name"),
                 )
+                for vals in lines_vals
+            ]
+            for vals in lines_vals:
+                vals.pop("move_id", None)
+                line_commands.append((0, 0, vals))
             chatter.append(
                 _("%d new invoice line(s) created: %s")
                 % (len(compare_res["to_add"]), ", ".join(to_create_label))
             )
-        invoice.compute_taxes()
+        if line_commands:
+            # The taxes are recomputed by the write
+            invoice.write({"invoice_line_ids": line_commands})
         return True
 
     @api.model
     def _prepare_create_invoice_line(self, product, uom, import_line, invoice):
-        new_line = self.env["account.move.line"].new(
-            {"move_id": invoice, "qty": import_line["qty"], "product_id": product}
-        )
-        new_line._onchange_product_id()
-        vals = {
-            f: new_line._fields[f].convert_to_write(new_line[f], new_line)
-            for f in new_line._cache
-        }
-        vals.update(
-            {
-                "product_id": product.id,
-                "price_unit": import_line.get("price_unit"),
-                "quantity": import_line["qty"],
-                "move_id": invoice.id,
+        return self._prepare_create_invoice_lines(
+            [(product, uom, import_line)], invoice
+        )[0]
+
+    @api.model
+    def _prepare_create_invoice_lines(self, lines, invoice):
+        """Return the values of the invoice lines to create.
+
+        The product onchange is played once for all the lines.
+
+        :param lines: list of (product, uom, import_line)
+        """
+        new_lines = self.env["account.move.line"]
+        for product, __, import_line in lines:
+            new_lines |= new_lines.new(
+                {"move_id": invoice, "qty": import_line["qty"], "product_id": product}
+            )
+        new_lines._onchange_product_id()
+        lines_vals = []
+        for new_line, (product, __, import_line) in zip(new_lines, lines):
+            vals = {
+                f: new_line._fields[f].convert_to_write(new_line[f], new_line)
+                for f in new_line._cache
             }
-        )
-        return vals
+            vals.update(
+                {
+                    "product_id": product.id,
+                    "price_unit": import_line.get("price_unit"),
+                    "quantity": import_line["qty"],
+                    "move_id": invoice.id,
+                }
+            )
+            lines_vals.append(vals)
+        return lines_vals
 
     @api.model
     def _prepare_update_invoice_vals(self, parsed_inv, invoice):
@@ -1458,12 +1600,17 @@ class AccountInvoiceImport(models.TransientModel):
         return xpath_dict
         # TODO: think about blocking required fields
 
+    def xpath_helper(self, xml_root, xpath, namespaces):
+        """Same as xml_root.xpath(xpath, namespaces=namespaces) but the
+        expression is only compiled once and then reused for all the nodes"""
+        return get_compiled_xpath(xpath, namespaces)(xml_root)
+
     def multi_xpath_helper(
         self, xml_root, xpath_list, namespaces, isdate=False, isfloat=False
     ):
         assert isinstance(xpath_list, list)
         for xpath in xpath_list:
-            xpath_res = xml_root.xpath(xpath, namespaces=namespaces)
+            xpath_res = self.xpath_helper(xml_root, xpath, namespaces)
             if xpath_res and xpath_res[0].text:
                 if isdate:
                     if (
@@ -1483,7 +1630,7 @@ class AccountInvoiceImport(models.TransientModel):
 
     def raw_multi_xpath_helper(self, xml_root, xpath_list, namespaces):
         for xpath in xpath_list:
-            xpath_res = xml_root.xpath(xpath, namespaces=namespaces)
+            xpath_res = self.xpath_helper(xml_root, xpath, namespaces)
             if xpath_res:
                 return xpath_res
         return []
@@ -1557,57 +1704,100 @@ class AccountInvoiceImport(models.TransientModel):
 
         self = self.with_company(company_id)
         if msg_dict.get("attachments"):
-            i = 0
-            for attach in msg_dict["attachments"]:
-                i += 1
-                filename = attach.fname
-                filetype = mimetypes.guess_type(filename)
-                if filetype[0] not in (
-                    "application/xml",
-                    "text/xml",
-                    "application/pdf",
-                ):
-                    logger.info(
-                        "Attachment %d: %s skipped because not an XML nor PDF.",
-                        i,
-                        filename,
-                    )
-                    continue
+            origin = _("email sent by <b>%s</b> on %s with subject <b>%s</b>") % (
+                msg_dict.get("email_from") and html.escape(msg_dict["email_from"]),
+                msg_dict.get("date"),
+                msg_dict.get("subject") and html.escape(msg_dict["subject"]),
+            )
+            self._import_email_attachments(
+                msg_dict["attachments"], origin, company_id, msg_dict.get("email_from")
+            )
+        else:
+            logger.info("The email has no attachments, skipped.")
+        return self.create({})
+
+    @api.model
+    def _import_email_attachments(self, attachments, origin, company_id, email_from):
+        """Import the invoices attached to an email.
+
+        The partners of all the invoices are matched at once.
+        """
+        to_import = []
+        i = 0
+        for attach in attachments:
+            i += 1
+            filename = attach.fname
+            filetype = mimetypes.guess_type(filename)
+            if filetype[0] not in (
+                "application/xml",
+                "text/xml",
+                "application/pdf",
+            ):
                 logger.info(
-                    "Attachment %d: %s. Trying to import it as an invoice",
+                    "Attachment %d: %s skipped because not an XML nor PDF.",
                     i,
                     filename,
                 )
-                # if it's an XML file, attach.content is a string
-                # if it's a PDF file, attach.content is a byte !
-                if isinstance(attach.content, str):
-                    attach_bytes = attach.content.encode("utf-8")
-                else:
-                    attach_bytes = attach.content
-                origin = _("email sent by <b>%s</b> on %s with subject <b>%s</b>") % (
-                    msg_dict.get("email_from") and html.escape(msg_dict["email_from"]),
-                    msg_dict.get("date"),
-                    msg_dict.get("subject") and html.escape(msg_dict["subject"]),
+                continue
+            logger.info(
+                "Attachment %d: %s. Trying to import it as an invoice",
+                i,
+                filename,
+            )
+            # if it's an XML file, attach.content is a string
+            # if it's a PDF file, attach.content is a byte !
+            if isinstance(attach.content, str):
+                attach_bytes = attach.content.encode("utf-8")
+            else:
+                attach_bytes = attach.content
+            invoice_file_b64 = base64.b64encode(attach_bytes)
+            try:
+                parsed_inv = self.parse_invoice(
+                    invoice_file_b64,
+                    filename,
+                    email_from=email_from,
+                )
+            except Exception as e:
+                logger.error(
+                    "Failed to import invoice from mail attachment %s. Error: %s",
+                    filename,
+                    e,
+                )
+                continue
+            to_import.append((filename, invoice_file_b64, parsed_inv))
+        # Match the partners of all the invoices at once,
+        # create_invoice_webservice() matches the others one by one
+        try:
+            partners = self._match_partners(
+                [p_inv.get("partner") or {} for __, __, p_inv in to_import],
+                [p_inv["chatter_msg"] for __, __, p_inv in to_import],
+                raise_exception=False,
+            )
+        except Exception as e:
+            logger.error("Failed to match the partners of the invoices: %s", e)
+            partners = [None] * len(to_import)
+        for (filename, invoice_file_b64, parsed_inv), partner in zip(
+            to_import, partners
+        ):
+            if partner:
+                parsed_inv["partner"]["recordset"] = partner
+            try:
+                invoice_id = self.create_invoice_webservice(
+                    invoice_file_b64,
+                    filename,
+                    origin,
+                    company_id=company_id,
+                    email_from=email_from,
+                    parsed_inv=parsed_inv,
+                )
+                logger.info(
+                    "Invoice ID %d created from email attachment %s.",
+                    invoice_id,
+                    filename,
+                )
+            except Exception as e:
+                logger.error(
+                    "Failed to import invoice from mail attachment %s. Error: %s",
+                    filename,
+                    e,
                 )
-                try:
-                    invoice_id = self.create_invoice_webservice(
-                        base64.b64encode(attach_bytes),
-                        filename,
-                        origin,
-                        company_id=company_id,
-                        email_from=msg_dict.get("email_from"),
-                    )
-                    logger.info(
-                        "Invoice ID %d created from email attachment %s.",
-                        invoice_id,
-                        filename,
-                    )
-                except Exception as e:
-                    logger.error(
-                        "Failed to import invoice from mail attachment %s. Error: %s",
-                        filename,
-                        e,
-                    )
-        else:
-            logger.info("The email has no attachments, skipped.")
-        return self.create({})
@@ -3,11 +3,24 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import base64
+import copy
+import logging
+import time
+
+import mock
+from lxml import etree
 
 from odoo import fields
-from odoo.tests.common import TransactionCase
+from odoo.tests.common import TransactionCase, tagged
 from odoo.tools import file_open, float_compare, mute_logger
 
+from odoo.addons.account_invoice_import.wizard.account_invoice_import import (
+    _xpath_registry,
+    get_compiled_xpath,
+)
+
+logger = logging.getLogger(__name__)
+
 
 class TestFacturx(TransactionCase):
     @mute_logger(
@@ -223,3 +236,86 @@ class TestFacturx(TransactionCase):
             )
             # Delete because several sample invoices have the same number
             invoices.unlink()
+
+    def test_parse_facturx_lines_compiled_xpath(self):
+        """The XPath expressions are compiled once and give the same results"""
+        with file_open(
+            "account_invoice_import_facturx/tests/files/"
+            "ZUGFeRD_1p0_COMFORT_Einfach.pdf-ZUGFeRD-invoice.xml",
+            "rb",
+        ) as f:
+            xml_root = etree.fromstring(f.read())
+        namespaces = xml_root.nsmap
+        aiio = self.env["account.invoice.import"]
+        xpath = "//ram:IncludedSupplyChainTradeLineItem"
+        ilines = aiio.raw_multi_xpath_helper(xml_root, [xpath], namespaces)
+        self.assertEqual(ilines, xml_root.xpath(xpath, namespaces=namespaces))
+        compiled = get_compiled_xpath(xpath, namespaces)
+        self.assertIs(get_compiled_xpath(xpath, dict(namespaces)), compiled)
+        self.assertIsNot(get_compiled_xpath(xpath, {"ram": "urn:other"}), compiled)
+
+        def parse_lines():
+            ac_qty_dict = {"charges": 1, "allowances": -1}
+            counters = {"allowances": 0.0, "charges": 0.0, "lines": 0.0}
+            return [
+                aiio.parse_facturx_invoice_line(
+                    iline, [], ac_qty_dict, counters, namespaces
+                )
+                for iline in ilines
+            ]
+
+        res = parse_lines()
+        # Same result with the expressions compiled again
+        _xpath_registry.xpaths = None
+        self.assertEqual(parse_lines(), res)
+
+
+@tagged("-standard", "perf")
+class TestFacturxPerformance(TransactionCase):
+    def test_parse_facturx_lines_benchmark(self):
+        """Parse a 500-line invoice with and without the compiled XPath registry"""
+        with file_open(
+            "account_invoice_import_facturx/tests/files/"
+            "ZUGFeRD_1p0_COMFORT_Einfach.pdf-ZUGFeRD-invoice.xml",
+            "rb",
+        ) as f:
+            xml_root = etree.fromstring(f.read())
+        namespaces = xml_root.nsmap
+        aiio = self.env["account.invoice.import"]
+        xpath = "//ram:IncludedSupplyChainTradeLineItem"
+        ilines = aiio.raw_multi_xpath_helper(xml_root, [xpath], namespaces)
+        parent = ilines[0].getparent()
+        for i in range(500 - len(ilines)):
+            parent.append(copy.deepcopy(ilines[i % len(ilines)]))
+        ilines = aiio.raw_multi_xpath_helper(xml_root, [xpath], namespaces)
+        self.assertEqual(len(ilines), 500)
+
+        def parse_lines():
+            ac_qty_dict = {"charges": 1, "allowances": -1}
+            counters = {"allowances": 0.0, "charges": 0.0, "lines": 0.0}
+            start = time.perf_counter()
+            for iline in ilines:
+                aiio.parse_facturx_invoice_line(
+                    iline, [], ac_qty_dict, counters, namespaces
+                )
+            return time.perf_counter() - start
+
+        # Warm up the registry
+        parse_lines()
+        registry_duration = parse_lines()
+        # An empty registry: each expression is compiled at each use
+        with mock.patch(
+            "odoo.addons.account_invoice_import.wizard.account_invoice_import"
+            "._xpath_registry_size",
+            0,
+        ):
+            _xpath_registry.xpaths = None
+            compiled_duration = parse_lines()
+        _xpath_registry.xpaths = None
+        logger.info(
+            "Parsed 500 Factur-X lines in %.3fs with the compiled XPath registry, "
+            "%.3fs compiling the expressions at each use",
+            registry_duration,
+            compiled_duration,
+        )
+        self.assertLess(registry_duration, compiled_duration)
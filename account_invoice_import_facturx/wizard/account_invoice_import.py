@@ -8,6 +8,8 @@ from odoo import _, api, models
 from odoo.exceptions import UserError
 from odoo.tools import float_compare, float_is_zero
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 try:
@@ -269,11 +271,12 @@ class AccountInvoiceImport(models.TransientModel):
             ],
         }
         vals = self.xpath_to_dict_helper(iline, xpath_dict, namespaces)
-        price_unit_xpath = iline.xpath(
+        price_unit_xpath = self.xpath_helper(
+            iline,
             "ram:SpecifiedSupplyChainTradeAgreement"
             "/ram:NetPriceProductTradePrice"
             "/ram:ChargeAmount",
-            namespaces=namespaces,
+            namespaces,
         )
         qty_xpath_list = [
             "ram:SpecifiedLineTradeDelivery/ram:BilledQuantity",  # Factur-X
@@ -653,5 +656,5 @@ class AccountInvoiceImport(models.TransientModel):
             res["partner"].pop("vat")
             if not res["partner"].get("email"):
                 res["partner"]["name"] = "Lieferant GmbH"
-        logger.info("Result of Factur-X XML parsing: %s", res)
+        logger.info("Result of Factur-X XML parsing: %s", LazyLogPayload(res))
         return res
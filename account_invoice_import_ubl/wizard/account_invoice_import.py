@@ -11,6 +11,8 @@ from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 from odoo.tools import float_compare
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,10 +50,10 @@ class AccountInvoiceImport(models.TransientModel):
         return attachments
 
     def parse_ubl_invoice_line(self, iline, counters, namespaces):
-        price_unit_xpath = iline.xpath(
-            "cac:Price/cbc:PriceAmount", namespaces=namespaces
+        price_unit_xpath = self.xpath_helper(
+            iline, "cac:Price/cbc:PriceAmount", namespaces
         )
-        qty_xpath = iline.xpath("cbc:InvoicedQuantity", namespaces=namespaces)
+        qty_xpath = self.xpath_helper(iline, "cbc:InvoicedQuantity", namespaces)
         # Some UBL invoices don't have any InvoicedQuantity tag
         # So we have a fallback on quantity = 1
         qty = 1
@@ -65,10 +67,10 @@ class AccountInvoiceImport(models.TransientModel):
                     unece_uom = "C62"
                 uom = {"unece_code": unece_uom}
         product_dict = self.ubl_parse_product(iline, namespaces)
-        name_xpath = iline.xpath("cac:Item/cbc:Description", namespaces=namespaces)
+        name_xpath = self.xpath_helper(iline, "cac:Item/cbc:Description", namespaces)
         name = name_xpath and name_xpath[0].text or "-"
-        price_subtotal_xpath = iline.xpath(
-            "cbc:LineExtensionAmount", namespaces=namespaces
+        price_subtotal_xpath = self.xpath_helper(
+            iline, "cbc:LineExtensionAmount", namespaces
         )
         price_subtotal = float(price_subtotal_xpath[0].text)
         if not price_subtotal:
@@ -78,27 +80,27 @@ class AccountInvoiceImport(models.TransientModel):
         else:
             price_unit = price_subtotal / qty
         counters["lines"] += price_subtotal
-        taxes_xpath = iline.xpath(
-            "cac:Item/cac:ClassifiedTaxCategory", namespaces=namespaces
+        taxes_xpath = self.xpath_helper(
+            iline, "cac:Item/cac:ClassifiedTaxCategory", namespaces
         )
         if not taxes_xpath:
-            taxes_xpath = iline.xpath(
-                "cac:TaxTotal/cac:TaxSubtotal/cac:TaxCategory", namespaces=namespaces
+            taxes_xpath = self.xpath_helper(
+                iline, "cac:TaxTotal/cac:TaxSubtotal/cac:TaxCategory", namespaces
             )
         taxes = []
         for tax in taxes_xpath:
-            type_code_xpath = tax.xpath(
-                "cac:TaxScheme/cbc:ID[@schemeAgencyID='6']", namespaces=namespaces
+            type_code_xpath = self.xpath_helper(
+                tax, "cac:TaxScheme/cbc:ID[@schemeAgencyID='6']", namespaces
             )
             type_code = type_code_xpath and type_code_xpath[0].text or "VAT"
-            categ_code_xpath = tax.xpath("cbc:ID", namespaces=namespaces)
+            categ_code_xpath = self.xpath_helper(tax, "cbc:ID", namespaces)
             # TODO: Understand why sometimes they use H
             categ_code = categ_code_xpath and categ_code_xpath[0].text or False
             if categ_code == "H":
                 categ_code = "S"
-            percent_xpath = tax.xpath("cbc:Percent", namespaces=namespaces)
+            percent_xpath = self.xpath_helper(tax, "cbc:Percent", namespaces)
             if not percent_xpath:
-                percent_xpath = tax.xpath("../cbc:Percent", namespaces=namespaces)
+                percent_xpath = self.xpath_helper(tax, "../cbc:Percent", namespaces)
             if percent_xpath:
                 percentage = percent_xpath[0].text and float(percent_xpath[0].text)
             else:
@@ -271,5 +273,5 @@ class AccountInvoiceImport(models.TransientModel):
         # and invalid IBAN
         if res["iban"] == "NL23ABNA0123456789":
             res.pop("iban")
-        logger.info("Result of UBL XML parsing: %s", res)
+        logger.info("Result of UBL XML parsing: %s", LazyLogPayload(res))
         return res
@@ -11,6 +11,8 @@ from lxml import etree
 from odoo import fields, models
 from odoo.tools import float_is_zero, float_round
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 
@@ -106,14 +108,21 @@ class AccountMove(models.Model):
                 mimeCode="application/pdf",
                 filename=filename,
             )
-            ctx = dict()
-            ctx["no_embedded_ubl_xml"] = True
-            ctx["force_report_rendering"] = True
-            pdf_inv = (
-                self.with_context(ctx)
-                .env.ref("account.account_invoices")
-                ._render_qweb_pdf(self.ids)[0]
+            # When we come from the rendering of the invoice PDF,
+            # reuse the PDF that is being rendered instead of rendering it again
+            report = self.env.ref("account.account_invoices")
+            cache = self._get_ubl_render_cache()
+            cache_key = self._get_ubl_render_cache_key(
+                "pdf", report_name=report.report_name
             )
+            pdf_inv = cache.get(cache_key) if cache is not None else None
+            if pdf_inv is None:
+                ctx = dict()
+                ctx["no_embedded_ubl_xml"] = True
+                ctx["force_report_rendering"] = True
+                if cache is not None:
+                    ctx["ubl_render_cache"] = cache
+                pdf_inv = report.with_context(ctx)._render_qweb_pdf(self.ids)[0]
             binary_node.text = base64.b64encode(pdf_inv)
 
     def _ubl_add_legal_monetary_total(self, parent_node, ns, version="2.1"):
@@ -348,7 +357,7 @@ class AccountMove(models.Model):
             self.id,
             self.state,
         )
-        logger.debug(xml_string.decode("utf-8"))
+        logger.debug("%s", LazyLogPayload(xml_string))
         return xml_string
 
     def get_ubl_filename(self, version="2.1"):
@@ -362,12 +371,42 @@ class AccountMove(models.Model):
         self.ensure_one()
         return self.partner_id.lang or "en_US"
 
+    def _get_ubl_render_cache(self):
+        """Return the cache of the current PDF rendering, if any.
+
+        It is set by ir.actions.report for the whole rendering, to generate
+        the UBL XML file and the PDF file only once per invoice.
+        """
+        return self.env.context.get("ubl_render_cache")
+
+    def _get_ubl_render_cache_key(self, kind, version=None, report_name=None):
+        self.ensure_one()
+        return (kind, self.id, self.write_date, version, report_name)
+
+    def _get_ubl_xml_string_for_pdf(self, version="2.1"):
+        cache = self._get_ubl_render_cache()
+        if cache is None:
+            return self.generate_ubl_xml_string(version=version)
+        cache_key = self._get_ubl_render_cache_key("xml", version=version)
+        if cache_key not in cache:
+            cache[cache_key] = self.generate_ubl_xml_string(version=version)
+        return cache[cache_key]
+
     def add_xml_in_pdf_buffer(self, buffer):
         self.ensure_one()
         if self.is_ubl_sale_invoice_posted():
             version = self.get_ubl_version()
             xml_filename = self.get_ubl_filename(version=version)
-            xml_string = self.generate_ubl_xml_string(version=version)
+            cache = self._get_ubl_render_cache()
+            if cache is not None:
+                # The PDF without XML, reused if it must be embedded in the XML
+                # (only the invoice report is embedded, see _ubl_add_attachments)
+                report_name = self.env.context.get("ubl_render_report_name")
+                cache_key = self._get_ubl_render_cache_key(
+                    "pdf", report_name=report_name
+                )
+                cache[cache_key] = buffer.getvalue()
+            xml_string = self._get_ubl_xml_string_for_pdf(version=version)
             buffer = self._ubl_add_xml_in_pdf_buffer(xml_string, xml_filename, buffer)
         return buffer
 
@@ -376,7 +415,7 @@ class AccountMove(models.Model):
         if self.is_ubl_sale_invoice_posted():
             version = self.get_ubl_version()
             xml_filename = self.get_ubl_filename(version=version)
-            xml_string = self.generate_ubl_xml_string(version=version)
+            xml_string = self._get_ubl_xml_string_for_pdf(version=version)
             pdf_content = self.embed_xml_in_pdf(
                 xml_string, xml_filename, pdf_content=pdf_content
             )
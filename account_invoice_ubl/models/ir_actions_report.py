@@ -9,9 +9,18 @@ from odoo import models
 class IrActionsReport(models.Model):
     _inherit = "ir.actions.report"
 
+    def _render_qweb_pdf(self, res_ids=None, data=None):
+        if self.model == "account.move" and "ubl_render_cache" not in self.env.context:
+            # Share the generated UBL XML files between postprocess_pdf_report
+            # and _post_pdf for the whole rendering
+            self = self.with_context(ubl_render_cache={})
+        return super()._render_qweb_pdf(res_ids=res_ids, data=data)
+
     def postprocess_pdf_report(self, record, buffer):
         if self.is_ubl_xml_to_embed_in_invoice():
-            buffer = record.add_xml_in_pdf_buffer(buffer)
+            buffer = record.with_context(
+                ubl_render_report_name=self.report_name
+            ).add_xml_in_pdf_buffer(buffer)
         return super().postprocess_pdf_report(record, buffer)
 
     def _post_pdf(self, save_in_attachment, pdf_content=None, res_ids=None):
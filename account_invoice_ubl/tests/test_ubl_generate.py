@@ -3,6 +3,8 @@
 # Copyright 2019 Onestein (<https://www.onestein.eu>)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from unittest import mock
+
 from odoo.tests.common import HttpSavepointCase, tagged
 from odoo.tools import mute_logger
 
@@ -40,6 +42,56 @@ class TestUblInvoice(HttpSavepointCase, TestUblInvoiceMixin):
             invoice_filename = invoice.get_ubl_filename(version=version)
             self.assertTrue(invoice_filename in res)
 
+    @mute_logger("werkzeug")
+    def test_ubl_generate_once_per_rendering(self):
+        invoice = self._create_invoice()
+        invoice.company_id.xml_format_in_pdf_invoice = "ubl"
+        invoice.company_id.embed_pdf_in_ubl_xml_invoice = True
+        report = self.env.ref("account.account_invoices")
+        move_class = type(self.env["account.move"])
+        with mock.patch.object(
+            move_class,
+            "generate_ubl_xml_string",
+            autospec=True,
+            side_effect=move_class.generate_ubl_xml_string,
+        ) as mocked_xml, mock.patch.object(
+            type(report),
+            "_render_qweb_pdf",
+            autospec=True,
+            side_effect=type(report)._render_qweb_pdf,
+        ) as mocked_pdf:
+            pdf_file = report.with_context(
+                force_report_rendering=True
+            )._render_qweb_pdf(invoice.ids)[0]
+        self.assertEqual(mocked_xml.call_count, 1)
+        # No additional rendering of the PDF to embed it in the XML
+        self.assertEqual(mocked_pdf.call_count, 1)
+        res = self.env["base.ubl"].get_xml_files_from_pdf(pdf_file)
+        self.assertIn(invoice.get_ubl_filename(), res)
+
+    @mute_logger("werkzeug")
+    def test_ubl_generate_other_report(self):
+        invoice = self._create_invoice()
+        invoice.company_id.xml_format_in_pdf_invoice = "ubl"
+        invoice.company_id.embed_pdf_in_ubl_xml_invoice = True
+        report = self.env.ref("account.account_invoices_without_payment")
+        report_class = type(report)
+        with mock.patch.object(
+            report_class,
+            "_render_qweb_pdf",
+            autospec=True,
+            side_effect=report_class._render_qweb_pdf,
+        ) as mocked_pdf:
+            report.with_context(force_report_rendering=True)._render_qweb_pdf(
+                invoice.ids
+            )
+        # The PDF embedded in the XML is always the invoice report
+        self.assertEqual(mocked_pdf.call_count, 2)
+        self.assertEqual(
+            mocked_pdf.call_args_list[1][0][0],
+            self.env.ref("account.account_invoices"),
+        )
+
     @mute_logger("werkzeug")
     def test_attach_ubl_xml_file_button(self):
         invoice = self._create_invoice()
@@ -1 +1,6 @@
 from . import business_document_import
+from . import business_document_import_speed_dict_mixin
+from . import res_partner
+from . import account_tax
+from . import res_currency
+from . import uom_uom
@@ -0,0 +1,11 @@
+# Copyright 2015-2021 Akretion France
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class AccountTax(models.Model):
+    _name = "account.tax"
+    _inherit = ["account.tax", "business.document.import.speed.dict.mixin"]
+
+    _speed_dict_fields = ("active", "company_id", "amount_type", "sequence")
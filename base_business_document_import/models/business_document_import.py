@@ -3,11 +3,14 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+from collections import defaultdict
 from urllib.parse import urlparse
 
-from odoo import _, api, models
+from odoo import _, api, models, tools
 from odoo.exceptions import UserError
-from odoo.tools import float_compare
+from odoo.osv import expression
+from odoo.tools import email_normalize, float_compare, split_every
+from odoo.tools.sql import escape_psql
 
 from odoo.addons.base_iban.models.res_partner_bank import validate_iban
 
@@ -161,9 +164,10 @@ class BusinessDocumentImport(models.AbstractModel):
     @api.model
     def _match_partner_contact(self, partner_dict, chatter_msg, domain, order):
         rpo = self.env["res.partner"]
-        if partner_dict.get("email") and "@" in partner_dict["email"]:
+        email = self._get_partner_match_keys(partner_dict)["email"]
+        if email:
             partner = rpo.search(
-                domain + [("email", "=ilike", partner_dict["email"])],
+                domain + [("email_normalized", "=", email)],
                 limit=1,
                 order=order,
             )
@@ -171,7 +175,7 @@ class BusinessDocumentImport(models.AbstractModel):
                 return partner
         if partner_dict.get("contact"):
             partner = rpo.search(
-                domain + [("name", "=ilike", partner_dict["contact"])],
+                domain + [("name", "=ilike", escape_psql(partner_dict["contact"]))],
                 limit=1,
                 order=order,
             )
@@ -196,7 +200,7 @@ class BusinessDocumentImport(models.AbstractModel):
     def _match_partner_name(self, partner_dict, chatter_msg, domain, order):
         if partner_dict.get("name"):
             return self.env["res.partner"].search(
-                domain + [("name", "=ilike", partner_dict["name"])],
+                domain + [("name", "=ilike", escape_psql(partner_dict["name"]))],
                 limit=1,
                 order=order,
             )
@@ -215,10 +219,10 @@ class BusinessDocumentImport(models.AbstractModel):
 
     @api.model
     def _match_partner_website(self, partner_dict, chatter_msg, domain, order):
-        website_domain = self._get_partner_website_domain(partner_dict)
+        website_domain = self._get_partner_match_keys(partner_dict)["website_domain"]
         if website_domain:
             return self.env["res.partner"].search(
-                domain + [("website", "=ilike", "%" + website_domain + "%")],
+                domain + [("website_domain_normalized", "=", website_domain)],
                 limit=1,
                 order=order,
             )
@@ -234,19 +238,19 @@ class BusinessDocumentImport(models.AbstractModel):
 
     @api.model
     def _match_partner_email(self, partner_dict, chatter_msg, domain, order):
-        email_domain = self._get_partner_email_domain(partner_dict)
+        email_domain = self._get_partner_match_keys(partner_dict)["email_domain"]
         # I can't search on email addresses with
         # email_domain because of the emails such as
         # @gmail.com, @yahoo.com that may match random partners
         if email_domain:
             partner = self.env["res.partner"].search(
-                domain + [("website", "=ilike", "%" + email_domain + "%")],
+                domain + [("website_domain_normalized", "=", email_domain)],
                 limit=1,
                 order=order,
             )
             if not partner:
                 partner = self.env["res.partner"].search(
-                    domain + [("email", "=ilike", "%@" + email_domain)],
+                    domain + [("email_domain_normalized", "=", email_domain)],
                     limit=1,
                     order=order,
                 )
@@ -257,7 +261,7 @@ class BusinessDocumentImport(models.AbstractModel):
                         "The %s has been identified by the domain name '%s' "
                         "so please check carefully that the %s is correct."
                     )
-                    % (partner_type_label, domain, partner_type_label)
+                    % (partner_type_label, email_domain, partner_type_label)
                 )
                 return partner
 
@@ -310,8 +314,10 @@ class BusinessDocumentImport(models.AbstractModel):
 
         # Search on VAT
         if partner_dict.get("vat"):
-            vat = partner_dict["vat"].replace(" ", "").upper()
-            partner = rpo.search(domain + [("vat", "=", vat)], limit=1, order=order)
+            vat = self._get_partner_match_keys(partner_dict)["vat"]
+            partner = rpo.search(
+                domain + [("vat_normalized", "=", vat)], limit=1, order=order
+            )
             if partner:
                 return partner
 
@@ -342,6 +348,10 @@ class BusinessDocumentImport(models.AbstractModel):
 
         if not raise_exception:
             return None
+        self._match_partner_raise_not_found(partner_dict)
+
+    @api.model
+    def _match_partner_raise_not_found(self, partner_dict):
         raise self.user_error_wrap(
             "_match_partner",
             partner_dict,
@@ -357,7 +367,7 @@ class BusinessDocumentImport(models.AbstractModel):
                 "Country code: %s\n"
             )
             % (
-                partner_type_label,
+                partner_dict["type_label"],
                 partner_dict.get("name") or "",
                 partner_dict.get("vat") or "",
                 partner_dict.get("ref") or "",
@@ -368,6 +378,263 @@ class BusinessDocumentImport(models.AbstractModel):
             ),
         )
 
+    @api.model
+    def _get_partner_match_keys(self, partner_dict):
+        """Return the normalized keys used to match partners in bulk.
+
+        The same normalization is used for the stored keys of res.partner.
+        """
+        vat = partner_dict.get("vat")
+        email = partner_dict.get("email")
+        email_domain = self._get_partner_email_domain(partner_dict)
+        website_domain = self._get_partner_website_domain(partner_dict)
+        return {
+            "ref": partner_dict.get("ref") or False,
+            "vat": vat and vat.replace(" ", "").upper() or False,
+            "email": email and "@" in email and email_normalize(email) or False,
+            "contact": (partner_dict.get("contact") or "").lower() or False,
+            "phone": partner_dict.get("phone") or False,
+            "name": (partner_dict.get("name") or "").lower() or False,
+            "email_domain": email_domain and email_domain.lower() or False,
+            "website_domain": website_domain and website_domain.lower() or False,
+        }
+
+    @api.model
+    def _match_partners_fetch(self, domain, order, fname, values, operator="in"):
+        """Search partners whose field matches one of the values.
+
+        :return: dict {value: partners ordered by `order`}
+        """
+        res = defaultdict(list)
+        values = list(set(values))
+        if not values:
+            return res
+        rpo = self.env["res.partner"]
+        for chunk in split_every(500, values):
+            if operator == "=ilike":
+                value_domain = expression.OR(
+                    [[(fname, "=ilike", escape_psql(v))] for v in chunk]
+                )
+            else:
+                value_domain = [(fname, operator, list(chunk))]
+            for partner in rpo.search(domain + value_domain, order=order):
+                value = partner[fname]
+                if operator == "=ilike":
+                    value = (value or "").lower()
+                res[value].append(partner)
+        return res
+
+    @api.model
+    def _match_partners_candidates(self, keys_list, domain, order):
+        """Fetch the candidate partners of all the documents,
+        with one query per kind of key."""
+        rpo = self.env["res.partner"]
+
+        def values(*key_names):
+            return [keys[k] for keys in keys_list for k in key_names if keys[k]]
+
+        names = self._match_partners_fetch(
+            domain, order, "name", values("contact", "name"), operator="=ilike"
+        )
+        phones = defaultdict(list)
+        phone_values = list(set(values("phone")))
+        if phone_values:
+            for partner in rpo.search(
+                domain
+                + ["|", ("phone", "in", phone_values), ("mobile", "in", phone_values)],
+                order=order,
+            ):
+                for number in {partner.phone, partner.mobile}:
+                    if number:
+                        phones[number].append(partner)
+        return {
+            "ref": self._match_partners_fetch(domain, order, "ref", values("ref")),
+            "vat": self._match_partners_fetch(
+                domain, order, "vat_normalized", values("vat")
+            ),
+            "email": self._match_partners_fetch(
+                domain, order, "email_normalized", values("email")
+            ),
+            "contact": names,
+            "phone": phones,
+            "name": names,
+            "website_domain": self._match_partners_fetch(
+                domain,
+                order,
+                "website_domain_normalized",
+                values("website_domain", "email_domain"),
+            ),
+            "email_domain": self._match_partners_fetch(
+                domain, order, "email_domain_normalized", values("email_domain")
+            ),
+        }
+
+    @api.model
+    def _match_partners(
+        self,
+        partner_dicts,
+        chatter_msgs=None,
+        partner_type="supplier",
+        domain=None,
+        raise_exception=True,
+    ):
+        """Bulk version of _match_partner(), to import a batch of documents.
+
+        All the documents are resolved with a few set-based queries
+        on normalized keys (one query per kind of key) instead of up to
+        eight searches per document. The matching rules and their priority
+        are the ones of _match_partner(); _hook_match_partner() is still called
+        for each document not matched on ref or VAT.
+
+        :param partner_dicts: list of partner dicts, see _match_partner()
+        :param chatter_msgs: list of chatter messages lists, one per partner dict
+        :return: list of res.partner records, in the order of partner_dicts.
+            When a partner is not found and raise_exception is False,
+            the list contains None.
+        """
+        rpo = self.env["res.partner"]
+        if chatter_msgs is None:
+            chatter_msgs = [[] for __ in partner_dicts]
+        domain = (domain or []) + self._match_company_domain()
+        order = self._get_match_partner_order(partner_type)
+        partner_type_label = self._get_match_partner_type_label(partner_type)
+        cleaned_dicts = []
+        for partner_dict in partner_dicts:
+            partner_dict = partner_dict.copy()
+            self._strip_cleanup_dict(partner_dict)
+            partner_dict["type"] = partner_type
+            partner_dict["type_label"] = partner_type_label
+            cleaned_dicts.append(partner_dict)
+        keys_list = [self._get_partner_match_keys(pdict) for pdict in cleaned_dicts]
+        candidates = self._match_partners_candidates(keys_list, domain, order)
+        country_codes = {
+            d["country_code"] for d in cleaned_dicts if d.get("country_code")
+        }
+        countries = {
+            country.code: country
+            for country in self.env["res.country"].search(
+                [("code", "in", list(country_codes))]
+            )
+        }
+        states = {
+            (state.country_id.code, state.code): state
+            for state in self.env["res.country.state"].search(
+                [
+                    ("country_id", "in", [c.id for c in countries.values()]),
+                    (
+                        "code",
+                        "in",
+                        [d["state_code"] for d in cleaned_dicts if d.get("state_code")],
+                    ),
+                ]
+            )
+        }
+        res = []
+        for partner_dict, keys, chatter_msg in zip(
+            cleaned_dicts, keys_list, chatter_msgs
+        ):
+            partner = self._direct_match(
+                partner_dict, rpo, raise_exception=raise_exception
+            )
+            if not partner:
+                partner = self._match_partners_pick(
+                    partner_dict,
+                    keys,
+                    candidates,
+                    countries,
+                    states,
+                    chatter_msg,
+                    domain,
+                    order,
+                )
+            if not partner and raise_exception:
+                self._match_partner_raise_not_found(partner_dict)
+            res.append(partner or None)
+        return res
+
+    @api.model
+    def _match_partners_pick(
+        self,
+        partner_dict,
+        keys,
+        candidates,
+        countries,
+        states,
+        chatter_msg,
+        domain,
+        order,
+    ):
+        """Pick the partner of one document among the prefetched candidates"""
+        # If a ref is explicitly given, we just want to match that partner
+        if keys["ref"] and candidates["ref"].get(keys["ref"]):
+            return candidates["ref"][keys["ref"]][0]
+        country = state = False
+        doc_domain = list(domain)
+        if partner_dict.get("country_code"):
+            country = countries.get(partner_dict["country_code"])
+            if country:
+                doc_domain += [
+                    "|",
+                    ("country_id", "=", False),
+                    ("country_id", "=", country.id),
+                ]
+                state = states.get((country.code, partner_dict.get("state_code")))
+                if state:
+                    doc_domain += [
+                        "|",
+                        ("state_id", "=", False),
+                        ("state_id", "=", state.id),
+                    ]
+            else:
+                chatter_msg.append(
+                    _(
+                        "The analysis of the business document returned '%s' as "
+                        "country code. But there are no country with that code "
+                        "in Odoo."
+                    )
+                    % partner_dict["country_code"]
+                )
+
+        rpo = self.env["res.partner"]
+
+        def first(key_name, value):
+            for partner in candidates[key_name].get(value, []) if value else []:
+                if country and partner.country_id not in (country, rpo.country_id):
+                    continue
+                if state and partner.state_id not in (state, rpo.state_id):
+                    continue
+                return partner
+            return False
+
+        partner = first("vat", keys["vat"])
+        if partner:
+            return partner
+        # Hook to plug alternative matching methods
+        partner = self._hook_match_partner(partner_dict, chatter_msg, doc_domain, order)
+        if partner:
+            return partner
+        for key_name in ("email", "contact", "phone", "name", "website_domain"):
+            partner = first(key_name, keys[key_name])
+            if partner:
+                return partner
+        # I can't search on email addresses with email_domain first
+        # because of the emails such as @gmail.com, @yahoo.com
+        # that may match random partners
+        partner = first("website_domain", keys["email_domain"]) or first(
+            "email_domain", keys["email_domain"]
+        )
+        if partner:
+            partner_type_label = partner_dict["type_label"]
+            chatter_msg.append(
+                _(
+                    "The %s has been identified by the domain name '%s' "
+                    "so please check carefully that the %s is correct."
+                )
+                % (partner_type_label, keys["email_domain"], partner_type_label)
+            )
+            return partner
+        return False
+
     @api.model
     def _hook_match_partner(self, partner_dict, chatter_msg, domain, order):
         return False
@@ -576,10 +843,12 @@ class BusinessDocumentImport(models.AbstractModel):
         product = self._direct_match(product_dict, ppo)
         if product:
             return product
+        memo = self._get_match_memo("product")
+        memo_key = self._get_match_product_memo_key(product_dict, seller)
+        if memo_key in memo:
+            return ppo.browse(memo[memo_key])
         product = self._match_product_search(product_dict)
-        if product:
-            return product
-        elif seller:
+        if not product and seller:
             # WARNING: Won't work for multi-variant products
             # because product.supplierinfo is attached to product template
             sinfo = self.env["product.supplierinfo"].search(
@@ -595,7 +864,14 @@ class BusinessDocumentImport(models.AbstractModel):
                 and sinfo.product_tmpl_id.product_variant_ids
                 and len(sinfo.product_tmpl_id.product_variant_ids) == 1
             ):
-                return sinfo.product_tmpl_id.product_variant_ids[0]
+                product = sinfo.product_tmpl_id.product_variant_ids[0]
+        if product:
+            memo[memo_key] = product.id
+            return product
+        self._match_product_raise_not_found(product_dict, seller)
+
+    @api.model
+    def _match_product_raise_not_found(self, product_dict, seller):
         raise self.user_error_wrap(
             "_match_product",
             product_dict,
@@ -613,6 +889,163 @@ class BusinessDocumentImport(models.AbstractModel):
             ),
         )
 
+    @api.model
+    def _with_match_memo(self):
+        """Share the results of the matching methods for the whole import.
+
+        Run the import with the returned environment: the matched records
+        are then memoized until the end of the import.
+        """
+        if self.env.context.get("business_document_import_memo") is not None:
+            return self
+        return self.with_context(business_document_import_memo={})
+
+    @api.model
+    def _get_match_memo(self, kind):
+        memo = self.env.context.get("business_document_import_memo")
+        if memo is None:
+            return {}
+        return memo.setdefault(kind, {})
+
+    @api.model
+    def _get_match_product_memo_key(self, product_dict, seller):
+        return (
+            self._context.get("force_company") or self.env.company.id,
+            seller and seller.id or False,
+            product_dict.get("barcode") or False,
+            product_dict.get("code") or False,
+        )
+
+    @api.model
+    def _match_products(
+        self, product_dicts, chatter_msg, seller=False, raise_if_not_found=True
+    ):
+        """Batch version of _match_product(), for all the lines of a document.
+
+        Products are resolved with one query per kind of key (barcode,
+        packaging barcode, default_code, seller code) for all the lines,
+        with the same priority as _match_product().
+
+        :param raise_if_not_found: if False, an unmatched product is returned
+            as an empty recordset instead of raising
+        :return: list of product.product records, in the order of product_dicts
+        """
+        ppo = self.env["product.product"]
+        memo = self._get_match_memo("product")
+        res = []
+        todo = {}
+        for product_dict in product_dicts:
+            self._strip_cleanup_dict(product_dict)
+            product = self._direct_match(product_dict, ppo)
+            if not product:
+                memo_key = self._get_match_product_memo_key(product_dict, seller)
+                if memo_key in memo:
+                    product = ppo.browse(memo[memo_key])
+                else:
+                    todo[memo_key] = product_dict
+            res.append(product)
+        if todo:
+            found = self._match_products_search(list(todo.values()), seller)
+            for memo_key, product_dict in todo.items():
+                product_id = found.get((memo_key[2], memo_key[3]))
+                if product_id:
+                    memo[memo_key] = product_id
+        for i, product_dict in enumerate(product_dicts):
+            if res[i]:
+                continue
+            memo_key = self._get_match_product_memo_key(product_dict, seller)
+            if not memo.get(memo_key):
+                if not raise_if_not_found:
+                    continue
+                self._match_product_raise_not_found(product_dict, seller)
+            res[i] = ppo.browse(memo[memo_key])
+        return res
+
+    @api.model
+    def _match_products_search(self, product_dicts, seller):
+        """Search the products of product_dicts with one query per kind of key.
+
+        As in _match_product_search(), a barcode matches the product barcode
+        or a packaging barcode, a code matches the product barcode or the
+        default_code, and the first product in the product order wins.
+
+        :return: dict {(barcode, code): product ID}
+        """
+        barcodes = {pdict["barcode"] for pdict in product_dicts if pdict.get("barcode")}
+        codes = {pdict["code"] for pdict in product_dicts if pdict.get("code")}
+        by_barcode, by_code, by_seller_code = self._match_products_fetch(
+            barcodes, codes, seller
+        )
+        candidate_ids = set()
+        for product_ids in list(by_barcode.values()) + list(by_code.values()):
+            candidate_ids |= product_ids
+        # Rank the candidates like the limit=1 searches of _match_product_search
+        rank = {}
+        if candidate_ids:
+            ordered = self.env["product.product"].search(
+                [("id", "in", list(candidate_ids))]
+            )
+            rank = {product_id: i for i, product_id in enumerate(ordered.ids)}
+
+        def first(product_ids):
+            return min(product_ids, key=lambda pid: rank.get(pid, len(rank)))
+
+        res = {}
+        for pdict in product_dicts:
+            barcode = pdict.get("barcode") or False
+            code = pdict.get("code") or False
+            product_id = False
+            if barcode and by_barcode.get(barcode):
+                product_id = first(by_barcode[barcode])
+            if not product_id and code:
+                if by_code.get(code):
+                    product_id = first(by_code[code])
+                else:
+                    product_id = by_seller_code.get(code, False)
+            res[(barcode, code)] = product_id
+        return res
+
+    @api.model
+    def _match_products_fetch(self, barcodes, codes, seller):
+        """Candidate products of _match_products_search(), by key.
+
+        :return: tuple ({barcode: product IDs}, {code: product IDs},
+            {seller code: product ID})
+        """
+        ppo = self.env["product.product"]
+        cdomain = self._match_company_domain()
+        company_id = self._context.get("force_company") or self.env.company.id
+        by_barcode = defaultdict(set)
+        by_code = defaultdict(set)
+        by_seller_code = {}
+        if barcodes | codes:
+            for product in ppo.search(
+                cdomain + [("barcode", "in", list(barcodes | codes))]
+            ):
+                by_barcode[product.barcode].add(product.id)
+                by_code[product.barcode].add(product.id)
+        if barcodes:
+            for packaging in self.env["product.packaging"].search(
+                [("barcode", "in", list(barcodes)), ("product_id", "!=", False)]
+            ):
+                product = packaging.product_id
+                if product.active and product.company_id.id in (False, company_id):
+                    by_barcode[packaging.barcode].add(product.id)
+        if codes:
+            for product in ppo.search(cdomain + [("default_code", "in", list(codes))]):
+                by_code[product.default_code].add(product.id)
+        if codes and seller:
+            for sinfo in self.env["product.supplierinfo"].search(
+                cdomain
+                + [("name", "=", seller.id), ("product_code", "in", list(codes))]
+            ):
+                # WARNING: Won't work for multi-variant products
+                # because product.supplierinfo is attached to product template
+                variants = sinfo.product_tmpl_id.product_variant_ids
+                if len(variants) == 1:
+                    by_seller_code.setdefault(sinfo.product_code, variants.id)
+        return by_barcode, by_code, by_seller_code
+
     @api.model
     def _match_product_search(self, product_dict):
         product = self.env["product.product"].browse()
@@ -639,6 +1072,28 @@ class BusinessDocumentImport(models.AbstractModel):
         company_id = self._context.get("force_company") or self.env.company.id
         return ["|", ("company_id", "=", False), ("company_id", "=", company_id)]
 
+    @api.model
+    @tools.ormcache()
+    def _prepare_currency_speed_dict(self):
+        """Active currencies by ISO code and by symbol.
+
+        The result is cached until a currency is created, written or deleted
+        (see res.currency in this module): it must not be modified.
+        """
+        speed_dict = {"name": {}, "symbol": defaultdict(tuple)}
+        res = (
+            self.env["res.currency"]
+            .sudo()
+            .with_context(active_test=True)
+            .search_read([], ["name", "symbol"])
+        )
+        for line in res:
+            speed_dict["name"][line["name"].upper()] = line["id"]
+            if line["symbol"]:
+                speed_dict["symbol"][line["symbol"]] += (line["id"],)
+        speed_dict["symbol"] = dict(speed_dict["symbol"])
+        return speed_dict
+
     @api.model
     def _match_currency(self, currency_dict, chatter_msg):
         """Example:
@@ -656,11 +1111,11 @@ class BusinessDocumentImport(models.AbstractModel):
         currency = self._direct_match(currency_dict, rco)
         if currency:
             return currency
+        speed_dict = self._prepare_currency_speed_dict()
         if currency_dict.get("iso"):
             currency_iso = currency_dict["iso"].upper()
-            currency = rco.search([("name", "=", currency_iso)], limit=1)
-            if currency:
-                return currency
+            if currency_iso in speed_dict["name"]:
+                return rco.browse(speed_dict["name"][currency_iso])
             else:
                 raise self.user_error_wrap(
                     "_match_currency",
@@ -673,7 +1128,9 @@ class BusinessDocumentImport(models.AbstractModel):
                     % currency_iso,
                 )
         if currency_dict.get("symbol"):
-            currencies = rco.search([("symbol", "=", currency_dict["symbol"])])
+            currencies = rco.browse(
+                speed_dict["symbol"].get(currency_dict["symbol"], ())
+            )
             if len(currencies) == 1:
                 return currencies[0]
             else:
@@ -686,13 +1143,12 @@ class BusinessDocumentImport(models.AbstractModel):
                     % currency_dict["symbol"]
                 )
         if currency_dict.get("iso_or_symbol"):
-            currencies = rco.search(
-                [
-                    "|",
-                    ("name", "=", currency_dict["iso_or_symbol"].upper()),
-                    ("symbol", "=", currency_dict["iso_or_symbol"]),
-                ]
+            currencies = rco.browse(
+                speed_dict["symbol"].get(currency_dict["iso_or_symbol"], ())
             )
+            iso_id = speed_dict["name"].get(currency_dict["iso_or_symbol"].upper())
+            if iso_id:
+                currencies |= rco.browse(iso_id)
             if len(currencies) == 1:
                 return currencies[0]
             else:
@@ -748,6 +1204,25 @@ class BusinessDocumentImport(models.AbstractModel):
         )
         return company_cur
 
+    @api.model
+    @tools.ormcache()
+    def _prepare_uom_speed_dict(self):
+        """First active unit of measure for each UNECE code.
+
+        The result is cached until a unit of measure is created, written or
+        deleted (see uom.uom in this module): it must not be modified.
+        """
+        res = (
+            self.env["uom.uom"]
+            .sudo()
+            .with_context(active_test=True)
+            .search_read([("unece_code", "!=", False)], ["unece_code"])
+        )
+        speed_dict = {}
+        for line in res:
+            speed_dict.setdefault(line["unece_code"], line["id"])
+        return speed_dict
+
     @api.model
     def _match_uom(self, uom_dict, chatter_msg, product=False):
         """Example:
@@ -767,9 +1242,9 @@ class BusinessDocumentImport(models.AbstractModel):
             # Map NIU to Unit
             if uom_dict["unece_code"] == "NIU":
                 uom_dict["unece_code"] = "C62"
-            uom = uuo.search([("unece_code", "=", uom_dict["unece_code"])], limit=1)
-            if uom:
-                return uom
+            speed_dict = self._prepare_uom_speed_dict()
+            if uom_dict["unece_code"] in speed_dict:
+                return uuo.browse(speed_dict[uom_dict["unece_code"]])
             else:
                 chatter_msg.append(
                     _(
@@ -805,6 +1280,8 @@ class BusinessDocumentImport(models.AbstractModel):
         self, taxes_list, chatter_msg, type_tax_use="purchase", price_include=False
     ):
         """taxes_list must be a list of tax_dict"""
+        # the memo makes _match_tax() look up each distinct tax signature once
+        self = self._with_match_memo()
         taxes_recordset = self.env["account.tax"].browse(False)
         for tax_dict in taxes_list:
             taxes_recordset += self._match_tax(
@@ -815,6 +1292,38 @@ class BusinessDocumentImport(models.AbstractModel):
             )
         return taxes_recordset
 
+    @api.model
+    @tools.ormcache("company_id")
+    def _prepare_tax_speed_dict(self, company_id):
+        """Active taxes of the company by amount type, in the account.tax order.
+
+        The result is cached until a tax is created, written or deleted
+        (see account.tax in this module): it must not be modified.
+        """
+        res = (
+            self.env["account.tax"]
+            .sudo()
+            .with_context(active_test=True)
+            .search_read([("company_id", "=", company_id)], ["amount_type"])
+        )
+        speed_dict = defaultdict(tuple)
+        for line in res:
+            speed_dict[line["amount_type"]] += (line["id"],)
+        return dict(speed_dict)
+
+    @api.model
+    def _get_match_tax_memo_key(self, tax_dict, type_tax_use, price_include):
+        return (
+            self._context.get("force_company") or self.env.company.id,
+            type_tax_use,
+            price_include,
+            tax_dict.get("amount_type"),
+            tax_dict.get("amount"),
+            tax_dict.get("unece_type_code") or False,
+            tax_dict.get("unece_categ_code") or False,
+            tax_dict.get("unece_due_date_code") or False,
+        )
+
     @api.model
     def _prepare_match_tax_domain(
         self, tax_dict, type_tax_use="purchase", price_include=False
@@ -872,14 +1381,14 @@ class BusinessDocumentImport(models.AbstractModel):
         tax = self._direct_match(tax_dict, ato)
         if tax:
             return tax
-        domain = self._prepare_match_tax_domain(
-            tax_dict, type_tax_use=type_tax_use, price_include=price_include
-        )
-        taxes = ato.search(domain)
-        for tax in taxes:
-            tax_amount = tax.amount  # 'amount' field : digits=(16, 4)
-            if not float_compare(tax_dict["amount"], tax_amount, precision_digits=4):
-                return tax
+        memo = self._get_match_memo("tax")
+        memo_key = self._get_match_tax_memo_key(tax_dict, type_tax_use, price_include)
+        if memo_key not in memo:
+            memo[memo_key] = self._match_tax_search(
+                tax_dict, type_tax_use=type_tax_use, price_include=price_include
+            ).id
+        if memo[memo_key]:
+            return ato.browse(memo[memo_key])
         raise self.user_error_wrap(
             "_match_tax",
             tax_dict,
@@ -903,6 +1412,23 @@ class BusinessDocumentImport(models.AbstractModel):
             ),
         )
 
+    @api.model
+    def _match_tax_search(self, tax_dict, type_tax_use="purchase", price_include=False):
+        """Filter the cached taxes of the company with the matching domain
+        and return the first one with the same amount"""
+        ato = self.env["account.tax"]
+        domain = self._prepare_match_tax_domain(
+            tax_dict, type_tax_use=type_tax_use, price_include=price_include
+        )
+        company_id = self._context.get("force_company") or self.env.company.id
+        speed_dict = self._prepare_tax_speed_dict(company_id)
+        taxes = ato.browse(speed_dict.get(tax_dict["amount_type"], ()))
+        for tax in taxes.filtered_domain(domain):
+            tax_amount = tax.amount  # 'amount' field : digits=(16, 4)
+            if not float_compare(tax_dict["amount"], tax_amount, precision_digits=4):
+                return tax
+        return ato
+
     def compare_lines(
         self,
         existing_lines,
@@ -981,6 +1507,17 @@ class BusinessDocumentImport(models.AbstractModel):
                 )
                 return False
             existing_lines_dict[eline["product"]] = eline
+        self = self._with_match_memo()
+        # Resolve the products at once, memoized for the loop below, which
+        # still raises or stops on the lines in their order
+        product_dicts = []
+        for iline in import_lines:
+            if not iline.get("product"):
+                break
+            product_dicts.append(iline["product"])
+        self._match_products(
+            product_dicts, chatter_msg, seller=seller, raise_if_not_found=False
+        )
         unique_import_products = []
         res = {
             "to_remove": False,
@@ -0,0 +1,35 @@
+# Copyright 2015-2021 Akretion France
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class BusinessDocumentImportSpeedDictMixin(models.AbstractModel):
+    """Drop the speed dicts cached by business.document.import
+    (see _prepare_*_speed_dict()) when their records change.
+
+    Only the changes of the fields in `_speed_dict_fields` (read, filtered
+    or ordered on to build the speed dicts) invalidate the caches.
+    """
+
+    _name = "business.document.import.speed.dict.mixin"
+    _description = "Invalidation of the business document import speed dicts"
+
+    _speed_dict_fields = ()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.clear_caches()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if not self._speed_dict_fields or set(vals) & set(self._speed_dict_fields):
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
@@ -0,0 +1,35 @@
+# Copyright 2015-2021 Akretion France
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    # Normalized keys used by business.document.import to match partners
+    # in bulk with indexed equality lookups instead of ilike scans
+    vat_normalized = fields.Char(
+        compute="_compute_business_document_match_keys", store=True, index=True
+    )
+    email_domain_normalized = fields.Char(
+        compute="_compute_business_document_match_keys", store=True, index=True
+    )
+    website_domain_normalized = fields.Char(
+        compute="_compute_business_document_match_keys", store=True, index=True
+    )
+
+    @api.depends("vat", "email", "website")
+    def _compute_business_document_match_keys(self):
+        bdio = self.env["business.document.import"]
+        for partner in self:
+            keys = bdio._get_partner_match_keys(
+                {
+                    "vat": partner.vat,
+                    "email": partner.email and partner.email.strip(),
+                    "website": partner.website and partner.website.strip(),
+                }
+            )
+            partner.vat_normalized = keys["vat"]
+            partner.email_domain_normalized = keys["email_domain"]
+            partner.website_domain_normalized = keys["website_domain"]
@@ -0,0 +1,11 @@
+# Copyright 2015-2021 Akretion France
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class UomUom(models.Model):
+    _name = "uom.uom"
+    _inherit = ["uom.uom", "business.document.import.speed.dict.mixin"]
+
+    _speed_dict_fields = ("active", "name", "unece_code")
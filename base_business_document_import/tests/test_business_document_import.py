@@ -3,6 +3,8 @@
 # @author: Alexis de Lattre <alexis.delattre@akretion.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import mock
+
 from odoo.exceptions import UserError
 from odoo.tests import tagged
 from odoo.tests.common import TransactionCase
@@ -30,6 +32,60 @@ class TestBaseBusinessDocumentImport(TransactionCase):
         res = bdio._match_partner(partner_dict, [], partner_type=False)
         self.assertEqual(res, partner1)
 
+    def test_match_partners(self):
+        rpo = self.env["res.partner"]
+        bdio = self.env["business.document.import"]
+        partner1 = rpo.create(
+            {"name": "COGIP", "ref": "COGIP", "website": "http://www.Example.com/"}
+        )
+        partner2 = rpo.create(
+            {
+                "name": "Akretion France",
+                "vat": "FR12448890432",
+                "country_id": self.env.ref("base.fr").id,
+                "email": "contact@akretion.com",
+            }
+        )
+        self.assertEqual(partner1.website_domain_normalized, "example.com")
+        self.assertEqual(partner2.vat_normalized, "FR12448890432")
+        self.assertEqual(partner2.email_domain_normalized, "akretion.com")
+        partner_dicts = [
+            {"ref": "COGIP"},
+            {"vat": "fr12448890432", "country_code": "FR"},
+            {"vat": "FR12448890432", "country_code": "BE"},
+            {"email": "alexis.delattre@example.com"},
+            {"email": "roger@akretion.com", "name": "Unknown"},
+            {"name": "akretion france "},
+            {"name": "Unknown partner"},
+            # No wildcard in the names
+            {"name": "Akretion%"},
+            {"website": "https://shop.example.com/catalog"},
+        ]
+        chatter_msgs = [[] for __ in partner_dicts]
+        res = bdio._match_partners(
+            partner_dicts, chatter_msgs, partner_type=False, raise_exception=False
+        )
+        # fmt:off
+        self.assertEqual(res, [
+            partner1, partner2, None, partner1, partner2, partner2, None, None,
+            partner1,
+        ])
+        # fmt:on
+        # matched on the domain name of the e-mail: warning
+        self.assertTrue(chatter_msgs[3])
+        self.assertTrue(chatter_msgs[4])
+        self.assertFalse(chatter_msgs[1])
+        # Same results as one by one matching
+        for partner_dict, partner in zip(partner_dicts, res):
+            self.assertEqual(
+                bdio._match_partner(
+                    partner_dict, [], partner_type=False, raise_exception=False
+                ),
+                partner,
+            )
+        with self.assertRaises(UserError):
+            bdio._match_partners(partner_dicts, partner_type=False)
+
     def test_match_shipping_partner(self):
         rpo = self.env["res.partner"]
         bdio = self.env["business.document.import"]
@@ -171,6 +227,70 @@ class TestBaseBusinessDocumentImport(TransactionCase):
             pass
         self.assertTrue(raise_test)
 
+    def test_match_products(self):
+        bdio = self.env["business.document.import"]._with_match_memo()
+        seller = self.env.ref("base.res_partner_2")
+        product1 = self.env["product.product"].create(
+            {
+                "name": "Test Product",
+                "barcode": "9782203121102",
+                "seller_ids": [(0, 0, {"name": seller.id, "product_code": "TEST1242"})],
+                "packaging_ids": [(0, 0, {"name": "Big Pack", "barcode": "BIG-PACK"})],
+            }
+        )
+        product_dicts = [
+            {"code": "FURN_7777 "},
+            {"barcode": "9782203121102"},
+            {"barcode": "BIG-PACK"},
+            {"code": "TEST1242"},
+            {"barcode": "9782203121102"},
+        ]
+        res = bdio._match_products(product_dicts, [], seller=seller)
+        self.assertEqual(
+            res,
+            [
+                self.env.ref("product.product_delivery_01"),
+                product1,
+                product1,
+                product1,
+                product1,
+            ],
+        )
+        # The results are memoized for the rest of the import
+        with self.assertQueryCount(__system__=0):
+            res = bdio._match_product({"barcode": "BIG-PACK"}, [], seller=seller)
+        self.assertEqual(res, product1)
+        with self.assertRaises(UserError):
+            bdio._match_products([{"code": "TEST1242"}], [], seller=False)
+
+    def test_match_products_same_priority(self):
+        bdio = self.env["business.document.import"]
+        ppo = self.env["product.product"]
+        ppo.create({"name": "By Barcode", "default_code": "Z-BAR", "barcode": "SHARED"})
+        ppo.create(
+            {
+                "name": "By Packaging",
+                "default_code": "A-PACK",
+                "packaging_ids": [(0, 0, {"name": "Pack", "barcode": "SHARED"})],
+            }
+        )
+        product_dict = {"barcode": "SHARED"}
+        expected = bdio._match_product(dict(product_dict), [])
+        res = bdio._with_match_memo()._match_products([dict(product_dict)], [])
+        self.assertEqual(res, [expected])
+
+    def test_compare_lines_order(self):
+        bdio = self.env["business.document.import"]
+        import_lines = [
+            {"product": {"code": "UNKNOWN-CODE"}, "qty": 1},
+            {"qty": 2},
+        ]
+        # The unknown product of the first line is reported before the
+        # missing product of the second line, as the lines are processed
+        # in their order
+        with self.assertRaises(UserError):
+            bdio.compare_lines([], import_lines, [])
+
     def test_match_uom(self):
         bdio = self.env["business.document.import"]
         uom_dict = {"unece_code": "KGM"}
@@ -254,6 +374,63 @@ class TestBaseBusinessDocumentImport(TransactionCase):
         )
         self.assertEqual(res, de_tax_21_onpayment)
 
+    def test_match_tax_cache(self):
+        tax_vals = {
+            "name": "Test VAT purchase 17.3%",
+            "description": "TEST-VAT-buy-17.3",
+            "type_tax_use": "purchase",
+            "price_include": False,
+            "amount": 17.3,
+            "amount_type": "percent",
+            "unece_type_id": self.env.ref("account_tax_unece.tax_type_vat").id,
+            "unece_categ_id": self.env.ref("account_tax_unece.tax_categ_s").id,
+        }
+        tax = self.env["account.tax"].create(tax_vals)
+        bdio = self.env["business.document.import"]
+        tax_dict = {
+            "amount_type": "percent",
+            "amount": 17.3,
+            "unece_type_code": "VAT",
+            "unece_categ_code": "S",
+        }
+        res = bdio._match_tax(dict(tax_dict), [], type_tax_use="purchase")
+        self.assertEqual(res, tax)
+        # The taxes of the company are cached and each distinct tax
+        # signature is looked up once per document
+        bdio = bdio._with_match_memo()
+        bdio._match_tax(dict(tax_dict), [], type_tax_use="purchase")
+        with self.assertQueryCount(__system__=0):
+            res = bdio._match_taxes(
+                [dict(tax_dict) for i in range(5)], [], type_tax_use="purchase"
+            )
+        self.assertEqual(res, tax)
+        # Writing on a tax invalidates the cache
+        tax.active = False
+        with self.assertRaises(UserError):
+            self.env["business.document.import"]._match_tax(
+                dict(tax_dict), [], type_tax_use="purchase"
+            )
+        tax_2 = self.env["account.tax"].create(dict(tax_vals, name="Test VAT 2"))
+        res = self.env["business.document.import"]._match_tax(
+            dict(tax_dict), [], type_tax_use="purchase"
+        )
+        self.assertEqual(res, tax_2)
+
+    def test_speed_dict_invalidation(self):
+        tax = self.env["account.tax"].search([], limit=1)
+        with mock.patch.object(type(tax), "clear_caches") as mocked:
+            # Not used by the speed dicts
+            tax.description = "Other description"
+            mocked.assert_not_called()
+            tax.sequence += 1
+            mocked.assert_called_once()
+        uom = self.env.ref("uom.product_uom_unit")
+        with mock.patch.object(type(uom), "clear_caches") as mocked:
+            uom.rounding = 0.001
+            mocked.assert_not_called()
+            uom.unece_code = "XXX"
+            mocked.assert_called_once()
+
     def test_match_account_exact(self):
         bdio = self.env["business.document.import"]
         acc = self.env["account.account"].create(
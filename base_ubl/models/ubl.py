@@ -4,16 +4,29 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import logging
+import threading
 from io import BytesIO
 
 from lxml import etree
 
-from odoo import _, api, models
+from odoo import _, api, models, tools
 from odoo.exceptions import UserError
 from odoo.tools import file_open, float_is_zero, float_round
 
 logger = logging.getLogger(__name__)
 
+# Compiled XSD schemas are shared by all the registries and threads of the
+# worker: the XSD files are static and compiling the UBL maindoc schemas
+# (which import dozens of common component files) is far more expensive
+# than generating the document itself.
+# {(version, document): (XMLSchema, validation lock)}
+# A validator keeps the error log of its last validation: the validations
+# with the same validator are serialized by its lock.
+_xsd_schema_cache = {}
+_xsd_schema_lock = threading.Lock()
+_xsd_schema_stats = {"hits": 0, "misses": 0}
+
+
 try:
     from PyPDF2 import PdfFileReader, PdfFileWriter
     from PyPDF2.generic import NameObject
@@ -564,16 +577,96 @@ class BaseUbl(models.AbstractModel):
         return version_xpath[0].text.strip()
 
     @api.model
-    def _ubl_check_xml_schema(self, xml_string, document, version="2.1"):
-        """Validate the XML file against the XSD"""
+    def _ubl_get_xml_schema(self, document, version="2.1"):
+        """Return the XMLSchema validator of the document.
+
+        The validator is compiled once per worker and shared: validate
+        while holding the lock of `_ubl_get_xml_schema_lock`.
+        """
+        return self._ubl_get_xml_schema_and_lock(document, version=version)[0]
+
+    @api.model
+    def _ubl_get_xml_schema_lock(self, document, version="2.1"):
+        """Return the lock to hold when validating with the document schema"""
+        return self._ubl_get_xml_schema_and_lock(document, version=version)[1]
+
+    @api.model
+    def _ubl_get_xml_schema_and_lock(self, document, version="2.1"):
+        key = (version, document)
+        with _xsd_schema_lock:
+            cached = _xsd_schema_cache.get(key)
+            if cached is not None:
+                _xsd_schema_stats["hits"] += 1
+                return cached
+        # Compiled without holding the lock: another thread may compile it
+        # at the same time, the first one stored wins.
         xsd_file = "base_ubl/data/xsd-{}/maindoc/UBL-{}-{}.xsd".format(
             version, document, version
         )
-        xsd_etree_obj = etree.parse(file_open(xsd_file))
-        official_schema = etree.XMLSchema(xsd_etree_obj)
+        with file_open(xsd_file, "rb") as xsd_fd:
+            schema = etree.XMLSchema(etree.parse(xsd_fd))
+        with _xsd_schema_lock:
+            _xsd_schema_stats["misses"] += 1
+            cached = _xsd_schema_cache.setdefault(key, (schema, threading.Lock()))
+        logger.debug("UBL XSD schema %s %s compiled", document, version)
+        return cached
+
+    @api.model
+    def _ubl_get_xml_schema_cache_stats(self):
+        with _xsd_schema_lock:
+            return {
+                "hits": _xsd_schema_stats["hits"],
+                "misses": _xsd_schema_stats["misses"],
+                "size": len(_xsd_schema_cache),
+            }
+
+    @api.model
+    def _ubl_clear_xml_schema_cache(self):
+        with _xsd_schema_lock:
+            _xsd_schema_cache.clear()
+            _xsd_schema_stats.update(hits=0, misses=0)
+
+    @api.model
+    def _ubl_get_xml_schema_preload_list(self):
+        """Return the list of (document, version) to compile at registry load.
+
+        Configured in the server configuration file, for example::
+
+            ubl_xsd_preload = Invoice,CreditNote,Order:2.2
+        """
+        res = []
+        preload = tools.config.get("ubl_xsd_preload", False)
+        if not preload:
+            return res
+        for item in preload.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            document, __, version = item.partition(":")
+            res.append((document.strip(), version.strip() or "2.1"))
+        return res
+
+    def _register_hook(self):
+        res = super()._register_hook()
+        for document, version in self._ubl_get_xml_schema_preload_list():
+            try:
+                self._ubl_get_xml_schema(document, version=version)
+            except Exception as e:
+                logger.warning(
+                    "Could not preload UBL XSD schema %s %s: %s", document, version, e
+                )
+        return res
+
+    @api.model
+    def _ubl_check_xml_schema(self, xml_string, document, version="2.1"):
+        """Validate the XML file against the XSD"""
+        official_schema, lock = self._ubl_get_xml_schema_and_lock(
+            document, version=version
+        )
         try:
             t = etree.parse(BytesIO(xml_string))
-            official_schema.assertValid(t)
+            with lock:
+                official_schema.assertValid(t)
         except Exception as e:
             # if the validation of the XSD fails, we arrive here
             logger = logging.getLogger(__name__)
@@ -592,6 +685,44 @@ class BaseUbl(models.AbstractModel):
             )
         return True
 
+    @api.model
+    def _ubl_check_xml_schema_stream(
+        self, source, document, version="2.1", huge_tree=False
+    ):
+        """Validate the XML file against the XSD while reading it.
+
+        The elements are dropped once validated: the memory used doesn't
+        depend on the size of the file.
+
+        :param source: path or file object of the XML file
+        """
+        official_schema, lock = self._ubl_get_xml_schema_and_lock(
+            document, version=version
+        )
+        try:
+            with lock:
+                for __, element in etree.iterparse(
+                    source, events=("end",), schema=official_schema, huge_tree=huge_tree
+                ):
+                    element.clear()
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
+        except etree.XMLSyntaxError as e:
+            logger = logging.getLogger(__name__)
+            logger.warning("The XML file is invalid against the XML Schema Definition")
+            logger.warning(e)
+            raise UserError(
+                _(
+                    "The UBL XML file is not valid against the official "
+                    "XML Schema Definition. The XML file and the "
+                    "full error have been written in the server logs. "
+                    "Here is the error, which may give you an idea on the "
+                    "cause of the problem : %s."
+                )
+                % str(e)
+            )
+        return True
+
     # TODO: move to pdf_helper
     @api.model
     def _ubl_add_xml_in_pdf_buffer(self, xml_string, xml_filename, buffer):
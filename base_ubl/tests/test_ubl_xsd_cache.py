@@ -0,0 +1,51 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import threading
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import config
+
+
+class TestUblXsdCache(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.base_ubl = self.env["base.ubl"]
+        self.base_ubl._ubl_clear_xml_schema_cache()
+
+    def test_schema_compiled_once(self):
+        schema = self.base_ubl._ubl_get_xml_schema("Invoice", version="2.1")
+        stats = self.base_ubl._ubl_get_xml_schema_cache_stats()
+        self.assertEqual(stats, {"hits": 0, "misses": 1, "size": 1})
+        self.assertIs(
+            self.base_ubl._ubl_get_xml_schema("Invoice", version="2.1"), schema
+        )
+        self.assertIsNot(
+            self.base_ubl._ubl_get_xml_schema("Invoice", version="2.2"), schema
+        )
+        stats = self.base_ubl._ubl_get_xml_schema_cache_stats()
+        self.assertEqual(stats, {"hits": 1, "misses": 2, "size": 2})
+
+    def test_schema_shared_between_threads(self):
+        schema = self.base_ubl._ubl_get_xml_schema("Invoice", version="2.1")
+        res = {}
+
+        def get_schema():
+            res["schema"] = self.base_ubl._ubl_get_xml_schema("Invoice", version="2.1")
+
+        thread = threading.Thread(target=get_schema)
+        thread.start()
+        thread.join()
+        # Compiled once for the worker, whatever the thread
+        self.assertIs(res["schema"], schema)
+        stats = self.base_ubl._ubl_get_xml_schema_cache_stats()
+        self.assertEqual(stats, {"hits": 1, "misses": 1, "size": 1})
+
+    def test_preload_list(self):
+        config.options["ubl_xsd_preload"] = "Invoice, Order:2.2,"
+        try:
+            self.assertEqual(
+                self.base_ubl._ubl_get_xml_schema_preload_list(),
+                [("Invoice", "2.1"), ("Order", "2.2")],
+            )
+        finally:
+            config.options.pop("ubl_xsd_preload")
@@ -50,15 +50,16 @@ class EDIExchangeSOInput(Component):
 
     def _handle_existing_invoice(self, invoice, message):
         prev_record = self._get_previous_record(invoice)
-        self.exchange_record.message_post_with_view(
-            "edi_account_invoice_import.message_already_imported",
+        self.exchange_record._post_notification(
+            self.exchange_record,
+            message,
+            template="edi_account_invoice_import.message_already_imported",
             values={
                 "invoice": invoice,
                 "prev_record": prev_record,
                 "message": message,
                 "level": "info",
             },
-            subtype_id=self.env.ref("mail.mt_note").id,
         )
 
     def _get_previous_record(self, invoice):
@@ -1,6 +1,7 @@
 from . import edi_backend
 from . import edi_backend_type
 from . import edi_exchange_record
+from . import edi_exchange_notification_log
 from . import edi_exchange_consumer_mixin
 from . import edi_exchange_type
 from . import edi_exchange_type_rule
@@ -7,25 +7,25 @@
 
 import base64
 import logging
-import traceback
-from io import StringIO
+import threading
+import weakref
 
 from odoo import _, exceptions, fields, models, tools
+from odoo.tools import groupby, split_every
 
 from odoo.addons.component.exception import NoComponentError
 from odoo.addons.queue_job.exception import RetryableJobError
 
 from ..exceptions import EDIValidationError
+from ..utils import get_exception_msg
 
 _logger = logging.getLogger(__name__)
 
-
-def _get_exception_msg():
-    buff = StringIO()
-    traceback.print_exc(file=buff)
-    traceback_txt = buff.getvalue()
-    buff.close()
-    return traceback_txt
+# Component classes resolved by `_find_component`, per components registry
+# (a new registry is built when the Odoo registry is reloaded).
+# {components registry: {lookup key: (usage, component class) or None}}
+_component_lookup_cache = weakref.WeakKeyDictionary()
+_component_lookup_lock = threading.Lock()
 
 
 class EDIBackend(models.Model):
@@ -81,7 +81,7 @@ class EDIBackend(models.Model):
         )
 
     def _get_component_env_ctx(self, record_conf, key):
-        env_ctx = record_conf.get("env_ctx", {})
+        env_ctx = dict(record_conf.get("env_ctx") or {})
         # You can use `edi_session` down in the stack to control logics.
         env_ctx.update(dict(edi_framework_action=key))
         return env_ctx
@@ -121,25 +121,71 @@ class EDIBackend(models.Model):
         if "backend" not in work_ctx:
             work_ctx["backend"] = self
         with self.work_on(model, **work_ctx) as work:
-            for usage in usage_candidates:
-                components, c_work_ctx = work._matching_components(usage=usage, **kw)
-                if not components:
-                    continue
-                # Sort components and pick the 1st one matching.
-                # In this way we support generic components registration
-                # and specific components registrations
-                components = sorted(
-                    components, key=lambda x: self._component_sort_key(x), reverse=True
-                )
-                component = components[0](c_work_ctx)
+            match = self._lookup_component_class(work, model, usage_candidates, **kw)
+            if match:
+                __, component_class = match
+                # Same work context as the one of `work._matching_components`
+                component = component_class(work.work_on())
                 _logger.debug("using component %s", component._name)
-                break
         if not component and not safe:
             raise NoComponentError(
                 "No component found matching any of: {}".format(usage_candidates)
             )
         return component or None
 
+    def _lookup_component_class(self, work, model, usage_candidates, **kw):
+        """Return the usage and the class of the component to use, or None.
+
+        The result is memoized per components registry: it only depends
+        on the lookup key, see `_component_lookup_cache_key`.
+        """
+        try:
+            key = self._component_lookup_cache_key(model, usage_candidates, **kw)
+            hash(key)
+        except TypeError:
+            # Unhashable match attributes: no cache
+            key = None
+        registry = work.components_registry
+        if key is not None:
+            # Components registered after the lookup (eg: in tests)
+            # must be taken into account.
+            key += (len(registry._components),)
+            cache = _component_lookup_cache.get(registry, {})
+            if key in cache:
+                return cache[key]
+        match = None
+        for usage in usage_candidates:
+            components, __ = work._matching_components(usage=usage, **kw)
+            if not components:
+                continue
+            # Sort components and pick the 1st one matching.
+            # In this way we support generic components registration
+            # and specific components registrations
+            components = sorted(
+                components, key=lambda x: self._component_sort_key(x), reverse=True
+            )
+            match = (usage, components[0])
+            break
+        if key is not None:
+            with _component_lookup_lock:
+                _component_lookup_cache.setdefault(registry, {})[key] = match
+        return match
+
+    def _component_lookup_cache_key(self, model, usage_candidates, **kw):
+        """Key of the component lookup cache.
+
+        It must hold everything the matching and the sorting of the
+        components depend on: extend it when `_component_sort_key`
+        or `_component_match` depend on something else than the match
+        attributes of the backend.
+        """
+        return (
+            self._name,
+            model,
+            tuple(usage_candidates),
+            tuple(sorted(kw.items())),
+        )
+
     def _get_component_usage_candidates(self, exchange_record, key):
         """Retrieve usage candidates for components."""
         # fmt:off
@@ -148,15 +194,17 @@ class EDIBackend(models.Model):
             key,
         ])
         # fmt:on
-        record_conf = self._get_component_conf_for_record(exchange_record, key)
+        record_conf = self._get_component_conf_for_record(
+            exchange_record, key, readonly=True
+        )
         candidates = [record_conf["usage"]] if record_conf else []
         candidates += [
             base_usage,
         ]
         return candidates
 
-    def _get_component_conf_for_record(self, exchange_record, key):
-        settings = exchange_record.type_id.get_settings()
+    def _get_component_conf_for_record(self, exchange_record, key, readonly=False):
+        settings = exchange_record.type_id.get_settings(readonly=readonly)
         return settings.get("components", {}).get(key, {})
 
     @property
@@ -174,6 +222,19 @@ class EDIBackend(models.Model):
         _values = self._create_record_prepare_values(type_code, values)
         return self.exchange_record_model.create(_values)
 
+    def create_records(self, type_code, values_list):
+        """Create exchange records for current backend in batch.
+
+        :param type_code: edi.exchange.type code
+        :param values_list: list of edi.exchange.record values
+        :return: edi.exchange.record recordset
+        """
+        self.ensure_one()
+        # Lookup the exchange type once
+        type_values = self._create_record_prepare_values(type_code, {})
+        _values_list = [dict(values, **type_values) for values in values_list]
+        return self.exchange_record_model.create(_values_list)
+
     def _create_record_prepare_values(self, type_code, values):
         res = values.copy()  # do not pollute original dict
         exchange_type = self.env["edi.exchange.type"].search(
@@ -234,7 +295,7 @@ class EDIBackend(models.Model):
             try:
                 self._validate_data(exchange_record, output)
             except EDIValidationError:
-                error = _get_exception_msg()
+                error = get_exception_msg()
                 state = "validate_error"
                 message = exchange_record._exchange_status_message("validate_ko")
                 exchange_record.update(
@@ -300,7 +361,7 @@ class EDIBackend(models.Model):
             self._exchange_send(exchange_record)
             _logger.debug("%s sent", exchange_record.identifier)
         except self._send_retryable_exceptions() as err:
-            error = _get_exception_msg()
+            error = get_exception_msg()
             _logger.debug("%s send failed. To be retried.", exchange_record.identifier)
             raise RetryableJobError(
                 error, **exchange_record._job_retry_params()
@@ -308,7 +369,7 @@ class EDIBackend(models.Model):
         except self._swallable_exceptions():
             if self.env.context.get("_edi_send_break_on_error"):
                 raise
-            error = _get_exception_msg()
+            error = get_exception_msg()
             state = "output_error_on_send"
             message = exchange_record._exchange_status_message("send_ko")
             res = f"Error: {error}"
@@ -396,6 +457,10 @@ class EDIBackend(models.Model):
             "EDI Exchange output sync: found %d new records to process.",
             len(new_records),
         )
+        batches, new_records = self._split_exchange_records_batches(new_records)
+        batch_actions = ["generate"] if skip_send else ["generate", "send"]
+        for batch in batches:
+            batch.with_delay().action_exchange_batch(batch_actions)
         for rec in new_records:
             job1 = rec.delayable().action_exchange_generate()
             if not skip_send:
@@ -415,6 +480,13 @@ class EDIBackend(models.Model):
             "EDI Exchange output sync: found %d pending records to process.",
             len(pending_records),
         )
+        to_send = pending_records.filtered(
+            lambda x: x.edi_exchange_state == "output_pending"
+        )
+        batches, __ = self._split_exchange_records_batches(to_send)
+        for batch in batches:
+            batch.with_delay().action_exchange_batch(["send"])
+            pending_records -= batch
         for rec in pending_records:
             if rec.edi_exchange_state == "output_pending":
                 rec.with_delay().action_exchange_send()
@@ -422,6 +494,26 @@ class EDIBackend(models.Model):
                 # TODO: run in job as well?
                 self._exchange_output_check_state(rec)
 
+    def _split_exchange_records_batches(self, exchange_records):
+        """Split records to be handled by batch jobs from the other ones.
+
+        Exchange types can define `job_batch_size` in their advanced settings
+        to handle their records by chunks of N records per job.
+
+        :return: tuple (list of batches, records to handle one by one)
+        """
+        batches = []
+        remaining = exchange_records.browse()
+        for exc_type, records in groupby(exchange_records, key=lambda x: x.type_id):
+            records = exchange_records.browse([x.id for x in records])
+            batch_size = exc_type._get_job_batch_size()
+            if batch_size <= 0:
+                remaining |= records
+                continue
+            for chunk_ids in split_every(batch_size, records.ids):
+                batches.append(records.browse(chunk_ids))
+        return batches, remaining
+
     def _output_new_records_domain(self, record_ids=None):
         """Domain for output records needing output content generation."""
         domain = [
@@ -489,7 +581,7 @@ class EDIBackend(models.Model):
         except self._swallable_exceptions():
             if self.env.context.get("_edi_process_break_on_error"):
                 raise
-            error = _get_exception_msg()
+            error = get_exception_msg()
             state = "input_processed_error"
             res = f"Error: {error}"
         else:
@@ -539,14 +631,14 @@ class EDIBackend(models.Model):
                 exchange_record._set_file_content(content)
                 self._validate_data(exchange_record)
         except EDIValidationError:
-            error = _get_exception_msg()
+            error = get_exception_msg()
             state = "validate_error"
             message = exchange_record._exchange_status_message("validate_ko")
             res = f"Validation error: {error}"
         except self._swallable_exceptions():
             if self.env.context.get("_edi_receive_break_on_error"):
                 raise
-            error = _get_exception_msg()
+            error = get_exception_msg()
             state = "input_receive_error"
             message = exchange_record._exchange_status_message("receive_ko")
             res = f"Input error: {error}"
@@ -599,25 +691,59 @@ class EDIBackend(models.Model):
         First work on records that need to receive input.
         Then work on records waiting to be processed.
         """
-        pending_records = self.exchange_record_model.search(
+        count = 0
+        for pending_records in self._iter_exchange_records(
             self._input_pending_records_domain(record_ids=record_ids)
-        )
+        ):
+            count += len(pending_records)
+            batches, pending_records = self._split_exchange_records_batches(
+                pending_records
+            )
+            for batch in batches:
+                batch.with_delay().action_exchange_batch(["receive"])
+            for rec in pending_records:
+                rec.with_delay().action_exchange_receive()
         _logger.info(
             "EDI Exchange input sync: found %d pending records to receive.",
-            len(pending_records),
+            count,
         )
-        for rec in pending_records:
-            rec.with_delay().action_exchange_receive()
 
-        pending_process_records = self.exchange_record_model.search(
+        count = 0
+        for pending_process_records in self._iter_exchange_records(
             self._input_pending_process_records_domain(record_ids=record_ids)
-        )
+        ):
+            count += len(pending_process_records)
+            batches, pending_process_records = self._split_exchange_records_batches(
+                pending_process_records
+            )
+            for batch in batches:
+                batch.with_delay().action_exchange_batch(["process"])
+            for rec in pending_process_records:
+                rec.with_delay().action_exchange_process()
         _logger.info(
             "EDI Exchange input sync: found %d pending records to process.",
-            len(pending_process_records),
+            count,
         )
-        for rec in pending_process_records:
-            rec.with_delay().action_exchange_process()
+
+    def _iter_exchange_records(self, domain, chunk_size=1000):
+        """Search exchange records matching domain, by chunks.
+
+        Keyset pagination on the ID: each chunk is a cheap indexed query
+        and the whole result is never loaded at once.
+        Records handled meanwhile (eg: by quick exec jobs)
+        do not shift the following chunks.
+        """
+        last_id = 0
+        while True:
+            records = self.exchange_record_model.search(
+                domain + [("id", ">", last_id)], order="id", limit=chunk_size
+            )
+            if not records:
+                break
+            yield records
+            if len(records) < chunk_size:
+                break
+            last_id = records[-1].id
 
     def _input_pending_records_domain(self, record_ids=None):
         domain = [
@@ -18,6 +18,10 @@ class EDIExchangeConsumerMixin(models.AbstractModel):
 
     _name = "edi.exchange.consumer.mixin"
     _description = "Abstract record where exchange records can be assigned"
+    # Set to False when the access to the records can't be checked in SQL
+    # (`_search` overridden, access checked in `check_access_rule`...):
+    # the exchange records related to them are then filtered in Python.
+    _edi_exchange_record_access_sql = True
 
     origin_exchange_record_id = fields.Many2one(
         string="EDI origin record",
@@ -0,0 +1,126 @@
+# Copyright 2024 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.tools import html_escape
+
+_logger = logging.getLogger(__name__)
+
+
+class EDIExchangeNotificationLog(models.Model):
+    """Count of the notifications of exchanges on a record.
+
+    Used instead of chatter messages by the exchange types whose notification
+    mode is "digest" (posted later by a cron) or "off" (only counted).
+    One row per record, exchange type, message and day.
+    """
+
+    _name = "edi.exchange.notification.log"
+    _description = "EDI exchange notification log"
+    _log_access = False
+    _order = "event_date desc, id desc"
+
+    # Days the logs of the types whose notifications are off are kept
+    _retention_days = 30
+
+    type_id = fields.Many2one(
+        string="Exchange type",
+        comodel_name="edi.exchange.type",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    model = fields.Char(required=True, index=True)
+    res_id = fields.Many2oneReference(
+        string="Record", required=True, model_field="model"
+    )
+    level = fields.Selection(
+        selection=[("info", "Info"), ("warning", "Warning"), ("error", "Error")],
+        required=True,
+    )
+    message = fields.Char(required=True)
+    event_date = fields.Date(required=True)
+    count = fields.Integer(required=True)
+
+    _sql_constraints = [
+        (
+            "event_uniq",
+            "unique(type_id, model, res_id, level, message, event_date)",
+            "There can be only one log per record, type, message and day",
+        )
+    ]
+
+    @api.model
+    def _log_event(self, exchange_record, target, message, level="info"):
+        """Count a notification of the exchange record on the target record"""
+        self.env.cr.execute(
+            """
+            INSERT INTO edi_exchange_notification_log
+                (type_id, model, res_id, level, message, event_date, count)
+            VALUES (%s, %s, %s, %s, %s, %s, 1)
+            ON CONFLICT ON CONSTRAINT edi_exchange_notification_log_event_uniq
+            DO UPDATE SET count = edi_exchange_notification_log.count + 1
+            """,
+            (
+                exchange_record.type_id.id,
+                target._name,
+                target.id,
+                level,
+                str(message)[:255],
+                fields.Date.context_today(self),
+            ),
+        )
+
+    @api.model
+    def _cron_post_digest(self):
+        """Post one message per record for the logs of the "digest" types
+        and drop the logs of the types whose notifications are off
+        after the retention period."""
+        self.flush()
+        logs = self.search([("type_id.notification_mode", "=", "digest")])
+        logs_by_model = defaultdict(lambda: self.browse())
+        for log in logs:
+            logs_by_model[log.model] |= log
+        subtype_id = self.env.ref("mail.mt_note").id
+        for model, model_logs in logs_by_model.items():
+            if model not in self.env:
+                continue
+            records = self.env[model].browse(model_logs.mapped("res_id")).exists()
+            if not hasattr(records, "message_post"):
+                continue
+            logs_by_res_id = defaultdict(lambda: self.browse())
+            for log in model_logs:
+                logs_by_res_id[log.res_id] |= log
+            for record in records:
+                record.message_post(
+                    body=logs_by_res_id[record.id]._render_digest(),
+                    subtype_id=subtype_id,
+                )
+        _logger.info("EDI notification digest posted for %d record(s)", len(logs))
+        logs.unlink()
+        limit_date = fields.Date.context_today(self) - timedelta(
+            days=self._retention_days
+        )
+        self.search(
+            [
+                ("type_id.notification_mode", "!=", "digest"),
+                ("event_date", "<", limit_date),
+            ]
+        ).unlink()
+
+    def _render_digest(self):
+        lines = [
+            "<li>{type}: {message} ({count})</li>".format(
+                type=html_escape(log.type_id.name),
+                message=html_escape(log.message),
+                count=log.count,
+            )
+            for log in self.sorted(lambda x: (x.event_date, x.type_id.id))
+        ]
+        return "<p><strong>{}</strong></p><ul>{}</ul>".format(
+            html_escape(_("EDI exchanges")), "".join(lines)
+        )
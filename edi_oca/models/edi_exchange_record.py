@@ -4,15 +4,56 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 import base64
+import functools
 import logging
+import threading
+import weakref
 from collections import defaultdict
 
 from odoo import _, api, exceptions, fields, models
+from odoo.http import request
+from odoo.osv.query import Query
+from odoo.tools import groupby, html_escape
 
-from ..utils import exchange_record_job_identity_exact, get_checksum
+from odoo.addons.queue_job.exception import RetryableJobError
+
+from ..utils import exchange_record_job_identity_exact, get_checksum, get_exception_msg
 
 _logger = logging.getLogger(__name__)
 
+# Models referenced by exchange records, for the current transaction:
+# {cursor: tuple of model names}
+_related_models_cache = weakref.WeakKeyDictionary()
+_related_models_lock = threading.Lock()
+
+
+def _clear_related_models_cache(cr):
+    with _related_models_lock:
+        _related_models_cache.pop(cr, None)
+
+
+class RelatedRecordPrefetch:
+    """Lazy iterable of the IDs of the existing related records of a model
+    for the exchange records prefetched with the given one.
+
+    Used as prefetch IDs of the related records, so that reading a field
+    on the related record of an exchange record reads it for all of them.
+    """
+
+    __slots__ = ("exchange_record", "model")
+
+    def __init__(self, exchange_record, model):
+        self.exchange_record = exchange_record
+        self.model = model
+
+    def __iter__(self):
+        exchange_records = self.exchange_record.browse(
+            self.exchange_record._prefetch_ids
+        )
+        for rec in exchange_records:
+            if rec.model == self.model and rec.related_record_exists:
+                yield rec.res_id
+
 
 class EDIExchangeRecord(models.Model):
     """
@@ -132,11 +173,18 @@ class EDIExchangeRecord(models.Model):
 
     @api.depends("model", "type_id")
     def _compute_exchange_filename(self):
+        # Same timestamp for all the records of a type created together
+        dt_by_type = {}
         for rec in self:
             if not rec.type_id:
                 continue
             if not rec.exchange_filename:
-                rec.exchange_filename = rec.type_id._make_exchange_filename(rec)
+                exc_type = rec.type_id
+                if exc_type not in dt_by_type:
+                    dt_by_type[exc_type] = exc_type._make_exchange_filename_datetime()
+                rec.exchange_filename = exc_type._make_exchange_filename(
+                    rec, dt=dt_by_type[exc_type]
+                )
 
     @api.depends("exchange_file")
     def _compute_exchange_filechecksum(self):
@@ -180,10 +228,38 @@ class EDIExchangeRecord(models.Model):
         for rec in self:
             rec.ack_expected = bool(self.type_id.ack_type_id)
 
-    @api.depends("res_id", "model")
+    @api.depends("res_id", "model", "parent_id")
     def _compute_related_record_exists(self):
+        existing_ids = self._get_existing_related_ids()
         for rec in self:
-            rec.related_record_exists = bool(rec.record)
+            if rec.model:
+                rec.related_record_exists = rec.res_id in existing_ids[rec.model]
+            else:
+                rec.related_record_exists = rec.parent_id.related_record_exists
+
+    def _get_existing_related_ids(self):
+        """Return the IDs of the existing related records by model.
+
+        The existence is checked with one query per model.
+        """
+        res_ids_by_model = defaultdict(set)
+        for rec in self:
+            if rec.model and rec.res_id:
+                res_ids_by_model[rec.model].add(rec.res_id)
+        existing_ids = defaultdict(set)
+        for model, res_ids in res_ids_by_model.items():
+            existing_ids[model] = set(self.env[model].browse(res_ids).exists().ids)
+            for res_id in res_ids - existing_ids[model]:
+                _logger.warning(
+                    "Deleted record %s,%s is referenced by edi.exchange.record %s",
+                    model,
+                    res_id,
+                    self.filtered(
+                        lambda x, model=model, res_id=res_id: x.model == model
+                        and x.res_id == res_id
+                    ).ids,
+                )
+        return existing_ids
 
     def needs_ack(self):
         return self.type_id.ack_type_id and not self.ack_exchange_id
@@ -209,7 +285,12 @@ class EDIExchangeRecord(models.Model):
             return None
         if not self.model and self.parent_id:
             return self.parent_id.record
-        return self.env[self.model].browse(self.res_id).exists()
+        # The existence is computed for all the prefetched records at once
+        # and cached for the transaction (`related_record_exists`).
+        if not self.related_record_exists:
+            return self.env[self.model]
+        prefetch = RelatedRecordPrefetch(self, self.model)
+        return self.env[self.model].browse(self.res_id).with_prefetch(prefetch)
 
     def _set_file_content(
         self, output_string, encoding="utf-8", field_name="exchange_file"
@@ -242,18 +323,56 @@ class EDIExchangeRecord(models.Model):
             result.append((rec.id, name))
         return result
 
-    @api.model
-    def create(self, vals):
-        vals["identifier"] = self._get_identifier()
-        rec = super().create(vals)
-        if rec._quick_exec_enabled():
-            rec._execute_next_action()
-        return rec
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals, identifier in zip(vals_list, self._get_identifiers(len(vals_list))):
+            vals["identifier"] = identifier
+        records = super().create(vals_list)
+        if any(vals.get("model") for vals in vals_list):
+            _clear_related_models_cache(self._cr)
+        quick_exec_records = records.filtered(lambda x: x._quick_exec_enabled())
+        if quick_exec_records:
+            quick_exec_records._execute_next_action()
+        return records
 
     @api.model
     def _get_identifier(self):
         return self.env["ir.sequence"].next_by_code("edi.exchange")
 
+    @api.model
+    def _get_identifiers(self, count):
+        """Return `count` new identifiers.
+
+        With a standard sequence (no gap allowed, no date range), the numbers
+        are reserved with one query.
+        """
+        if count < 2:
+            return [self._get_identifier() for __ in range(count)]
+        sequence = (
+            self.env["ir.sequence"]
+            .sudo()
+            .search(
+                [
+                    ("code", "=", "edi.exchange"),
+                    ("company_id", "in", [self.env.company.id, False]),
+                ],
+                order="company_id",
+                limit=1,
+            )
+        )
+        if (
+            not sequence
+            or sequence.implementation != "standard"
+            or sequence.use_date_range
+        ):
+            return [self._get_identifier() for __ in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ("ir_sequence_%03d" % sequence.id, count),
+        )
+        numbers = sorted(row[0] for row in self.env.cr.fetchall())
+        return [sequence.get_next_char(number) for number in numbers]
+
     def _quick_exec_enabled(self):
         if self.env.context.get("edi__skip_quick_exec"):
             return False
@@ -262,11 +381,15 @@ class EDIExchangeRecord(models.Model):
     def _execute_next_action(self):
         # The backend already knows how to handle records
         # according to their direction and status.
-        # Let it decide.
-        if self.type_id.direction == "output":
-            self.backend_id._check_output_exchange_sync(record_ids=self.ids)
-        else:
-            self.backend_id._check_input_exchange_sync(record_ids=self.ids)
+        # Let it decide, once per backend and direction.
+        for (backend, direction), records in groupby(
+            self, key=lambda x: (x.backend_id, x.type_id.direction)
+        ):
+            record_ids = [rec.id for rec in records]
+            if direction == "output":
+                backend._check_output_exchange_sync(record_ids=record_ids)
+            else:
+                backend._check_input_exchange_sync(record_ids=record_ids)
 
     @api.constrains("backend_id", "type_id")
     def _constrain_backend(self):
@@ -320,6 +443,80 @@ class EDIExchangeRecord(models.Model):
         self.ensure_one()
         return self.backend_id.exchange_receive(self)
 
+    def action_exchange_batch(self, actions):
+        """Run given actions on each record of the batch.
+
+        Each record is handled in its own savepoint:
+        a failing record does not prevent the others from being handled.
+
+        The records locked by another transaction (eg: another batch job
+        containing them after the batches shifted between two cron runs)
+        are skipped, as well as the records not expecting the action anymore
+        (eg: already generated or sent).
+
+        :param actions: list of edi actions to run in sequence for each record
+            (eg: ["generate", "send"])
+        """
+        res = []
+        records = self._lock_for_batch()
+        for rec in self - records:
+            res.append(f"{rec.identifier}: Skipped, handled by another job")
+        for rec in records:
+            for action in actions:
+                if not rec._is_batch_action_expected(action):
+                    res.append(f"{rec.identifier} {action}: Skipped, already done")
+                    break
+                try:
+                    with self.env.cr.savepoint():
+                        rec.backend_id._is_valid_edi_action(action, raise_if_not=True)
+                        msg = getattr(rec, "action_exchange_" + action)()
+                except RetryableJobError as err:
+                    # Leave the record untouched, next cron run will pick it up
+                    _logger.info("%s: %s to be retried", rec.identifier, action)
+                    res.append(f"{rec.identifier} {action}: {err}")
+                    break
+                except Exception as err:
+                    _logger.exception("%s: %s failed", rec.identifier, action)
+                    rec.exchange_error = get_exception_msg()
+                    res.append(f"{rec.identifier} {action}: Error: {err}")
+                    break
+                res.append(f"{rec.identifier} {action}: {msg}")
+                if action == "generate" and rec.edi_exchange_state != "output_pending":
+                    # Nothing to send (eg: validation error)
+                    break
+        return "\n".join(res)
+
+    # States of the records expecting the actions of batch jobs
+    _batch_action_states = {
+        "send": ("output_pending", "output_error_on_send"),
+        "receive": ("input_pending",),
+        "process": ("input_received",),
+    }
+
+    def _lock_for_batch(self):
+        """Lock the records not locked by another transaction.
+
+        :return: the locked records, with their current state
+        """
+        if not self:
+            return self
+        self.flush()
+        self.env.cr.execute(
+            "SELECT id FROM edi_exchange_record WHERE id IN %s "
+            "FOR UPDATE SKIP LOCKED",
+            (tuple(self.ids),),
+        )
+        locked_ids = {row[0] for row in self.env.cr.fetchall()}
+        self.invalidate_cache(["edi_exchange_state", "exchange_file"], list(locked_ids))
+        return self.filtered(lambda x: x.id in locked_ids)
+
+    def _is_batch_action_expected(self, action):
+        """Check if the record is still waiting for the action of a batch job"""
+        self.ensure_one()
+        if action == "generate":
+            return self.edi_exchange_state == "new" and not self.exchange_file
+        return self.edi_exchange_state in self._batch_action_states.get(action, ())
+
     def exchange_create_ack_record(self, **kw):
         return self.exchange_create_child_record(
             exc_type=self.type_id.ack_type_id, **kw
@@ -399,15 +596,60 @@ class EDIExchangeRecord(models.Model):
             self.record, "message_post_with_view"
         ):
             return
-        self.record.message_post_with_view(
-            "edi_oca.message_edi_exchange_link",
+        self._post_notification(
+            self.record,
+            message,
+            level=level,
+            template="edi_oca.message_edi_exchange_link",
             values={
                 "backend": self.backend_id,
                 "exchange_record": self,
                 "message": message,
                 "level": level,
             },
-            subtype_id=self.env.ref("mail.mt_note").id,
+        )
+
+    def _post_notification(
+        self, target, message, level="info", template=None, values=None
+    ):
+        """Notify the target record according to the notification mode of the type.
+
+        :param target: record having a chatter
+        :param message: message of the notification
+        :param level: info, warning or error
+        :param template: xmlid of the QWeb template of the "chatter" mode
+        :param values: values to render the template
+        """
+        mode = self.type_id.notification_mode
+        subtype_id = self.env.ref("mail.mt_note").id
+        if mode == "chatter" and template:
+            target.message_post_with_view(
+                template, values=values or {}, subtype_id=subtype_id
+            )
+        elif mode in ("chatter", "compact"):
+            target.message_post(
+                body=self._notification_compact_body(message, level),
+                subtype_id=subtype_id,
+            )
+        else:
+            self.env["edi.exchange.notification.log"].sudo()._log_event(
+                self, target, message, level=level
+            )
+
+    _notification_compact_template = (
+        '<p class="edi-exchange level-{level}">'
+        '<a href="#" data-oe-model="{model}" data-oe-id="{id}">{identifier}</a>'
+        " ({type}): {message}</p>"
+    )
+
+    def _notification_compact_body(self, message, level):
+        return self._notification_compact_template.format(
+            level=level,
+            model=self._name,
+            id=self.id,
+            identifier=html_escape(self.identifier),
+            type=html_escape(self.type_id.name),
+            message=html_escape(message),
         )
 
     def _trigger_edi_event_make_name(self, name, suffix=None):
@@ -460,7 +702,7 @@ class EDIExchangeRecord(models.Model):
         count=False,
         access_rights_uid=None,
     ):
-        ids = super()._search(
+        query = super()._search(
             args,
             offset=offset,
             limit=limit,
@@ -468,76 +710,181 @@ class EDIExchangeRecord(models.Model):
             count=False,
             access_rights_uid=access_rights_uid,
         )
-        if self.env.is_superuser():
+        if not isinstance(query, Query):
+            # Domain known to match nothing
+            return 0 if count else query
+        if not self.env.is_superuser():
             # restrictions do not apply for the superuser
-            return len(ids) if count else ids
+            clause, params = self._get_related_access_clause()
+            query.add_where(clause, params)
+            python_models = self._get_related_python_access_models()
+            if python_models:
+                return self._search_related_access_python(query, python_models, count)
+        if count:
+            # Same as the ORM: ignore order, limit and offset when counting
+            query.order = query.limit = query.offset = None
+            query_str, params = query.select("count(1)")
+            self._cr.execute(query_str, params)
+            return self._cr.fetchone()[0]
+        return query
+
+    def _get_related_models(self):
+        """Return the models referenced by exchange records.
+
+        Loose index scan on the `model` index: one index lookup per model
+        instead of reading the whole table.
+        The result is kept until the end of the transaction
+        or the next change of the related models.
+        """
+        cr = self._cr
+        with _related_models_lock:
+            model_names = _related_models_cache.get(cr)
+        if model_names is not None:
+            return model_names
+        cr.execute(
+            """
+            WITH RECURSIVE models AS (
+                (SELECT model FROM "{table}" WHERE model IS NOT NULL
+                 ORDER BY model LIMIT 1)
+                UNION ALL
+                SELECT (SELECT model FROM "{table}" WHERE model > models.model
+                        ORDER BY model LIMIT 1)
+                FROM models WHERE models.model IS NOT NULL
+            )
+            SELECT model FROM models WHERE model IS NOT NULL AND model != ''
+            """.format(
+                table=self._table
+            )
+        )
+        model_names = tuple(row[0] for row in cr.fetchall())
+        with _related_models_lock:
+            if cr not in _related_models_cache:
+                cr.after("commit", functools.partial(_clear_related_models_cache, cr))
+                cr.after("rollback", functools.partial(_clear_related_models_cache, cr))
+            _related_models_cache[cr] = model_names
+        return model_names
+
+    def _is_related_access_sql(self, model):
+        """Whether the access to the related records can be checked in SQL.
+
+        Related models set `_edi_exchange_record_access_sql = False`
+        to have their exchange records filtered in Python.
+        """
+        return getattr(self.env[model], "_edi_exchange_record_access_sql", True)
 
-        # TODO highlight orphaned EDI records in UI:
-        #  - self.model + self.res_id are set
-        #  - self.record returns empty recordset
-        # Remark: self.record is @property, not field
+    def _get_related_python_access_models(self):
+        """Return the readable related models filtered in Python."""
+        return {
+            model
+            for model in self._get_related_models()
+            if model in self.env
+            and not self.env[model]._abstract
+            and not self._is_related_access_sql(model)
+            and self.env[model].check_access_rights("read", False)
+        }
 
-        if not ids:
-            return 0 if count else []
-        orig_ids = ids
-        ids = set(ids)
-        result = []
-        model_data = defaultdict(
-            lambda: defaultdict(set)
-        )  # {res_model: {res_id: set(ids)}}
-        for sub_ids in self._cr.split_for_in_conditions(ids):
-            self._cr.execute(
-                """
-                            SELECT id, res_id, model
-                            FROM "%s"
-                            WHERE id = ANY (%%(ids)s)"""
-                % self._table,
-                dict(ids=list(sub_ids)),
-            )
-            for eid, res_id, model in self._cr.fetchall():
-                if not model:
-                    result.append(eid)
+    def _search_related_access_python(self, query, model_names, count=False):
+        """Run the query, filtering the exchange records related to the given
+        models with their own access checks, then apply offset and limit.
+        """
+        offset, limit = query.offset, query.limit
+        query.limit = query.offset = None
+        alias = '"{}"'.format(self._table)
+        query_str, params = query.select(
+            "{}.id".format(alias), "{}.model".format(alias), "{}.res_id".format(alias)
+        )
+        self._cr.execute(query_str, params)
+        rows = self._cr.fetchall()
+        res_ids = defaultdict(set)
+        for __, model, res_id in rows:
+            if model in model_names:
+                res_ids[model].add(res_id)
+        allowed = {
+            model: self._get_related_allowed_ids(model, ids)
+            for model, ids in res_ids.items()
+        }
+        ids = [
+            rec_id
+            for rec_id, model, res_id in rows
+            if model not in allowed or res_id in allowed[model]
+        ]
+        if count:
+            return len(ids)
+        ids = ids[offset or 0 :]
+        return ids[:limit] if limit else ids
+
+    def _get_related_allowed_ids(self, model, res_ids):
+        """Return the IDs of the related records readable by the user."""
+        Model = self.env[model].with_context(active_test=False)
+        existing = Model.browse(res_ids).exists()
+        records = Model.search([("id", "in", existing.ids)])
+        try:
+            records.check_access_rule("read")
+        except exceptions.AccessError:
+            allowed = Model.browse()
+            for record in records:
+                try:
+                    record.check_access_rule("read")
+                except exceptions.AccessError:
                     continue
-                model_data[model][res_id].add(eid)
-
-        for model, targets in model_data.items():
-            if not self.env[model].check_access_rights("read", False):
+                allowed |= record
+            records = allowed
+        allowed_ids = set(records.ids)
+        if self.env.is_system():
+            # Group "Settings" can list exchanges where record is deleted
+            allowed_ids |= set(res_ids) - set(existing.ids)
+        return allowed_ids
+
+    def _get_related_access_clause(self):
+        """Return the SQL clause restricting exchange records
+        to the ones the current user can see, and its parameters.
+
+        An exchange record is visible if it has no related record
+        or if its related record is readable: the ir.rules of each related
+        model are applied in a subquery, the whole filtering is done
+        by the database whatever the size of the table.
+        Exchange records whose related record was deleted
+        are only visible for the group "Settings".
+        The exchange records of the models filtered in Python
+        (see `_is_related_access_sql`) are all kept by this clause.
+        """
+        alias = '"{}"'.format(self._table)
+        clauses = ["{0}.model IS NULL OR {0}.model = ''".format(alias)]
+        params = []
+        is_system = self.env.is_system()
+        for model in self._get_related_models():
+            Model = self.env.get(model)
+            if Model is None or Model._abstract:
+                # Module uninstalled: the related records are gone
+                if is_system:
+                    clauses.append("{}.model = %s".format(alias))
+                    params.append(model)
                 continue
-            recs = self.env[model].browse(list(targets))
-            missing = recs - recs.exists()
-            if missing:
-                for res_id in missing.ids:
-                    _logger.warning(
-                        "Deleted record %s,%s is referenced by edi.exchange.record %s",
-                        model,
-                        res_id,
-                        list(targets[res_id]),
-                    )
-                recs = recs - missing
-            allowed = list(
-                self.env[model]
-                .with_context(active_test=False)
-                ._search([("id", "in", recs.ids)])
-            )
-            if self.env.is_system():
+            if not Model.check_access_rights("read", False):
+                continue
+            if not self._is_related_access_sql(model):
+                # Filtered in Python by `_search_related_access_python`
+                clauses.append("{}.model = %s".format(alias))
+                params.append(model)
+                continue
+            allowed = Model.with_context(active_test=False)._search([])
+            if isinstance(allowed, Query):
+                subquery, subquery_params = allowed.subselect()
+                condition = "{}.res_id IN ({})".format(alias, subquery)
+            else:
+                # `_search` overridden to return the records IDs
+                condition = "{}.res_id = ANY(%s)".format(alias)
+                subquery_params = [list(allowed)]
+            clauses.append("({}.model = %s AND {})".format(alias, condition))
+            params += [model] + list(subquery_params)
+            if is_system:
                 # Group "Settings" can list exchanges where record is deleted
-                allowed.extend(missing.ids)
-            for target_id in allowed:
-                result += list(targets[target_id])
-        if len(orig_ids) == limit and len(result) < len(orig_ids):
-            result.extend(
-                self._search(
-                    args,
-                    offset=offset + len(orig_ids),
-                    limit=limit,
-                    order=order,
-                    count=count,
-                    access_rights_uid=access_rights_uid,
-                )[: limit - len(result)]
-            )
-        # Restore original ordering
-        result = [x for x in orig_ids if x in result]
-        return len(result) if count else list(result)
+                clauses.append(
+                    '({0}.model = %s AND NOT EXISTS (SELECT 1 FROM "{1}" related'
+                    " WHERE related.id = {0}.res_id))".format(alias, Model._table)
+                )
+                params.append(model)
+        return "({})".format(" OR ".join(clauses)), params
 
     def read(self, fields=None, load="_classic_read"):
         """Override to explicitely call check_access_rule, that is not called
@@ -563,20 +910,51 @@ class EDIExchangeRecord(models.Model):
                     self.env[exc_rec.model], "get_edi_access", default_checker
                 )
 
+        access_cache = self._get_related_access_cache()
         for model, rec_ids in by_model_rec_ids.items():
-            records = self.env[model].browse(rec_ids).with_user(self._uid)
             checker = by_model_checker[model]
-            for record in records:
-                check_operation = checker(
-                    [record.id], operation, model_name=record._name
-                )
-                record.check_access_rights(check_operation)
-                record.check_access_rule(check_operation)
+            check_operation = checker(list(rec_ids), operation, model_name=model)
+            allowed_ids = access_cache[
+                (self._uid, tuple(self.env.companies.ids), model, check_operation)
+            ]
+            rec_ids -= allowed_ids
+            if not rec_ids:
+                continue
+            records = self.env[model].browse(rec_ids).with_user(self._uid)
+            records.check_access_rights(check_operation)
+            records.check_access_rule(check_operation)
+            allowed_ids.update(rec_ids)
+
+    def _get_related_access_cache(self):
+        """Return the related record IDs already granted in the current request.
+
+        {(uid, company IDs, model, operation): set of IDs}, shared by all
+        the access checks (read, write...) of the request. Outside of HTTP
+        requests (crons, shell...), the access is checked each time.
+        """
+        if not request:
+            return defaultdict(set)
+        cache = getattr(request, "_edi_related_access_cache", None)
+        if cache is None:
+            cache = request._edi_related_access_cache = defaultdict(set)
+        return cache
+
+    def _clear_related_access_cache(self):
+        if request and hasattr(request, "_edi_related_access_cache"):
+            del request._edi_related_access_cache
 
     def write(self, vals):
         self.check_access_rule("write")
+        if vals.get("model"):
+            _clear_related_models_cache(self._cr)
+        if "model" in vals or "res_id" in vals:
+            self._clear_related_access_cache()
         return super().write(vals)
 
+    def unlink(self):
+        self._clear_related_access_cache()
+        return super().unlink()
+
     def _job_delay_params(self):
         params = {}
         channel = self.type_id.sudo().job_channel_id
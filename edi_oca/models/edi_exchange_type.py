@@ -2,13 +2,20 @@
 # Copyright 2021 Camptocamp SA
 # @author Simone Orsi <simahawk@gmail.com>
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+import copy
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 from pytz import timezone, utc
 
 from odoo import _, api, exceptions, fields, models
-from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT as DATETIME_FORMAT, groupby
+from odoo.tools import (
+    DEFAULT_SERVER_DATETIME_FORMAT as DATETIME_FORMAT,
+    frozendict,
+    groupby,
+)
 
 from odoo.addons.base_sparse_field.models.fields import Serialized
 from odoo.addons.http_routing.models.ir_http import slugify
@@ -21,6 +28,23 @@ try:
 except ImportError:
     _logger.debug("`yaml` lib is missing")
 
+# Parsed advanced settings shared by all the environments of the process:
+# {(dbname, exchange type ID, YAML settings): (settings, read-only settings)}.
+# The YAML being part of the key, a modified type never hits a stale entry.
+# Least recently used entries are dropped first.
+_settings_cache = OrderedDict()
+_settings_cache_lock = threading.Lock()
+_SETTINGS_CACHE_SIZE = 1024
+
+
+def _freeze_settings(value):
+    """Return a read-only version of the given settings."""
+    if isinstance(value, dict):
+        return frozendict({k: _freeze_settings(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze_settings(v) for v in value)
+    return value
+
 
 class EDIExchangeType(models.Model):
     """
@@ -106,11 +130,16 @@ class EDIExchangeType(models.Model):
                 force_tz: Europe/Rome
                 date_pattern: %Y-%m-%d-%H-%M-%S
 
+              # handle records by chunks of N records per job in crons
+              job_batch_size: 100
+
             In any case, you can use these settings
             to provide your own configuration for whatever need you might have.
         """,
     )
-    advanced_settings = Serialized(default={}, compute="_compute_advanced_settings")
+    advanced_settings = Serialized(
+        default={}, compute="_compute_advanced_settings", store=True
+    )
     rule_ids = fields.One2many(
         comodel_name="edi.exchange.type.rule",
         inverse_name="type_id",
@@ -143,6 +172,22 @@ class EDIExchangeType(models.Model):
         help="When active, records of this type will be processed immediately "
         "without waiting for the cron to pass by.",
     )
+    notification_mode = fields.Selection(
+        selection=[
+            ("chatter", "Chatter message"),
+            ("compact", "Compact chatter message"),
+            ("digest", "Digest"),
+            ("off", "Off"),
+        ],
+        default="chatter",
+        required=True,
+        help="How exchanges notify their related record:\n"
+        "* Chatter message: detailed message for each event;\n"
+        "* Compact chatter message: short message for each event;\n"
+        "* Digest: one message per record summarizing the events, "
+        "posted by a cron;\n"
+        "* Off: no message, the events are only counted.",
+    )
     partner_ids = fields.Many2many(
         string="Enabled for partners",
         comodel_name="res.partner",
@@ -170,13 +215,80 @@ class EDIExchangeType(models.Model):
     @api.depends("advanced_settings_edit")
     def _compute_advanced_settings(self):
         for rec in self:
-            rec.advanced_settings = rec._load_advanced_settings()
+            try:
+                rec.advanced_settings = rec._load_advanced_settings()
+            except exceptions.ValidationError:
+                # Reported to the user by `_check_advanced_settings`
+                rec.advanced_settings = {}
 
     def _load_advanced_settings(self):
-        # TODO: validate settings w/ a schema.
-        # Could be done w/ Cerberus or JSON-schema.
-        # This would help documenting core and custom keys.
-        return yaml.safe_load(self.advanced_settings_edit or "") or {}
+        try:
+            settings = yaml.safe_load(self.advanced_settings_edit or "") or {}
+        except yaml.YAMLError as err:
+            raise exceptions.ValidationError(
+                _("Invalid YAML in the advanced settings of %s:\n%s")
+                % (self.display_name, err)
+            )
+        self._validate_advanced_settings(settings)
+        return settings
+
+    def _advanced_settings_schema(self):
+        """Return the schema of the core advanced settings keys.
+
+        Each value of the schema is either the expected type(s)
+        or the schema of a sub-dictionary.
+        Keys not in the schema are not validated:
+        you can still add your own configuration.
+        Override to document and validate your keys.
+        """
+        component_conf = {"usage": str, "work_ctx": dict, "env_ctx": dict}
+        return {
+            "components": {
+                key: component_conf
+                for key in (
+                    "generate",
+                    "validate",
+                    "check",
+                    "send",
+                    "receive",
+                    "process",
+                )
+            },
+            "filename_pattern": {"force_tz": str, "date_pattern": str},
+            "job_batch_size": int,
+        }
+
+    def _validate_advanced_settings(self, settings):
+        errors = self._get_advanced_settings_errors(
+            settings, self._advanced_settings_schema()
+        )
+        if errors:
+            raise exceptions.ValidationError(
+                _("Invalid advanced settings for %s:\n%s")
+                % (self.display_name, "\n".join(errors))
+            )
+
+    def _get_advanced_settings_errors(self, settings, schema, path=""):
+        if not isinstance(settings, dict):
+            return [_("%s must be a dictionary") % (path or _("Settings"))]
+        errors = []
+        for key, spec in schema.items():
+            if key not in settings or settings[key] is None:
+                continue
+            value = settings[key]
+            key_path = "{}.{}".format(path, key) if path else key
+            if isinstance(spec, dict):
+                errors += self._get_advanced_settings_errors(value, spec, key_path)
+            elif not isinstance(value, spec) or (
+                isinstance(value, bool) and spec is int
+            ):
+                errors.append(_("%s: unexpected value %r") % (key_path, value))
+        return errors
+
+    @api.constrains("advanced_settings_edit")
+    def _check_advanced_settings(self):
+        for rec in self:
+            rec._load_advanced_settings()
 
     def _compute_ack_for_type_ids(self):
         ack_for = self.search([("ack_type_id", "in", self.ids)])
@@ -184,12 +296,49 @@ class EDIExchangeType(models.Model):
         for rec in self:
             rec.ack_for_type_ids = [x.id for x in by_type_id.get(rec.id, [])]
 
-    def get_settings(self):
-        return self.advanced_settings
+    def get_settings(self, readonly=False):
+        """Return the parsed advanced settings.
+
+        The settings are parsed and stored as JSON when the YAML is saved,
+        then cached for the whole registry: no YAML parsing on hot paths.
+        A copy is returned, callers can modify it.
+
+        :param readonly: return the cached settings without copying them,
+            read-only (dictionaries are frozen, lists become tuples).
+        """
+        if not self:
+            return {}
+        self.ensure_one()
+        if not isinstance(self.id, int):
+            # New record (eg: onchange), nothing to share
+            settings = self.advanced_settings or {}
+            return _freeze_settings(settings) if readonly else copy.deepcopy(settings)
+        key = (self.env.cr.dbname, self.id, self.advanced_settings_edit or "")
+        with _settings_cache_lock:
+            cached = _settings_cache.get(key)
+            if cached is not None:
+                _settings_cache.move_to_end(key)
+        if cached is None:
+            settings = self.advanced_settings or {}
+            cached = (settings, _freeze_settings(settings))
+            with _settings_cache_lock:
+                _settings_cache[key] = cached
+                while len(_settings_cache) > _SETTINGS_CACHE_SIZE:
+                    _settings_cache.popitem(last=False)
+        settings, frozen_settings = cached
+        return frozen_settings if readonly else copy.deepcopy(settings)
 
     def set_settings(self, val):
         self.advanced_settings_edit = val
 
+    def _get_job_batch_size(self):
+        """Return the number of records to handle per job in crons.
+
+        0 means one job per record.
+        """
+        self.ensure_one()
+        return int(self.get_settings(readonly=True).get("job_batch_size") or 0)
+
     @api.constrains("backend_id", "backend_type_id")
     def _check_backend(self):
         for rec in self:
@@ -209,19 +358,22 @@ class EDIExchangeType(models.Model):
             date_pattern: %Y-%m-%d-%H-%M-%S
         """
         self.ensure_one()
-        pattern_settings = self.advanced_settings.get("filename_pattern", {})
+        pattern_settings = self.get_settings(readonly=True).get("filename_pattern", {})
         force_tz = pattern_settings.get("force_tz", self.env.user.tz)
         date_pattern = pattern_settings.get("date_pattern", DATETIME_FORMAT)
         tz = timezone(force_tz) if force_tz else None
         now = datetime.now(utc).astimezone(tz)
         return slugify(now.strftime(date_pattern))
 
-    def _make_exchange_filename(self, exchange_record):
-        """Generate filename."""
+    def _make_exchange_filename(self, exchange_record, dt=None):
+        """Generate filename.
+
+        :param dt: formatted datetime, computed by default
+        """
         pattern = self.exchange_filename_pattern
         ext = self.exchange_file_ext
         pattern = pattern + ".{ext}"
-        dt = self._make_exchange_filename_datetime()
+        dt = dt or self._make_exchange_filename_datetime()
         record_name = self._get_record_name(exchange_record)
         record = exchange_record
         if exchange_record.model and exchange_record.res_id:
@@ -3,6 +3,7 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 from odoo import fields, models
+from odoo.exceptions import AccessError
 
 
 class EdiExchangeConsumerTest(models.Model):
@@ -14,3 +15,22 @@ class EdiExchangeConsumerTest(models.Model):
 
     def _get_edi_exchange_record_name(self, exchange_record):
         return self.id
+
+
+class EdiExchangeConsumerPythonAccessTest(models.Model):
+    _name = "edi.exchange.consumer.python.access.test"
+    _inherit = ["edi.exchange.consumer.mixin"]
+    _description = "Model with access checked in Python used only for test"
+    _edi_exchange_record_access_sql = False
+
+    name = fields.Char()
+
+    def _get_edi_exchange_record_name(self, exchange_record):
+        return self.id
+
+    def check_access_rule(self, operation):
+        super().check_access_rule(operation)
+        if self.env.is_superuser():
+            return
+        if any(rec.name == "secret" for rec in self.sudo()):
+            raise AccessError("Secret record")
@@ -115,3 +115,26 @@ class EDIBackendTestJobsCase(EDIBackendCommonTestCase, JobMixin):
         new_created = job_counter.search_created() - created
         # Should not create new job
         self.assertEqual(len(new_created), 0)
+
+    def test_input_batch(self):
+        self.exchange_type_in.advanced_settings_edit = "job_batch_size: 2"
+        records = self.env["edi.exchange.record"]
+        for __ in range(3):
+            record = self.backend.create_record(
+                "test_csv_input", {"edi_exchange_state": "input_received"}
+            )
+            record._set_file_content("ABC")
+            records |= record
+        chunks = list(
+            self.backend._iter_exchange_records(
+                [("id", "in", records.ids)], chunk_size=2
+            )
+        )
+        self.assertEqual([len(x) for x in chunks], [2, 1])
+        job_counter = self.job_counter()
+        self.backend._check_input_exchange_sync(record_ids=records.ids)
+        created = job_counter.search_created()
+        # One job per chunk of 2 records
+        self.assertEqual(len(created), 2)
+        self.assertEqual(set(created.mapped("method_name")), {"action_exchange_batch"})
+        self.assertEqual(sorted(len(job.record_ids) for job in created), [1, 2])
@@ -2,7 +2,9 @@
 # @author: Simone Orsi <simahawk@gmail.com>
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
-from odoo.addons.component.core import Component
+import mock
+
+from odoo.addons.component.core import Component, WorkContext
 
 from .common import EDIBackendCommonComponentRegistryTestCase
 
@@ -69,3 +71,37 @@ class EDIBackendTestMatchCase(EDIBackendCommonComponentRegistryTestCase):
             exchange_type="test_csv_output",
         )
         self.assertEqual(component._name, MatchByExchangeTypeOnly._name)
+
+    def test_component_lookup_cache(self):
+        class MatchByExchangeType(Component):
+            _name = "exchange_type.cached"
+            _inherit = "edi.component.mixin"
+            _usage = "generate"
+            _exchange_type = "test_lookup_cache"
+            _apply_on = ["res.partner"]
+
+        self._build_components(MatchByExchangeType)
+        work_ctx = {"exchange_record": self.env["edi.exchange.record"].browse()}
+        lookups = []
+        orig_matching_components = WorkContext._matching_components
+
+        def _matching_components(work, **kw):
+            lookups.append(kw)
+            return orig_matching_components(work, **kw)
+
+        with mock.patch.object(
+            WorkContext, "_matching_components", _matching_components
+        ):
+            for __ in range(3):
+                component = self.backend._find_component(
+                    "res.partner",
+                    ["generate"],
+                    work_ctx=dict(work_ctx),
+                    exchange_type="test_lookup_cache",
+                )
+                self.assertEqual(component._name, MatchByExchangeType._name)
+                self.assertEqual(
+                    component.work.exchange_record, work_ctx["exchange_record"]
+                )
+        # Resolved once, then taken from the cache
+        self.assertEqual(len(lookups), 1)
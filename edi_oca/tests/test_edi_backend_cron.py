@@ -2,6 +2,8 @@
 # @author: Simone Orsi <simahawk@gmail.com>
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+import mock
+
 from odoo.tools import mute_logger
 
 from .common import EDIBackendCommonComponentRegistryTestCase
@@ -92,3 +94,68 @@ class EDIBackendTestCronCase(EDIBackendCommonComponentRegistryTestCase):
         self.assertTrue(FakeOutputGenerator.check_not_called_for(self.record1))
         self.assertTrue(FakeOutputSender.check_not_called_for(self.record1))
         self.assertTrue(FakeOutputChecker.check_called_for(self.record1))
+
+    @mute_logger(*LOGGERS)
+    def test_exchange_generate_new_auto_send_batch(self):
+        self.exchange_type_out.exchange_file_auto_generate = True
+        self.exchange_type_out.advanced_settings_edit = "job_batch_size: 2"
+        batches, remaining = self.backend._split_exchange_records_batches(
+            self.record1 + self.record2 + self.record3
+        )
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[0], self.record1 + self.record2)
+        self.assertEqual(batches[1], self.record3)
+        self.assertFalse(remaining)
+        self.backend._cron_check_output_exchange_sync()
+        for rec in self.record1 + self.record2 + self.record3:
+            self.assertEqual(rec.edi_exchange_state, "output_sent")
+            self.assertTrue(FakeOutputGenerator.check_called_for(rec))
+            self.assertTrue(FakeOutputSender.check_called_for(rec))
+
+    @mute_logger(*LOGGERS, "odoo.addons.edi_oca.models.edi_exchange_record")
+    def test_exchange_generate_new_auto_send_batch_error(self):
+        self.exchange_type_out.exchange_file_auto_generate = True
+        self.exchange_type_out.advanced_settings_edit = "job_batch_size: 10"
+        self.backend.with_context(
+            test_break_generate="OOPS! Something went wrong :("
+        )._cron_check_output_exchange_sync()
+        for rec in self.record1 + self.record2 + self.record3:
+            # Every record has been handled and keeps its own error
+            self.assertTrue(FakeOutputGenerator.check_called_for(rec))
+            self.assertEqual(rec.edi_exchange_state, "new")
+            self.assertIn("OOPS! Something went wrong :(", rec.exchange_error)
+            self.assertTrue(FakeOutputSender.check_not_called_for(rec))
+
+    @mute_logger(*LOGGERS, "odoo.addons.edi_oca.models.edi_exchange_record")
+    def test_exchange_batch_skip_done(self):
+        self.exchange_type_out.exchange_file_auto_generate = True
+        records = self.record1 + self.record2
+        self.record1.action_exchange_generate()
+        self.record1.action_exchange_send()
+        FakeOutputGenerator.reset_faked()
+        FakeOutputSender.reset_faked()
+        # The first record has been handled meanwhile by another job
+        res = records.action_exchange_batch(["generate", "send"])
+        self.assertIn(f"{self.record1.identifier} generate: Skipped", res)
+        self.assertTrue(FakeOutputGenerator.check_not_called_for(self.record1))
+        self.assertTrue(FakeOutputSender.check_not_called_for(self.record1))
+        self.assertEqual(self.record1.edi_exchange_state, "output_sent")
+        self.assertFalse(self.record1.exchange_error)
+        self.assertEqual(self.record2.edi_exchange_state, "output_sent")
+        self.assertTrue(FakeOutputSender.check_called_for(self.record2))
+
+    @mute_logger(*LOGGERS, "odoo.addons.edi_oca.models.edi_exchange_record")
+    def test_exchange_batch_invalid_action(self):
+        self.exchange_type_out.exchange_file_auto_generate = True
+        records = self.record1 + self.record2
+        with mock.patch.object(
+            type(self.backend),
+            "_is_valid_edi_action",
+            side_effect=[AssertionError("Invalid action"), True, True],
+        ):
+            res = records.action_exchange_batch(["generate", "send"])
+        # The error is reported on the record, the others are handled
+        self.assertIn(f"{self.record1.identifier} generate: Error", res)
+        self.assertTrue(FakeOutputGenerator.check_not_called_for(self.record1))
+        self.assertIn("Invalid action", self.record1.exchange_error)
+        self.assertEqual(self.record2.edi_exchange_state, "output_sent")
@@ -3,8 +3,11 @@
 # @author: Simone Orsi <simahawk@gmail.com>
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+from unittest import mock
+
 from freezegun import freeze_time
 
+from odoo import exceptions
 from odoo.tools import mute_logger
 
 from .common import EDIBackendCommonTestCase
@@ -66,6 +69,54 @@ class EDIExchangeTypeTestCase(EDIBackendCommonTestCase):
         })
         # fmt:on
 
+    def test_advanced_settings_stored(self):
+        exc_type = self.exchange_type_out
+        exc_type.advanced_settings_edit = """
+        components:
+            generate:
+                usage: edi.output.generate.demo
+                env_ctx:
+                    opt: True
+        job_batch_size: 10
+        """
+        exc_type.flush()
+        self.env.cr.execute(
+            "SELECT advanced_settings FROM edi_exchange_type WHERE id = %s",
+            (exc_type.id,),
+        )
+        self.assertIn("edi.output.generate.demo", self.env.cr.fetchone()[0])
+        settings = exc_type.get_settings()
+        self.assertEqual(settings["job_batch_size"], 10)
+        # Callers get their own copy, or the shared read-only settings
+        settings["components"]["generate"]["env_ctx"]["opt"] = False
+        readonly_settings = exc_type.get_settings(readonly=True)
+        self.assertIs(readonly_settings, exc_type.get_settings(readonly=True))
+        with self.assertRaises(NotImplementedError):
+            readonly_settings["components"]["generate"]["env_ctx"]["opt"] = False
+        # The settings are not parsed again
+        with mock.patch.object(type(exc_type), "_load_advanced_settings") as mocked:
+            settings = exc_type.get_settings()
+            self.assertEqual(exc_type._get_job_batch_size(), 10)
+        mocked.assert_not_called()
+        self.assertTrue(settings["components"]["generate"]["env_ctx"]["opt"])
+        # A change of the YAML is seen right away
+        exc_type.advanced_settings_edit = "job_batch_size: 20"
+        self.assertEqual(exc_type._get_job_batch_size(), 20)
+
+    def test_advanced_settings_validation(self):
+        exc_type = self.exchange_type_out
+        for invalid in (
+            "components: [",
+            "- not a dict",
+            "job_batch_size: many",
+            "components:\n  generate: edi.output.generate.demo",
+            "filename_pattern:\n  force_tz: 1",
+        ):
+            with self.assertRaises(exceptions.ValidationError):
+                with self.env.cr.savepoint():
+                    exc_type.advanced_settings_edit = invalid
+                    exc_type.flush()
+
     def _test_exchange_filename(self, wanted_filename):
         filename = self.exchange_type_out._make_exchange_filename(
             exchange_record=self.env["edi.exchange.record"]
@@ -0,0 +1,62 @@
+# Copyright 2024 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from .common import EDIBackendCommonTestCase
+
+
+class EDINotificationTestCase(EDIBackendCommonTestCase):
+    @classmethod
+    def _setup_records(cls):
+        super()._setup_records()
+        cls.exc_record = cls.backend.create_record(
+            "test_csv_output",
+            {"model": cls.partner._name, "res_id": cls.partner.id},
+        )
+        cls.log_model = cls.env["edi.exchange.notification.log"]
+
+    def _notify_twice(self, mode):
+        self.exchange_type_out.notification_mode = mode
+        messages = self.partner.message_ids
+        self.exc_record._notify_related_record("Exchange sent")
+        self.exc_record._notify_related_record("Exchange sent")
+        self.partner.invalidate_cache(["message_ids"])
+        return self.partner.message_ids - messages
+
+    def _get_logs(self):
+        return self.log_model.search(
+            [("model", "=", self.partner._name), ("res_id", "=", self.partner.id)]
+        )
+
+    def test_notify_chatter(self):
+        new_messages = self._notify_twice("chatter")
+        self.assertEqual(len(new_messages), 2)
+        self.assertIn("edi-exchange-type", new_messages[0].body)
+        self.assertFalse(self._get_logs())
+
+    def test_notify_compact(self):
+        new_messages = self._notify_twice("compact")
+        self.assertEqual(len(new_messages), 2)
+        self.assertIn(self.exc_record.identifier, new_messages[0].body)
+        self.assertNotIn("edi-exchange-type", new_messages[0].body)
+        self.assertFalse(self._get_logs())
+
+    def test_notify_digest(self):
+        self.assertFalse(self._notify_twice("digest"))
+        logs = self._get_logs()
+        self.assertEqual(len(logs), 1)
+        self.assertEqual(logs.count, 2)
+        self.assertEqual(logs.message, "Exchange sent")
+        messages = self.partner.message_ids
+        self.log_model._cron_post_digest()
+        self.partner.invalidate_cache(["message_ids"])
+        new_messages = self.partner.message_ids - messages
+        self.assertEqual(len(new_messages), 1)
+        self.assertIn("Exchange sent (2)", new_messages.body)
+        self.assertFalse(self._get_logs().exists())
+
+    def test_notify_off(self):
+        self.assertFalse(self._notify_twice("off"))
+        self.assertEqual(self._get_logs().count, 2)
+        self.log_model._cron_post_digest()
+        # Kept for the retention period
+        self.assertEqual(self._get_logs().count, 2)
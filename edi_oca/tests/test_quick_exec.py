@@ -75,6 +75,30 @@ class EDIQuickExecTestCase(EDIBackendCommonComponentRegistryTestCase):
             record0._get_file_content(), FakeOutputGenerator._call_key(record0)
         )
 
+    def test_quick_exec_on_create_multi(self):
+        self.exchange_type_out.exchange_file_auto_generate = True
+        self.exchange_type_out.quick_exec = True
+        partners = self.partner | self.partner2 | self.partner3
+        values_list = [
+            {"model": partner._name, "res_id": partner.id} for partner in partners
+        ]
+        backend_model = type(self.backend)
+        check_output = backend_model._check_output_exchange_sync
+        with mock.patch.object(
+            backend_model,
+            "_check_output_exchange_sync",
+            autospec=True,
+            side_effect=check_output,
+        ) as mocked:
+            records = self.backend.create_records("test_csv_output", values_list)
+        # One sync for the whole batch
+        mocked.assert_called_once()
+        self.assertEqual(len(set(records.mapped("identifier"))), 3)
+        self.assertTrue(all(x.startswith("EDI/") for x in records.mapped("identifier")))
+        self.assertEqual(set(records.mapped("edi_exchange_state")), {"output_sent"})
+        for record in records:
+            self.assertTrue(FakeOutputGenerator.check_called_for(record))
+
     def test_quick_exec_on_create_in(self):
         self.exchange_type_in.quick_exec = True
         vals = {
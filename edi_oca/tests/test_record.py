@@ -103,6 +103,38 @@ class EDIRecordTestCase(EDIBackendCommonTestCase):
         self.assertFalse(record1.record)
         self.assertFalse(record1.related_name)
 
+    def _count_related_queries(self, records):
+        records.invalidate_cache()
+        records = records.browse(records.ids)
+        count = self.env.cr.sql_log_count
+        for rec in records:
+            rec.name_get()
+            rec.related_record_exists
+            rec.related_name
+        return self.env.cr.sql_log_count - count
+
+    def test_related_record_batch(self):
+        partners = self.env["res.partner"].create(
+            [{"name": "Partner %d" % i} for i in range(6)]
+        )
+        records = self.env["edi.exchange.record"]
+        for partner in partners:
+            records |= self.backend.create_record(
+                "test_csv_output", {"model": partner._name, "res_id": partner.id}
+            )
+        records.flush()
+        # The number of queries does not depend on the number of records
+        self.assertEqual(
+            self._count_related_queries(records[:2]),
+            self._count_related_queries(records),
+        )
+        partners[0].unlink()
+        self.assertEqual(records.mapped("related_record_exists"), [False] + [True] * 5)
+        self.assertFalse(records[0].record)
+        self.assertEqual(
+            records[1:].mapped("related_name"), partners[1:].mapped("name")
+        )
+
     def test_record_empty_with_parent(self):
         """Simulate child record doesn't have a model and res_id.
 
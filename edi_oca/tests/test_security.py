@@ -2,6 +2,9 @@
 # @author: Enric Tobella
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
+from types import SimpleNamespace
+from unittest import mock
+
 from odoo_test_helper import FakeModelLoader
 
 from odoo.exceptions import AccessError
@@ -17,9 +20,14 @@ class TestEDIExchangeRecordSecurity(EDIBackendCommonTestCase):
         # Load fake models ->/
         cls.loader = FakeModelLoader(cls.env, cls.__module__)
         cls.loader.backup_registry()
-        from .fake_models import EdiExchangeConsumerTest
+        from .fake_models import (
+            EdiExchangeConsumerPythonAccessTest,
+            EdiExchangeConsumerTest,
+        )
 
-        cls.loader.update_registry((EdiExchangeConsumerTest,))
+        cls.loader.update_registry(
+            (EdiExchangeConsumerTest, EdiExchangeConsumerPythonAccessTest)
+        )
 
         cls.group = cls.env["res.groups"].create({"name": "Demo Group"})
         cls.ir_access = cls.env["ir.model.access"].create(
@@ -105,6 +113,52 @@ class TestEDIExchangeRecordSecurity(EDIBackendCommonTestCase):
             exchange_record.with_user(self.user).read()
 
     @mute_logger("odoo.addons.base.models.ir_rule")
+    def test_group_read_bulk(self):
+        exchange_records = self.create_record() | self.create_record()
+        exchange_records |= self.create_record()
+        self.user.write({"groups_id": [(4, self.group.id)]})
+        consumer_model = type(self.consumer_record)
+        check_access_rule = consumer_model.check_access_rule
+        with mock.patch.object(
+            consumer_model,
+            "check_access_rule",
+            autospec=True,
+            side_effect=check_access_rule,
+        ) as mocked:
+            exchange_records.with_user(self.user).read(["identifier"])
+            # One check for all the related records
+            self.assertEqual(mocked.call_count, 1)
+            mocked.reset_mock()
+            fake_request = SimpleNamespace()
+            with mock.patch(
+                "odoo.addons.edi_oca.models.edi_exchange_record.request",
+                fake_request,
+            ):
+                exchange_records.with_user(self.user).read(["identifier"])
+                exchange_records.with_user(self.user).write(
+                    {"exchange_filename": "bulk.csv"}
+                )
+                exchange_records.with_user(self.user).read(["identifier"])
+            # Checked once per operation in the same request
+            self.assertEqual(
+                [call[0][1] for call in mocked.call_args_list], ["read", "write"]
+            )
+            mocked.reset_mock()
+            with mock.patch(
+                "odoo.addons.edi_oca.models.edi_exchange_record.request",
+                fake_request,
+            ):
+                exchange_records.with_user(self.user).read(["identifier"])
+                exchange_records.with_user(self.user).write(
+                    {"res_id": self.consumer_record.id}
+                )
+                exchange_records.with_user(self.user).read(["identifier"])
+            # Checked again once the related records change
+            self.assertEqual(
+                [call[0][1] for call in mocked.call_args_list],
+                ["write", "read"],
+            )
+
     def test_rule_no_read(self):
         exchange_record = self.create_record()
         self.user.write({"groups_id": [(4, self.group.id)]})
@@ -179,15 +233,96 @@ class TestEDIExchangeRecordSecurity(EDIBackendCommonTestCase):
             f"Deleted record {exchange_record.model},{exchange_record.res_id} "
             f"is referenced by edi.exchange.record [{exchange_record.id}]"
         )
+        self.assertEqual(
+            0,
+            self.env["edi.exchange.record"]
+            .with_user(self.user)
+            .search_count([("id", "=", exchange_record.id)]),
+        )
         with self.assertLogs(logger_name, "WARNING") as watcher:
-            self.assertEqual(
-                0,
-                self.env["edi.exchange.record"]
-                .with_user(self.user)
-                .search_count([("id", "=", exchange_record.id)]),
-            )
+            self.assertFalse(exchange_record.related_record_exists)
             self.assertEqual(watcher.output, [expected_msg])
 
+    def test_search_paginated(self):
+        self.user.write({"groups_id": [(4, self.group.id)]})
+        hidden = self.consumer_record.copy({"name": "no_rule"})
+        records = self.env["edi.exchange.record"]
+        for __ in range(3):
+            records |= self.create_record()
+            records |= self.create_record()
+            records |= self.backend.create_record(
+                "test_csv_output", {"model": hidden._name, "res_id": hidden.id}
+            )
+        model = self.env["edi.exchange.record"].with_user(self.user)
+        domain = [("id", "in", records.ids)]
+        visible = model.search(domain)
+        self.assertEqual(len(visible), 6)
+        self.assertEqual(model.search_count(domain), 6)
+        # Pages are filled even when hidden records are interleaved
+        self.assertEqual(model.search(domain, limit=4), visible[:4])
+        self.assertEqual(model.search(domain, offset=4, limit=4), visible[4:])
+
+    def test_search_empty_domain(self):
+        self.create_record()
+        self.user.write({"groups_id": [(4, self.group.id)]})
+        model = self.env["edi.exchange.record"].with_user(self.user)
+        # The ORM does not build any query for these domains
+        self.assertFalse(model.search([("id", "in", [])]))
+        self.assertEqual(model.search_count([("id", "in", [])]), 0)
+
+    def test_search_related_models_cache(self):
+        exchange_record = self.create_record()
+        self.user.write({"groups_id": [(4, self.group.id)]})
+        model = self.env["edi.exchange.record"].with_user(self.user)
+        domain = [("id", "=", exchange_record.id)]
+
+        def count_related_models_queries():
+            with mock.patch.object(
+                self.env.cr, "execute", wraps=self.env.cr.execute
+            ) as execute:
+                self.assertEqual(model.search_count(domain), 1)
+            return len(
+                [c for c in execute.call_args_list if "RECURSIVE" in str(c[0][0])]
+            )
+
+        model.search_count(domain)
+        # The related models are kept for the transaction
+        self.assertEqual(count_related_models_queries(), 0)
+        # and read again when they change
+        exchange_record.write({"model": exchange_record.model})
+        self.assertEqual(count_related_models_queries(), 1)
+
+    def test_search_python_access(self):
+        consumer_model = self.env["edi.exchange.consumer.python.access.test"]
+        self.env["ir.model.access"].create(
+            {
+                "name": "python access model access",
+                "model_id": self.env["ir.model"]._get(consumer_model._name).id,
+                "group_id": self.group.id,
+                "perm_read": True,
+            }
+        )
+        visible = consumer_model.create({"name": "test"})
+        secret = consumer_model.create({"name": "secret"})
+        records = self.env["edi.exchange.record"]
+        for related in (visible, secret, visible, secret, visible):
+            records |= self.backend.create_record(
+                "test_csv_output", {"model": related._name, "res_id": related.id}
+            )
+        self.user.write({"groups_id": [(4, self.group.id)]})
+        model = self.env["edi.exchange.record"].with_user(self.user)
+        domain = [("id", "in", records.ids)]
+        # check_access_rule is not expressed in SQL: filtered in Python
+        visible_records = model.search(domain)
+        self.assertEqual(visible_records.mapped("res_id"), [visible.id] * 3)
+        self.assertEqual(model.search_count(domain), 3)
+        self.assertEqual(model.search(domain, offset=1, limit=1), visible_records[1])
+        # The other related models are still filtered in SQL
+        exchange_record = self.create_record()
+        self.assertEqual(model.search_count([("id", "=", exchange_record.id)]), 1)
+        self.consumer_record.name = "no_rule"
+        self.assertEqual(model.search_count([("id", "=", exchange_record.id)]), 0)
+
     def test_search_no_record_admin(self):
         # Consumer record no longer exists:
         #  user with group "Settings" has access
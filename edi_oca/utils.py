@@ -3,6 +3,8 @@
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
 import hashlib
+import traceback
+from io import StringIO
 
 from odoo.addons.http_routing.models.ir_http import slugify
 from odoo.addons.queue_job.job import identity_exact_hasher
@@ -17,6 +19,15 @@ def get_checksum(filecontent):
     return hashlib.md5(filecontent).hexdigest()
 
 
+def get_exception_msg():
+    """Return the traceback of the exception being handled."""
+    buff = StringIO()
+    traceback.print_exc(file=buff)
+    traceback_txt = buff.getvalue()
+    buff.close()
+    return traceback_txt
+
+
 def exchange_record_job_identity_exact(job_):
     hasher = identity_exact_hasher(job_)
     # Include files checksum
@@ -166,7 +166,7 @@ class Pdf2dataTemplate(models.Model):
             output[field.name] = field._extract_data(optimized_str, self)
 
         # required_fields = self.pdf2data_options_dict["required_fields"]
-        required_fields = self.exchange_type_id.advanced_settings.get(
+        required_fields = self.exchange_type_id.get_settings().get(
             "required_fields", []
         )
 
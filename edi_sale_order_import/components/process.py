@@ -56,15 +56,16 @@ class EDIExchangeSOInput(Component):
 
     def _handle_existing_order(self, order, message):
         prev_record = self._get_previous_record(order)
-        self.exchange_record.message_post_with_view(
-            "edi_sale_order_import.message_already_imported",
+        self.exchange_record._post_notification(
+            self.exchange_record,
+            message,
+            template="edi_sale_order_import.message_already_imported",
             values={
                 "order": order,
                 "prev_record": prev_record,
                 "message": message,
                 "level": "info",
             },
-            subtype_id=self.env.ref("mail.mt_note").id,
         )
 
     def _get_previous_record(self, order):
@@ -7,6 +7,8 @@ from pathlib import PurePath
 
 from odoo.addons.component.core import AbstractComponent
 
+from .. import utils
+
 _logger = logging.getLogger(__file__)
 
 
@@ -75,6 +77,12 @@ class EDIStorageComponentMixin(AbstractComponent):
         :return: remote file content as string
         """
         path = self._get_remote_file_path(state, filename=filename)
+        # Do not request a file that is known to be missing
+        # from the directory listing cached for the transaction
+        if utils.file_missing_from_cache(
+            self.storage, path.parent.as_posix(), path.name
+        ):
+            return None
         try:
             # TODO: support match via pattern (eg: filename-prefix-*)
             # otherwise is impossible to retrieve input files and acks
@@ -1,11 +1,12 @@
 # Copyright 2021 ForgeFlow S.L. (https://www.forgeflow.com)
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
 
-import functools
 from pathlib import PurePath
 
 from odoo.addons.component.core import Component
 
+from .. import utils
+
 
 class EdiStorageListener(Component):
     _name = "edi.storage.component.listener"
@@ -14,29 +15,22 @@ class EdiStorageListener(Component):
     def _move_file(self, storage, from_dir_str, to_dir_str, filename):
         from_dir = PurePath(from_dir_str)
         to_dir = PurePath(to_dir_str)
-        if filename not in storage.list_files(from_dir.as_posix()):
+        # The listing is cached for the transaction, and the files moved
+        # in the same transaction are moved together after the commit.
+        if not utils.file_exists(storage, from_dir.as_posix(), filename):
             # The file might have been moved after a previous error.
             return False
-        self._add_after_commit_hook(
-            storage.move_files, [(from_dir / filename).as_posix()], to_dir.as_posix()
-        )
+        utils.schedule_move(storage, from_dir.as_posix(), to_dir.as_posix(), filename)
         return True
 
     def _remove_file(self, storage, from_dir_str, filename):
         from_dir = PurePath(from_dir_str)
-        if filename not in storage.list_files(from_dir.as_posix()):
+        if not utils.file_exists(storage, from_dir.as_posix(), filename):
             # The file might have been moved after a previous error.
             return False
-        self._add_after_commit_hook(storage.delete, (from_dir / filename).as_posix())
+        utils.schedule_delete(storage, from_dir.as_posix(), filename)
         return True
 
-    def _add_after_commit_hook(self, partial_func, *args):
-        """Add hook after commit to move the file when transaction is over."""
-        self.env.cr.after(
-            "commit",
-            functools.partial(partial_func, *args),
-        )
-
     def on_edi_exchange_done(self, record):
         storage = record.backend_id.storage_id
         res = False
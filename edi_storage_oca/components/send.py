@@ -4,6 +4,8 @@
 
 from odoo.addons.component.core import Component
 
+from .. import utils
+
 
 class EDIStorageSendComponent(Component):
 
@@ -26,6 +28,7 @@ class EDIStorageSendComponent(Component):
         filedata = self.exchange_record.exchange_file
         path = self._get_remote_file_path("pending")
         self.storage.add(path.as_posix(), filedata, binary=False)
+        utils.add_to_listing(self.storage, path.parent.as_posix(), [path.name])
         # TODO: delegate this to generic storage backend
         # except paramiko.ssh_exception.AuthenticationException:
         #     # TODO this exc handling should be moved to sftp backend IMO
@@ -1,2 +1,4 @@
 from . import edi_backend
 from . import edi_exchange_type
+from . import edi_exchange_record
+from . import edi_storage_input_scan
@@ -5,8 +5,12 @@
 
 import logging
 import os
+import time
 
 from odoo import fields, models
+from odoo.tools import split_every
+
+from odoo.addons.queue_job.job import identity_exact
 
 _logger = logging.getLogger(__name__)
 
@@ -58,8 +62,22 @@ class EDIBackend(models.Model):
     output_dir_error = fields.Char(
         "Output error directory", help="Path to folder for error operations"
     )
+    input_scan_slow_threshold = fields.Integer(
+        "Slow input scan threshold",
+        help="Duration in seconds above which the scan of the pending input "
+        "directory of an exchange type is flagged as slow and logged as a "
+        "warning. The scan is not interrupted. 0 disables the check.",
+    )
+    input_scan_ids = fields.One2many(
+        string="Input scans",
+        comodel_name="edi.storage.input.scan",
+        inverse_name="backend_id",
+        readonly=True,
+    )
 
     _storage_actions = ("check", "send", "receive")
+    # Number of file names looked up per query when creating the input records
+    _storage_input_dedup_chunk_size = 1000
 
     def _get_component_usage_candidates(self, exchange_record, key):
         candidates = super()._get_component_usage_candidates(exchange_record, key)
@@ -84,6 +102,12 @@ class EDIBackend(models.Model):
             1 if getattr(component_class, "_storage_backend_type", False) else 0,
         ) + res
 
+    def _component_lookup_cache_key(self, model, usage_candidates, **kw):
+        # The sort key depends on the storage
+        return super()._component_lookup_cache_key(model, usage_candidates, **kw) + (
+            bool(self.storage_id),
+        )
+
     def _storage_cron_check_pending_input(self, **kw):
         for backend in self:
             backend._storage_check_pending_input(**kw)
@@ -105,20 +129,43 @@ class EDIBackend(models.Model):
             self._storage_exchange_type_pending_input_domain()
         )
         for exchange_type in exchange_types:
-            # NOTE: this call might keep hanging the cron
-            # if the remote storage is slow (eg: too many files)
-            # We should probably run this code in a separate job per exchange type.
-            file_names = self._storage_get_input_filenames(exchange_type)
+            # One job per exchange type: a slow remote directory does not hang
+            # the cron nor delay the scan of the other directories.
+            # The concurrency is the capacity of the `edi_storage_scan` channel.
+            self.with_delay(
+                identity_key=identity_exact,
+                description="Scan pending input of %s" % exchange_type.display_name,
+            )._storage_scan_pending_input(exchange_type)
+        return True
+
+    def _storage_scan_pending_input(self, exchange_type):
+        """Create the exchange records of the new files of the exchange type.
+
+        The directory is listed once and only the files not found by the
+        previous scan are matched against the existing exchange records.
+        """
+        self.ensure_one()
+        start = time.monotonic()
+        file_names = self._storage_get_input_filenames(exchange_type)
+        _logger.info(
+            "Processing exchange type '%s': found %s files to process",
+            exchange_type.display_name,
+            len(file_names),
+        )
+        scan = self.env["edi.storage.input.scan"].sudo()._get_scan(self, exchange_type)
+        new_file_names = scan._get_new_file_names(file_names)
+        if not new_file_names:
             _logger.info(
-                "Processing exchange type '%s': found %s files to process",
+                "Exchange type '%s': no new file since the last scan",
                 exchange_type.display_name,
-                len(file_names),
             )
-            for file_name in file_names:
-                self.with_delay()._storage_create_record_if_missing(
-                    exchange_type, file_name
-                )
-        return True
+            records = self.exchange_record_model.browse()
+        else:
+            records = self._storage_create_records_if_missing(
+                exchange_type, new_file_names
+            )
+        scan._record_scan(file_names, records, time.monotonic() - start)
+        return records
 
     def _storage_exchange_type_pending_input_domain(self):
         """Domain for retrieving input exchange types."""
@@ -145,6 +192,30 @@ class EDIBackend(models.Model):
         _logger.debug("%s: new exchange record generated.", self.name)
         return record.identifier
 
+    def _storage_create_records_if_missing(self, exchange_type, remote_file_names):
+        """Create the exchange records missing for the given file names."""
+        file_names = list(
+            dict.fromkeys(os.path.basename(name) for name in remote_file_names)
+        )
+        if not file_names:
+            return self.exchange_record_model.browse()
+        known = set()
+        for chunk in split_every(self._storage_input_dedup_chunk_size, file_names):
+            existing = self._find_existing_exchange_records(
+                exchange_type, extra_domain=[("exchange_filename", "in", list(chunk))]
+            )
+            known.update(existing.mapped("exchange_filename"))
+        vals_list = [
+            self._storage_new_exchange_record_vals(file_name)
+            for file_name in file_names
+            if file_name not in known
+        ]
+        if not vals_list:
+            return self.exchange_record_model.browse()
+        records = self.create_records(exchange_type.code, vals_list)
+        _logger.debug("%s: %d new exchange records generated.", self.name, len(records))
+        return records
+
     def _storage_get_input_filenames(self, exchange_type):
         full_input_dir_pending = exchange_type._storage_fullpath(
             self.input_dir_pending
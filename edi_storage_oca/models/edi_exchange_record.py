@@ -0,0 +1,14 @@
+# Copyright 2024 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+from odoo import models
+
+
+class EDIExchangeRecord(models.Model):
+    _inherit = "edi.exchange.record"
+
+    def unlink(self):
+        inputs = self.filtered(lambda x: x.direction == "input")
+        if inputs:
+            self.env["edi.storage.input.scan"].sudo()._reset_scans(inputs)
+        return super().unlink()
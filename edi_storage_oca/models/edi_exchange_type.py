@@ -22,6 +22,11 @@ class EDIExchangeType(models.Model):
         "storage. E.g: `.*my-type-[0-9]*.\\.csv`"
     )
 
+    def _advanced_settings_schema(self):
+        schema = super()._advanced_settings_schema()
+        schema["storage"] = {"path": str, "path_config_param": str}
+        return schema
+
     def _storage_path(self):
         """Retrieve specific path for current exchange type.
 
@@ -40,7 +45,7 @@ class EDIExchangeType(models.Model):
         Thanks to the param you could even configure it by env.
         """
         self.ensure_one()
-        storage_settings = self.advanced_settings.get("storage", {})
+        storage_settings = self.get_settings(readonly=True).get("storage", {})
         path = storage_settings.get("path")
         if path:
             return PurePath(path)
@@ -0,0 +1,129 @@
+# Copyright 2024 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+
+import logging
+import os
+
+from odoo import api, fields, models
+from odoo.osv import expression
+
+_logger = logging.getLogger(__name__)
+
+
+class EDIStorageInputScan(models.Model):
+    """Scan cursor of the pending input directory of an exchange type.
+
+    Keep the file names found by the last scan: the next scan only looks
+    for the exchange records of the files that were not there yet.
+    """
+
+    _name = "edi.storage.input.scan"
+    _description = "EDI storage input scan"
+    _order = "backend_id, type_id"
+
+    backend_id = fields.Many2one(
+        comodel_name="edi.backend", required=True, ondelete="cascade", index=True
+    )
+    type_id = fields.Many2one(
+        string="Exchange type",
+        comodel_name="edi.exchange.type",
+        required=True,
+        ondelete="cascade",
+    )
+    last_scan_date = fields.Datetime(readonly=True)
+    seen_file_names = fields.Text(
+        readonly=True, help="File names found by the last scan, one per line"
+    )
+    file_count = fields.Integer(
+        string="Files", readonly=True, help="Files found by the last scan"
+    )
+    new_file_count = fields.Integer(
+        string="New files",
+        readonly=True,
+        help="Exchange records created by the last scan",
+    )
+    duration = fields.Float(
+        string="Duration (s)", readonly=True, help="Duration of the last scan"
+    )
+    slow = fields.Boolean(
+        readonly=True,
+        help="The last scan took longer than the slow input scan threshold "
+        "of the backend",
+    )
+
+    _sql_constraints = [
+        (
+            "backend_type_uniq",
+            "unique(backend_id, type_id)",
+            "There can be only one scan per backend and exchange type",
+        )
+    ]
+
+    @api.model
+    def _get_scan(self, backend, exchange_type):
+        scan = self.search(
+            [("backend_id", "=", backend.id), ("type_id", "=", exchange_type.id)]
+        )
+        if not scan:
+            scan = self.create({"backend_id": backend.id, "type_id": exchange_type.id})
+        return scan
+
+    def _get_seen_file_names(self):
+        self.ensure_one()
+        return set((self.seen_file_names or "").splitlines())
+
+    def _get_new_file_names(self, file_names):
+        """File names of the listing not found by the last scan."""
+        seen = self._get_seen_file_names()
+        return [name for name in file_names if name not in seen]
+
+    def _record_scan(self, file_names, new_records, duration=0.0):
+        self.ensure_one()
+        threshold = self.backend_id.input_scan_slow_threshold
+        slow = bool(threshold) and duration > threshold
+        if slow:
+            _logger.warning(
+                "Scan of the pending input of '%s' on backend '%s' took %.1fs "
+                "(slow scan threshold: %ds)",
+                self.type_id.display_name,
+                self.backend_id.name,
+                duration,
+                threshold,
+            )
+        self.write(
+            {
+                "last_scan_date": fields.Datetime.now(),
+                "seen_file_names": "\n".join(sorted(set(file_names))),
+                "file_count": len(file_names),
+                "new_file_count": len(new_records),
+                "duration": duration,
+                "slow": slow,
+            }
+        )
+
+    @api.model
+    def _reset_scans(self, exchange_records):
+        """Forget the files of the given exchange records.
+
+        Used when exchange records are deleted: their files,
+        if still there, must be picked up again by the next scan.
+        """
+        file_names = {}
+        for rec in exchange_records:
+            if rec.exchange_filename:
+                key = (rec.backend_id.id, rec.type_id.id)
+                file_names.setdefault(key, set()).add(rec.exchange_filename)
+        domain = []
+        for backend_id, type_id in file_names:
+            domain = expression.OR(
+                [domain, [("backend_id", "=", backend_id), ("type_id", "=", type_id)]]
+            )
+        if not domain:
+            return
+        for scan in self.search(domain):
+            removed = file_names[(scan.backend_id.id, scan.type_id.id)]
+            seen = scan._get_seen_file_names()
+            # The records keep the base name of the listed files
+            kept = {name for name in seen if os.path.basename(name) not in removed}
+            if kept != seen:
+                scan.seen_file_names = "\n".join(sorted(kept))
@@ -6,6 +6,7 @@ import functools
 import mock
 
 from odoo.addons.edi_oca.tests.common import EDIBackendCommonComponentTestCase
+from odoo.addons.edi_storage_oca import utils
 
 STORAGE_BACKEND_MOCK_PATH = (
     "odoo.addons.storage_backend.models.storage_backend.StorageBackend"
@@ -68,6 +69,7 @@ class TestEDIStorageBase(EDIBackendCommonComponentTestCase):
     def setUp(self):
         super().setUp()
         self._storage_backend_calls = []
+        utils.clear_listing_cache()
 
     def _filename(self, record=None, ack=False):
         record = record or self.record
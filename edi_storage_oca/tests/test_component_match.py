@@ -91,3 +91,40 @@ class EDIBackendTestCase(EDIBackendCommonComponentRegistryTestCase):
             storage_backend_type="s3",
         )
         self.assertEqual(component._name, S3Send._name)
+
+    def test_component_match_storage_change(self):
+        """The match follows the storage of the backend, cache included."""
+
+        class S3Check(Component):
+            _name = "s3.check"
+            _inherit = "edi.storage.component.check"
+            _usage = "storage.check"
+            _storage_backend_type = "s3"
+
+        class CSVCheck(Component):
+            _name = "csv.check"
+            _inherit = "edi.storage.component.check"
+            _usage = "storage.check"
+            _exchange_type = "test_csv_output"
+
+        self._build_components(S3Check, CSVCheck)
+        work_ctx = {"exchange_record": self.env["edi.exchange.record"].browse()}
+
+        def find(**kw):
+            return self.backend._find_component(
+                "res.partner",
+                ["storage.check"],
+                work_ctx=dict(work_ctx),
+                backend_type="demo_backend",
+                exchange_type="test_csv_output",
+                **kw
+            )
+
+        self.assertEqual(find(storage_backend_type="s3")._name, S3Check._name)
+        self.assertEqual(find(storage_backend_type="sftp")._name, CSVCheck._name)
+        storage = self.backend.storage_id
+        # Without storage the storage specific components have no precedence
+        self.backend.storage_id = False
+        self.assertEqual(find()._name, CSVCheck._name)
+        self.backend.storage_id = storage
+        self.assertEqual(find(storage_backend_type="s3")._name, S3Check._name)
@@ -1,5 +1,6 @@
 # Copyright 2020 ACSONE SA/NV (<http://acsone.eu>)
 # License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl.html).
+import mock
 from freezegun import freeze_time
 
 from odoo.tools import mute_logger
@@ -239,3 +240,79 @@ class TestEDIBackendOutput(TestEDIStorageBase):
         for rec in new_records:
             self.assertIn(rec.exchange_filename, file_names)
             self.assertEqual(rec.edi_exchange_state, "input_pending")
+
+    def test_scan_pending_input_incremental(self):
+        exch_type = self.exchange_type_in
+        backend_cls = type(self.backend)
+        listing = ["file-1.csv", "file-2.csv"]
+
+        def _get_input_filenames(backend, exchange_type):
+            return list(listing)
+
+        def _scan():
+            with mock.patch.object(
+                backend_cls, "_storage_get_input_filenames", _get_input_filenames
+            ):
+                return self.backend._storage_scan_pending_input(exch_type)
+
+        records = _scan()
+        self.assertEqual(
+            sorted(records.mapped("exchange_filename")), ["file-1.csv", "file-2.csv"]
+        )
+        scan = self.env["edi.storage.input.scan"].search(
+            [("backend_id", "=", self.backend.id), ("type_id", "=", exch_type.id)]
+        )
+        self.assertRecordValues(scan, [{"file_count": 2, "new_file_count": 2}])
+        # Same listing: nothing to do
+        self.assertFalse(_scan())
+        # Only the new file gets a record
+        listing.append("file-3.csv")
+        records = _scan()
+        self.assertEqual(records.mapped("exchange_filename"), ["file-3.csv"])
+        self.assertRecordValues(scan, [{"file_count": 3, "new_file_count": 1}])
+        # A deleted record is created again
+        records.unlink()
+        records = _scan()
+        self.assertEqual(records.mapped("exchange_filename"), ["file-3.csv"])
+
+    def test_scan_pending_input_new_files_only(self):
+        exch_type = self.exchange_type_in
+        backend_cls = type(self.backend)
+        listing = ["file-1.csv", "file-2.csv", "file-3.csv"]
+        with mock.patch.object(
+            backend_cls, "_storage_get_input_filenames", return_value=listing
+        ), mock.patch.object(
+            backend_cls, "_storage_input_dedup_chunk_size", 2
+        ), mock.patch.object(
+            backend_cls,
+            "_find_existing_exchange_records",
+            wraps=self.backend._find_existing_exchange_records,
+        ) as find_existing:
+            self.backend._storage_scan_pending_input(exch_type)
+            # The file names are looked up by chunks
+            self.assertEqual(find_existing.call_count, 2)
+            find_existing.reset_mock()
+            listing.append("file-4.csv")
+            records = self.backend._storage_scan_pending_input(exch_type)
+        # Only the file not found by the previous scan is looked up
+        self.assertEqual(find_existing.call_count, 1)
+        self.assertEqual(
+            find_existing.call_args[1]["extra_domain"],
+            [("exchange_filename", "in", ["file-4.csv"])],
+        )
+        self.assertEqual(records.mapped("exchange_filename"), ["file-4.csv"])
+
+    def test_scan_pending_input_slow(self):
+        exch_type = self.exchange_type_in
+        self.backend.input_scan_slow_threshold = 5
+        with mock.patch.object(
+            type(self.backend), "_storage_get_input_filenames", return_value=[]
+        ), mock.patch(
+            "odoo.addons.edi_storage_oca.models.edi_backend.time"
+        ) as mocked_time:
+            mocked_time.monotonic.side_effect = [100.0, 112.5]
+            self.backend._storage_scan_pending_input(exch_type)
+        self.assertRecordValues(
+            self.backend.input_scan_ids.filtered(lambda x: x.type_id == exch_type),
+            [{"file_count": 0, "duration": 12.5, "slow": True}],
+        )
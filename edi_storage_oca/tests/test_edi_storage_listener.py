@@ -5,12 +5,18 @@ import base64
 
 import mock
 
+from odoo.tools import mute_logger
+
 from odoo.addons.edi_oca.tests.common import EDIBackendCommonComponentRegistryTestCase
 from odoo.addons.edi_oca.tests.fake_components import FakeInputProcess
+from odoo.addons.edi_storage_oca import utils
 
 LISTENER_MOCK_PATH = (
     "odoo.addons.edi_storage_oca.components.listener.EdiStorageListener"
 )
+STORAGE_BACKEND_MOCK_PATH = (
+    "odoo.addons.storage_backend.models.storage_backend.StorageBackend"
+)
 
 
 class EDIBackendTestCase(EDIBackendCommonComponentRegistryTestCase):
@@ -37,6 +43,7 @@ class EDIBackendTestCase(EDIBackendCommonComponentRegistryTestCase):
     def setUp(self):
         super().setUp()
         FakeInputProcess.reset_faked()
+        utils.clear_listing_cache()
 
     def _move_file_mocked(self, *args):
         self.fake_move_args = [*args]
@@ -84,3 +91,54 @@ class EDIBackendTestCase(EDIBackendCommonComponentRegistryTestCase):
             self.assertEqual(storage, self.backend.storage_id)
             self.assertEqual(from_dir_str, self.backend.input_dir_pending)
             self.assertEqual(filename, self.record.exchange_filename)
+
+    def test_04_move_files_batched(self):
+        storage = self.backend.storage_id
+        listed = []
+
+        def list_files(storage, path, **kw):
+            listed.append(path)
+            return ["file1.csv", "/file2.csv", "file3.csv"]
+
+        with mock.patch(STORAGE_BACKEND_MOCK_PATH + ".list_files", list_files):
+            listener = self.backend.work_on("edi.exchange.record").component_by_name(
+                "edi.storage.component.listener"
+            )
+            for filename in ("file1.csv", "file2.csv", "file3.csv"):
+                self.assertTrue(
+                    listener._move_file(
+                        storage, "demo_in/pending", "demo_in/done", filename
+                    )
+                )
+            # Missing from the cached listing: the directory is listed again
+            self.assertFalse(
+                listener._move_file(
+                    storage, "demo_in/pending", "demo_in/done", "nope.csv"
+                )
+            )
+        self.assertEqual(listed, ["demo_in/pending", "demo_in/pending"])
+        with mock.patch(STORAGE_BACKEND_MOCK_PATH + ".move_files") as mocked:
+            # Run what happens after the commit
+            utils._on_commit(storage.browse(), self.env.cr)
+        mocked.assert_called_once_with(
+            [
+                "demo_in/pending/file1.csv",
+                "demo_in/pending/file2.csv",
+                "demo_in/pending/file3.csv",
+            ],
+            "demo_in/done",
+        )
+
+    @mute_logger("odoo.addons.edi_storage_oca.utils")
+    def test_05_move_files_error(self):
+        storage = self.backend.storage_id
+        utils.schedule_move(storage, "demo_in/pending", "demo_in/error", "ko.csv")
+        utils.schedule_move(storage, "demo_in/pending", "demo_in/done", "ok.csv")
+        with mock.patch(
+            STORAGE_BACKEND_MOCK_PATH + ".move_files",
+            side_effect=[IOError("Connection lost"), None],
+        ) as mocked:
+            utils._on_commit(storage.browse(), self.env.cr)
+        # The failure of the first group does not prevent the other moves
+        self.assertEqual(mocked.call_count, 2)
+        mocked.assert_called_with(["demo_in/pending/ok.csv"], "demo_in/done")
@@ -0,0 +1,225 @@
+# Copyright 2024 Camptocamp SA
+# License LGPL-3.0 or later (http://www.gnu.org/licenses/lgpl).
+"""Cache of the remote directory listings and batched file moves.
+
+Listing a remote directory (eg: an SFTP inbox with thousands of files)
+is expensive: the listings are kept for the current transaction and,
+with the server option ``edi_storage_listing_cache_ttl`` (in seconds),
+shared between transactions for that long.
+
+Files are moved/deleted after the commit of the transaction, in one
+``move_files`` call per (storage, source, destination) directories,
+and the cached listings are updated accordingly.
+"""
+
+import functools
+import logging
+import threading
+import time
+import weakref
+from pathlib import PurePath
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+# {(dbname, storage ID, directory): (expiration time, set of file names)}
+_shared_listings = {}
+# {cursor: {"listings": {...}, "moves": {...}, "deletes": {...}}}
+# NOTE: only plain data are stored in the values to not keep the cursor alive.
+_transaction_data = weakref.WeakKeyDictionary()
+
+
+def _get_ttl():
+    return float(config.get("edi_storage_listing_cache_ttl", 0) or 0)
+
+
+def _normalize(name):
+    return name.strip("/")
+
+
+def _get_transaction_data(storage):
+    cr = storage.env.cr
+    with _lock:
+        data = _transaction_data.get(cr)
+        if data is None:
+            data = _transaction_data[cr] = {"listings": {}, "moves": {}, "deletes": {}}
+            cr.after("commit", functools.partial(_on_commit, storage.browse(), cr))
+            cr.after("rollback", functools.partial(_on_rollback, cr))
+        return data
+
+
+def _on_rollback(cr):
+    with _lock:
+        _transaction_data.pop(cr, None)
+
+
+def _get_cached_listing(storage, directory):
+    key = (storage.id, directory)
+    with _lock:
+        data = _transaction_data.get(storage.env.cr)
+        listing = data["listings"].get(key) if data else None
+        if listing is not None:
+            return listing
+        expiration, listing = _shared_listings.get(
+            (storage.env.cr.dbname,) + key, (0, None)
+        )
+        if listing is not None and expiration > time.monotonic():
+            return listing
+    return None
+
+
+def _set_cached_listing(storage, directory, listing):
+    key = (storage.id, directory)
+    with _lock:
+        _get_transaction_data(storage)["listings"][key] = listing
+        ttl = _get_ttl()
+        if ttl:
+            _shared_listings[(storage.env.cr.dbname,) + key] = (
+                time.monotonic() + ttl,
+                listing,
+            )
+
+
+def list_files(storage, directory, refresh=False):
+    """Return the set of file names in the remote directory.
+
+    :param storage: storage.backend record
+    :param directory: posix path of the directory
+    :param refresh: bypass the cached listing
+    """
+    listing = None if refresh else _get_cached_listing(storage, directory)
+    if listing is None:
+        listing = {
+            _normalize(name)
+            for name in storage.list_files(directory)
+            if name.strip("/")
+        }
+        _set_cached_listing(storage, directory, listing)
+    return listing
+
+
+def file_exists(storage, directory, filename):
+    """Check if the file is in the remote directory.
+
+    A file missing from a cached listing might have been added since:
+    the directory is listed again to confirm.
+    """
+    filename = _normalize(filename)
+    cached = _get_cached_listing(storage, directory) is not None
+    if filename in list_files(storage, directory):
+        return True
+    if cached:
+        return filename in list_files(storage, directory, refresh=True)
+    return False
+
+
+def file_missing_from_cache(storage, directory, filename):
+    """Return True only if a listing of the directory is cached
+    and the file is not in it. The directory is never listed."""
+    listing = _get_cached_listing(storage, directory)
+    return listing is not None and _normalize(filename) not in listing
+
+
+def add_to_listing(storage, directory, filenames):
+    """Add the files to the cached listings of the directory, if any"""
+    _update_listings(storage.env.cr, storage.id, directory, add=filenames)
+
+
+def _update_listings(cr, storage_id, directory, add=(), remove=()):
+    add = {_normalize(x) for x in add}
+    remove = {_normalize(x) for x in remove}
+    key = (storage_id, directory)
+    with _lock:
+        data = _transaction_data.get(cr)
+        listings = [data["listings"].get(key)] if data else []
+        shared = _shared_listings.get((cr.dbname,) + key)
+        if shared:
+            listings.append(shared[1])
+        for listing in listings:
+            if listing is not None:
+                listing.difference_update(remove)
+                listing.update(add)
+
+
+def _invalidate_listings(cr, storage_id, *directories):
+    with _lock:
+        data = _transaction_data.get(cr)
+        for directory in directories:
+            if data:
+                data["listings"].pop((storage_id, directory), None)
+            _shared_listings.pop((cr.dbname, storage_id, directory), None)
+
+
+def schedule_move(storage, from_dir, to_dir, filename):
+    """Move the file to the destination directory after the commit.
+
+    All the files moved between the same directories in the transaction
+    are moved with one call to the storage.
+    """
+    _schedule(storage, "moves", (storage.id, from_dir, to_dir), filename)
+
+
+def schedule_delete(storage, from_dir, filename):
+    """Delete the file from the directory after the commit"""
+    _schedule(storage, "deletes", (storage.id, from_dir), filename)
+
+
+def _schedule(storage, kind, key, filename):
+    with _lock:
+        filenames = _get_transaction_data(storage)[kind].setdefault(key, [])
+        if filename not in filenames:
+            filenames.append(filename)
+
+
+def _on_commit(storage_model, cr):
+    """Move and delete the files scheduled in the transaction.
+
+    A failure on a (storage, directories) group is logged and the listings
+    of its directories are dropped: the other groups are handled anyway.
+    """
+    with _lock:
+        data = _transaction_data.pop(cr, None)
+    if not data:
+        return
+    for (storage_id, from_dir, to_dir), filenames in data["moves"].items():
+        storage = storage_model.browse(storage_id)
+        paths = [(PurePath(from_dir) / name).as_posix() for name in filenames]
+        _logger.debug("Moving %d file(s) from %s to %s", len(paths), from_dir, to_dir)
+        try:
+            storage.move_files(paths, to_dir)
+        except Exception:
+            _logger.exception(
+                "Failed to move %d file(s) from %s to %s",
+                len(paths),
+                from_dir,
+                to_dir,
+            )
+            _invalidate_listings(cr, storage_id, from_dir, to_dir)
+            continue
+        _update_listings(cr, storage_id, from_dir, remove=filenames)
+        _update_listings(cr, storage_id, to_dir, add=filenames)
+    for (storage_id, from_dir), filenames in data["deletes"].items():
+        storage = storage_model.browse(storage_id)
+        try:
+            for name in filenames:
+                storage.delete((PurePath(from_dir) / name).as_posix())
+        except Exception:
+            _logger.exception(
+                "Failed to delete %d file(s) from %s", len(filenames), from_dir
+            )
+            _invalidate_listings(cr, storage_id, from_dir)
+            continue
+        _update_listings(cr, storage_id, from_dir, remove=filenames)
+
+
+def clear_listing_cache(cr=None):
+    """Drop the cached listings of the transaction, or all of them"""
+    with _lock:
+        if cr is None:
+            _shared_listings.clear()
+            for data in _transaction_data.values():
+                data["listings"].clear()
+        elif cr in _transaction_data:
+            _transaction_data[cr]["listings"].clear()
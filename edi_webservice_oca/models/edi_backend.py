@@ -24,6 +24,12 @@ class EdiBackend(models.Model):
         res["webservice_protocol"] = self.webservice_backend_id.sudo().protocol
         return res
 
+    def _component_lookup_cache_key(self, model, usage_candidates, **kw):
+        # The sort key depends on the webservice backend
+        return super()._component_lookup_cache_key(model, usage_candidates, **kw) + (
+            bool(self.webservice_backend_id),
+        )
+
     def _component_sort_key(self, component_class):
         res = super()._component_sort_key(component_class)
         # Override to give precedence by `webservice_protocol` when needed.
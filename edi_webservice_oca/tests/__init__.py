@@ -1,2 +1,3 @@
 from . import test_backend
 from . import test_send
+from . import test_component_match
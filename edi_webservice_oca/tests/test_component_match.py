@@ -0,0 +1,52 @@
+# Copyright 2022 Camptocamp SA
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo.addons.component.core import Component
+from odoo.addons.edi_oca.tests.common import EDIBackendCommonComponentRegistryTestCase
+
+
+class TestEDIWebserviceComponentMatch(EDIBackendCommonComponentRegistryTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._load_module_components(cls, "edi_webservice_oca")
+
+    @classmethod
+    def _get_backend(cls):
+        return cls.env.ref("edi_webservice_oca.demo_edi_backend")
+
+    def test_component_match_webservice_change(self):
+        """The match follows the webservice of the backend, cache included."""
+
+        class HTTPSend(Component):
+            _name = "http.send"
+            _inherit = "edi.component.mixin"
+            _usage = "webservice.send"
+            _webservice_protocol = "http"
+
+        class CSVSend(Component):
+            _name = "csv.send"
+            _inherit = "edi.component.mixin"
+            _usage = "webservice.send"
+            _exchange_type = "test_csv_output"
+
+        self._build_components(HTTPSend, CSVSend)
+        work_ctx = {"exchange_record": self.env["edi.exchange.record"].browse()}
+
+        def find():
+            return self.backend._find_component(
+                "res.partner",
+                ["webservice.send"],
+                work_ctx=dict(work_ctx),
+                backend_type="demo_ws_backend",
+                exchange_type="test_csv_output",
+                webservice_protocol="http",
+            )
+
+        self.assertEqual(find()._name, HTTPSend._name)
+        ws_backend = self.backend.webservice_backend_id
+        # Without webservice the protocol has no precedence
+        self.backend.webservice_backend_id = False
+        self.assertEqual(find()._name, CSVSend._name)
+        self.backend.webservice_backend_id = ws_backend
+        self.assertEqual(find()._name, HTTPSend._name)
@@ -7,7 +7,7 @@ from lxml import etree
 
 from odoo.tests.common import TransactionCase, TreeCase
 
-from odoo.addons.pdf_helper.utils import PDFParser
+from odoo.addons.pdf_helper.utils import LazyLogPayload, PDFParser
 
 
 def read_test_file(filename, mode="r"):
@@ -26,6 +26,21 @@ class TestPDFHelperUtils(TreeCase):
         self.assertEqual(fname, "factur-x.xml")
         self.assertTrue(isinstance(xml_root, etree._Element))
 
+    def test_lazy_log_payload(self):
+        binary = "QUJD" * 1000
+        xml_root = etree.fromstring(
+            "<Invoice><ID>INV-1</ID><Attachment>%s</Attachment></Invoice>" % binary
+        )
+        res = str(LazyLogPayload(xml_root))
+        self.assertIn("<ID>INV-1</ID>", res)
+        self.assertIn("[4000 bytes of binary data]", res)
+        self.assertNotIn(binary, res)
+        res = str(LazyLogPayload({"ref": "INV-1", "attachments": {"inv.pdf": binary}}))
+        self.assertIn("'ref': 'INV-1'", res)
+        self.assertIn("[4000 bytes of data]", res)
+        res = str(LazyLogPayload(b"<ID>INV-1</ID>", max_size=5))
+        self.assertEqual(res, "<ID>I... [9 characters truncated]")
+
 
 class TestPDFHelper(TransactionCase):
     def test_parse_xml(self):
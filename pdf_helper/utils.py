@@ -6,6 +6,7 @@
 
 import logging
 import mimetypes
+import re
 from io import BytesIO
 
 from lxml import etree
@@ -57,3 +58,58 @@ class PDFParser:
                         "Failed to parse XML file %s. Error: %s", filename, str(err)
                     )
         return xmlfiles
+
+
+class LazyLogPayload:
+    """Lazy representation of a business document for the logs.
+
+    Wrap the payload given to a logger call with it, e.g.
+    ``logger.debug("XML file:\n%s", LazyLogPayload(xml_root))``: the payload
+    is only serialized if the log record is emitted, i.e. never on the
+    import/export hot paths at the default log level.
+
+    The payload can be an lxml element, XML bytes/string or a parsed
+    document (dict/list). Embedded binaries (base64 PDF attachments...)
+    are redacted and the output is truncated to ``max_size`` characters.
+    """
+
+    BINARY_MIN_SIZE = 1024
+    MAX_SIZE = 100 * 1024
+    _xml_binary_re = re.compile(r">\s*([A-Za-z0-9+/=\r\n]{%d,})\s*<" % BINARY_MIN_SIZE)
+
+    def __init__(self, payload, max_size=None):
+        self.payload = payload
+        self.max_size = max_size or self.MAX_SIZE
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, etree._Element):
+            payload = etree.tostring(payload, pretty_print=True, encoding="unicode")
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8", errors="replace")
+        if isinstance(payload, str):
+            res = self._xml_binary_re.sub(self._redact_xml_binary, payload)
+        else:
+            res = repr(self._redact(payload))
+        if len(res) > self.max_size:
+            res = "%s... [%d characters truncated]" % (
+                res[: self.max_size],
+                len(res) - self.max_size,
+            )
+        return res
+
+    @staticmethod
+    def _redact_xml_binary(match):
+        return ">[%d bytes of binary data]<" % len(match.group(1))
+
+    @classmethod
+    def _redact(cls, value):
+        if isinstance(value, dict):
+            return {key: cls._redact(val) for key, val in value.items()}
+        if isinstance(value, list):
+            return [cls._redact(val) for val in value]
+        if isinstance(value, tuple):
+            return tuple(cls._redact(val) for val in value)
+        if isinstance(value, (str, bytes)) and len(value) >= cls.BINARY_MIN_SIZE:
+            return "[%d bytes of data]" % len(value)
+        return value
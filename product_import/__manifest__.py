@@ -11,11 +11,14 @@
     "website": "https://github.com/OCA/edi",
     "depends": [
         "stock",
+        # OCA/queue
+        "queue_job",
         # OCA/edi
         "base_business_document_import",
     ],
     "data": [
         "security/ir.model.access.csv",
+        "data/queue_job_data.xml",
         "wizard/product_import_view.xml",
     ],
 }
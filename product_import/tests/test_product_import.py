@@ -1,6 +1,8 @@
 # Copyright 2022 Camptocamp SA
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import mock
+
 from .common import TestCommon
 
 PARSED_CATALOG = {
@@ -151,3 +153,54 @@ class TestProductImport(TestCommon):
             mocked.assert_not_called()
             wiz.import_button()
             mocked.assert_called()
+
+    def test_product_import_upsert(self):
+        products = self.wiz_model._create_products(
+            self.parsed_catalog, seller=self.supplier
+        )
+        # Import again with a new price and a new product
+        catalog = dict(
+            self.parsed_catalog,
+            chatter_msg=[],
+            products=[dict(p) for p in PARSED_CATALOG["products"]],
+        )
+        catalog["products"][1]["price"] = 13.0
+        catalog["products"].append(
+            dict(catalog["products"][0], barcode="1234567890131", code="NEW")
+        )
+        products2, stats = self.wiz_model._upsert_products(
+            catalog["products"], catalog["chatter_msg"], seller=self.supplier
+        )
+        self.assertEqual(stats, {"created": 1, "updated": 1, "unchanged": 2})
+        self.assertEqual(products2[:3], products)
+        self.assertEqual(products2[3].default_code, "NEW")
+        sinfos = products[1].seller_ids.sorted("id")
+        self.assertEqual(len(sinfos), 2)
+        self.assertTrue(sinfos[0].date_end)
+        self.assertFalse(sinfos[1].date_end)
+        self.assertEqual(sinfos[1].price, 13.0)
+
+    def test_product_import_upsert_duplicate(self):
+        catalog_products = [dict(p) for p in PARSED_CATALOG["products"]]
+        # Same product again at the end of the catalogue, with a new price
+        catalog_products.append(dict(catalog_products[0], price=2.0))
+        wiz_model = type(self.wiz_model)
+        prepare = wiz_model._prepare_product_upsert
+        with mock.patch.object(
+            wiz_model,
+            "_prepare_product_upsert",
+            autospec=True,
+            side_effect=prepare,
+        ) as mocked:
+            products, stats = self.wiz_model._upsert_products(
+                catalog_products, [], seller=self.supplier
+            )
+        # The values are built with the per product hook
+        self.assertEqual(mocked.call_count, 3)
+        self.assertEqual(stats, {"created": 3, "updated": 0, "unchanged": 0})
+        # In the order of the catalogue, with the values of the last occurrence
+        self.assertEqual(
+            products.mapped("barcode"),
+            [p["barcode"] for p in PARSED_CATALOG["products"]],
+        )
+        self.assertEqual(products[0].seller_ids.price, 2.0)
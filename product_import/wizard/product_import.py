@@ -2,13 +2,16 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 import logging
+import time
 from base64 import b64decode, b64encode
+from collections import defaultdict
 from datetime import date, timedelta
 
 from lxml import etree
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import config, split_every
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,12 @@ class ProductImport(models.TransientModel):
     _name = "product.import"
     _description = "Product import from files"
 
+    # Files from this size (in bytes) are streamed when the format supports it,
+    # see `_stream_file`
+    _stream_min_size = 10 * 1024 * 1024
+    # Number of products imported per job when streaming
+    _stream_chunk_size = 500
+
     product_file = fields.Binary(
         string="Product Catalogue",
         required=True,
@@ -120,56 +129,50 @@ class ProductImport(models.TransientModel):
 
     @api.model
     def _prepare_supplierinfo(self, seller_info, product):
+        return self._prepare_supplierinfo_commands(
+            seller_info, product.seller_ids if product else None
+        )
+
+    @api.model
+    def _prepare_supplierinfo_commands(self, seller_info, supplierinfos):
+        """Return the commands to apply on the supplierinfo of a product.
+
+        :param seller_info: values of the imported supplierinfo
+        :param supplierinfos: current supplierinfo records of the product
+        """
         today = date.today()
         yesterday = today - timedelta(days=1)
         seller_id = False
         result = []
-        if product:
-            # Terminate previous prices
-            for s_info in product.seller_ids:
-                if s_info.name.id != seller_info["name"]:
-                    continue
-                if s_info.company_id.id not in (seller_info["company_id"], False):
-                    continue
-                if s_info.date_end and s_info.date_end < today:
-                    continue
-                if (
-                    s_info.product_code == seller_info["product_code"]
-                    and s_info.min_qty == seller_info["min_qty"]
-                    and s_info.price == seller_info["price"]
-                    and s_info.currency_id.id == seller_info["currency_id"]
-                    and s_info.company_id.id == seller_info["company_id"]
-                ):
-                    seller_id = s_info.id
-                else:
-                    result.append((1, s_info.id, {"date_end": yesterday}))
+        # Terminate previous prices
+        for s_info in supplierinfos or []:
+            if s_info.name.id != seller_info["name"]:
+                continue
+            if s_info.company_id.id not in (seller_info["company_id"], False):
+                continue
+            if s_info.date_end and s_info.date_end < today:
+                continue
+            if (
+                s_info.product_code == seller_info["product_code"]
+                and s_info.min_qty == seller_info["min_qty"]
+                and s_info.price == seller_info["price"]
+                and s_info.currency_id.id == seller_info["currency_id"]
+                and s_info.company_id.id == seller_info["company_id"]
+            ):
+                seller_id = s_info.id
+            else:
+                result.append((1, s_info.id, {"date_end": yesterday}))
         if not seller_id:
             seller_info.setdefault("date_start", today)
             result.append((0, 0, seller_info))
         return result
 
     @api.model
-    def _prepare_product(self, parsed_product, chatter_msg, seller=None):
+    def _prepare_product_values(self, parsed_product, uom):
         # Important: barcode is unique key of product.template model
         # So records product.product are created with company_id=False.
         # Only the pricelist (product.supplierinfo) is company-specific.
-        product_company_id = self.env.context.get("product_company_id", False)
-        if not parsed_product["barcode"]:
-            chatter_msg.append(
-                _("Cannot import product without barcode: %s") % (parsed_product,)
-            )
-            return False
-        product = (
-            self.env["product.product"]
-            .with_context(active_test=False)
-            .search([("barcode", "=", parsed_product["barcode"])], limit=1)
-        )
-        uom = self._bdimport._match_uom(parsed_product["uom"], chatter_msg)
-        currency = self._bdimport._match_currency(
-            parsed_product["currency"], chatter_msg
-        )
-
-        product_vals = {
+        return {
             "active": parsed_product.get("active", True),
             "default_code": parsed_product["code"],
             "barcode": parsed_product["barcode"],
@@ -180,14 +183,56 @@ class ProductImport(models.TransientModel):
             "uom_po_id": uom.id,
             "company_id": False,
         }
-        seller_info = {
+
+    @api.model
+    def _prepare_seller_info(self, parsed_product, currency, seller=None):
+        return {
             "name": seller and seller.id or False,
             "product_code": parsed_product["product_code"],
             "price": parsed_product["price"],
             "currency_id": currency.id,
             "min_qty": parsed_product["min_qty"],
-            "company_id": product_company_id,
+            "company_id": self.env.context.get("product_company_id", False),
         }
+
+    @api.model
+    def _prepare_product_upsert(self, parsed_product, uom, currency, seller=None):
+        """Return the values to import for a product of the catalogue.
+
+        Used by `_prepare_product` and by the bulk import of
+        `_upsert_products`: override it (or `_prepare_product_values`
+        and `_prepare_seller_info`) to change the imported values.
+
+        :return: (product values, supplierinfo values)
+        """
+        return (
+            self._prepare_product_values(parsed_product, uom),
+            self._prepare_seller_info(parsed_product, currency, seller),
+        )
+
+    @api.model
+    def _prepare_product(self, parsed_product, chatter_msg, seller=None):
+        """Return the values to create or update one product.
+
+        Not used by the bulk import: see `_prepare_product_upsert`.
+        """
+        if not parsed_product["barcode"]:
+            chatter_msg.append(
+                _("Cannot import product without barcode: %s") % (parsed_product,)
+            )
+            return False
+        product = (
+            self.env["product.product"]
+            .with_context(active_test=False)
+            .search([("barcode", "=", parsed_product["barcode"])], limit=1)
+        )
+        uom = self._bdimport._match_uom(parsed_product["uom"], chatter_msg)
+        currency = self._bdimport._match_currency(
+            parsed_product["currency"], chatter_msg
+        )
+        product_vals, seller_info = self._prepare_product_upsert(
+            parsed_product, uom, currency, seller=seller
+        )
         product_vals["seller_ids"] = self._prepare_supplierinfo(seller_info, product)
         if product:
             product_vals["recordset"] = product
@@ -216,21 +261,328 @@ class ProductImport(models.TransientModel):
 
     @api.model
     def _create_products(self, catalogue, seller, filename=None):
-        products = self.env["product.product"].browse()
-        for product in catalogue.get("products"):
-            record = self.create_product(
-                product,
-                catalogue["chatter_msg"],
+        start = time.perf_counter()
+        products, stats = self._upsert_products(
+            catalogue["products"], catalogue["chatter_msg"], seller=seller
+        )
+        duration = time.perf_counter() - start
+        catalogue["chatter_msg"].append(self._get_import_summary(stats, duration))
+        self._bdimport.post_create_or_update(catalogue, seller, doc_filename=filename)
+        logger.info(
+            "Products updated for vendor %d: %d created, %d updated, "
+            "%d unchanged in %.1fs",
+            seller.id,
+            stats["created"],
+            stats["updated"],
+            stats["unchanged"],
+            duration,
+        )
+        return products
+
+    @api.model
+    def _get_import_summary(self, stats, duration):
+        return _(
+            "Catalogue import: %(created)d product(s) created, "
+            "%(updated)d updated and %(unchanged)d unchanged in %(duration).1fs."
+        ) % dict(stats, duration=duration)
+
+    @api.model
+    def _upsert_products(self, parsed_products, chatter_msg, seller=None):
+        """Create or update the products of a catalogue in bulk.
+
+        The existing products are found with one query for all the barcodes
+        and the current prices of the seller with one query for all of them.
+        The new products are then created with one create call, the changed
+        ones written grouped by values and the prices updated in bulk.
+
+        :return: (products in the order of the catalogue, stats dict
+                  with the number of products created/updated/unchanged)
+        """
+        ppo = self.env["product.product"]
+        by_barcode = {}
+        for parsed_product in parsed_products:
+            if not parsed_product["barcode"]:
+                chatter_msg.append(
+                    _("Cannot import product without barcode: %s") % (parsed_product,)
+                )
+                continue
+            # The last occurrence of a barcode wins, like updating the same
+            # product several times would do, at the position of the first one.
+            by_barcode[parsed_product["barcode"]] = parsed_product
+        existing = self._get_products_by_barcode(list(by_barcode))
+        supplierinfos = self._get_current_supplierinfos(
+            ppo.browse([p.id for p in existing.values()]), seller
+        )
+        match_uom = self._memoize_match(self._bdimport._match_uom, chatter_msg)
+        match_currency = self._memoize_match(
+            self._bdimport._match_currency, chatter_msg
+        )
+        to_create = []
+        to_write = defaultdict(list)
+        unchanged = []
+        si_to_close = []
+        si_to_create = []
+        for barcode, parsed_product in by_barcode.items():
+            product = existing.get(barcode, ppo.browse())
+            product_vals, seller_info = self._prepare_product_upsert(
+                parsed_product,
+                match_uom(parsed_product["uom"]),
+                match_currency(parsed_product["currency"]),
                 seller=seller,
             )
-            if record:
-                products |= record
-        self._bdimport.post_create_or_update(catalogue, seller, doc_filename=filename)
-        logger.info("Products updated for vendor %d", seller.id)
+            commands = self._prepare_supplierinfo_commands(
+                seller_info, supplierinfos.get(product.product_tmpl_id.id, [])
+            )
+            if not product:
+                product_vals["seller_ids"] = commands
+                to_create.append(product_vals)
+                continue
+            changes = self._get_product_changes(product, product_vals)
+            if changes:
+                to_write[tuple(sorted(changes.items()))].append(product.id)
+            elif not commands:
+                unchanged.append(product.id)
+            for command in commands:
+                if command[0] == 1:
+                    si_to_close.append(command[1])
+                else:
+                    si_to_create.append(
+                        dict(command[2], product_tmpl_id=product.product_tmpl_id.id)
+                    )
+        for changes, product_ids in to_write.items():
+            ppo.browse(product_ids).write(dict(changes))
+        if si_to_close:
+            self.env["product.supplierinfo"].browse(si_to_close).write(
+                {"date_end": date.today() - timedelta(days=1)}
+            )
+        if si_to_create:
+            self.env["product.supplierinfo"].create(si_to_create)
+        created = self._create_product_records(to_create)
+        for product in created:
+            existing[product.barcode] = product
+        products = ppo.browse([existing[barcode].id for barcode in by_barcode])
+        stats = {
+            "created": len(created),
+            "updated": len(by_barcode) - len(created) - len(unchanged),
+            "unchanged": len(unchanged),
+        }
+        return products, stats
+
+    @api.model
+    def _get_products_by_barcode(self, barcodes):
+        """Return the existing products of the barcodes, with one query"""
+        products = (
+            self.env["product.product"]
+            .with_context(active_test=False)
+            .search([("barcode", "in", barcodes)])
+        )
+        return {product.barcode: product for product in products}
+
+    @api.model
+    def _get_current_supplierinfos(self, products, seller):
+        """Return the supplierinfo of the seller still valid today,
+        by product template ID, with one query"""
+        res = defaultdict(list)
+        if not products:
+            return res
+        supplierinfos = self.env["product.supplierinfo"].search(
+            [
+                ("product_tmpl_id", "in", products.product_tmpl_id.ids),
+                ("name", "=", seller and seller.id or False),
+                "|",
+                ("date_end", "=", False),
+                ("date_end", ">=", date.today()),
+            ]
+        )
+        for s_info in supplierinfos:
+            res[s_info.product_tmpl_id.id].append(s_info)
+        return res
+
+    @api.model
+    def _memoize_match(self, match_method, chatter_msg):
+        """Call the match method once per distinct parsed value"""
+        memo = {}
+
+        def match(value):
+            key = repr(sorted((value or {}).items()))
+            if key not in memo:
+                memo[key] = match_method(value, chatter_msg)
+            return memo[key]
+
+        return match
+
+    @api.model
+    def _get_product_changes(self, product, product_vals):
+        changes = {}
+        for fname, value in product_vals.items():
+            field = product._fields[fname]
+            current = field.convert_to_write(product[fname], product)
+            if (current or False) != (value or False):
+                changes[fname] = value
+        return changes
+
+    @api.model
+    def _create_product_records(self, vals_list):
+        ppo = self.env["product.product"]
+        if not vals_list:
+            return ppo.browse()
+        archived = [not vals.pop("active") for vals in vals_list]
+        products = ppo.create(vals_list)
+        to_archive = ppo.browse(
+            [product.id for product, arch in zip(products, archived) if arch]
+        )
+        if to_archive:
+            # Products created first, then archived in order to replicate
+            # all characteristics into product.template
+            to_archive.flush()
+            to_archive.action_archive()
         return products
 
+    @api.model
+    def _stream_file(self, filename, source):
+        """Parse the catalogue lazily, without loading it all in memory.
+
+        To be implemented by the formats supporting it.
+
+        :param source: content of the file (bytes), its path or a file object
+        :return: None if the file can't be streamed or a tuple
+                 (catalogue without products, iterator of the parsed products)
+        """
+        return None
+
+    @api.model
+    def _check_stream_file(self, filename, source):
+        """Validate a file before its streamed import.
+
+        Called by the job importing the file, before the chunks are queued.
+        To be implemented by the formats supporting it.
+
+        :param source: content of the file (bytes), its path or a file object
+        """
+        return True
+
+    def _get_product_file_attachment(self):
+        """Return the attachment storing the uploaded file, if any"""
+        self.ensure_one()
+        return (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_field", "=", "product_file"),
+                    ("res_id", "=", self.id),
+                ],
+                limit=1,
+            )
+        )
+
+    @api.model
+    def _get_attachment_source(self, attachment):
+        """Return the path of the file of the attachment in the filestore,
+        or its content when stored in the database"""
+        attachment = attachment.sudo()
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname)
+        return attachment.raw
+
+    @api.model
+    def _get_stream_settings(self):
+        """Return the minimum file size to stream and the chunk size.
+
+        Configurable with the server options ``product_import_stream_min_size``
+        and ``product_import_stream_chunk_size``.
+        """
+        min_size = config.get("product_import_stream_min_size")
+        chunk_size = config.get("product_import_stream_chunk_size")
+        return (
+            self._stream_min_size if min_size is None else int(min_size),
+            int(chunk_size or self._stream_chunk_size),
+        )
+
+    @api.model
+    def _import_stream_attachment(self, attachment):
+        """Job importing a catalogue stored in an attachment, in chunks"""
+        source = self._get_attachment_source(attachment)
+        self._check_stream_file(attachment.name, source)
+        stream = self._stream_file(attachment.name, source)
+        if not stream:
+            raise UserError(_("The file %s can't be streamed.") % attachment.name)
+        count = self._import_stream(*stream, attachment=attachment)
+        return _("%d product(s) queued") % count
+
+    @api.model
+    def _import_stream(self, catalogue, parsed_products, attachment):
+        """Import the streamed products in chunks, one job per chunk.
+
+        Only one chunk of products is in memory at a time and each chunk is
+        committed by its own job.
+        """
+        filename = attachment.name
+        catalogue.setdefault("chatter_msg", [])
+        company_id = self._get_company_id(catalogue)
+        seller = self._get_seller(catalogue)
+        __, chunk_size = self._get_stream_settings()
+        count = jobs = 0
+        for chunk in split_every(chunk_size, parsed_products, piece_maker=list):
+            self.browse().with_delay(
+                description=_("Import products %d-%d of %s")
+                % (count + 1, count + len(chunk), filename)
+            )._import_products_chunk(chunk, seller, company_id)
+            count += len(chunk)
+            jobs += 1
+        if not count:
+            raise UserError(_("This catalogue doesn't have any product!"))
+        catalogue["chatter_msg"].append(
+            _("Catalogue import: %d product(s) queued in %d job(s).") % (count, jobs)
+        )
+        # Like the other imports, the file is attached to the vendor
+        attachment.sudo().write({"res_model": seller._name, "res_id": seller.id})
+        self._bdimport.post_create_or_update(catalogue, seller, doc_filename=filename)
+        logger.info(
+            "Products of vendor %d queued: %d product(s) in %d job(s)",
+            seller.id,
+            count,
+            jobs,
+        )
+        return count
+
+    @api.model
+    def _import_products_chunk(self, parsed_products, seller, company_id):
+        """Job importing a chunk of a streamed catalogue"""
+        start = time.perf_counter()
+        chatter_msg = []
+        __, stats = self.with_context(product_company_id=company_id)._upsert_products(
+            parsed_products, chatter_msg, seller=seller
+        )
+        result = self._get_import_summary(stats, time.perf_counter() - start)
+        for msg in chatter_msg + [result]:
+            seller.message_post(body=msg)
+        return result
+
     def import_button(self):
         self.ensure_one()
+        min_size, __ = self._get_stream_settings()
+        attachment = self._get_product_file_attachment()
+        if attachment and attachment.file_size >= min_size:
+            # Only the header is read here, the file is imported by a job
+            stream = self._stream_file(
+                self.product_filename, self._get_attachment_source(attachment)
+            )
+            if stream:
+                # Keep the file once the wizard is vacuumed
+                attachment.write(
+                    {
+                        "name": self.product_filename or attachment.name,
+                        "res_model": False,
+                        "res_field": False,
+                        "res_id": False,
+                    }
+                )
+                self.browse().with_delay(
+                    description=_("Import the catalogue %s") % self.product_filename
+                )._import_stream_attachment(attachment)
+                return {"type": "ir.actions.act_window_close"}
         file_content = b64decode(self.product_file)
         catalogue = self.parse_product_catalogue(file_content, self.product_filename)
         if not catalogue.get("products"):
@@ -1,9 +1,17 @@
 # Copyright 2022 Camptocamp
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import base64
+from io import BytesIO
+
+import mock
+
+from odoo.exceptions import UserError
 from odoo.tests.common import SavepointCase
 from odoo.tools import mute_logger
 
+from odoo.addons.queue_job.tests.common import trap_jobs
+
 from .common import get_test_data
 
 
@@ -61,3 +69,61 @@ class TestUblOrderImport(SavepointCase):
                     self.assertEqual(supplierinfo.company_id, p_expect["company"])
                 else:
                     self.assertFalse(supplierinfo.company_id)
+
+    def test_ubl_catalogue_stream(self):
+        wiz_model = self.env["product.import"]
+        for filename, expected in get_test_data(self.env).items():
+            content = base64.b64decode(expected._as_base64())
+            catalogue = wiz_model._parse_file(filename, content)
+            header, products = wiz_model._stream_file(filename, content)
+            self.assertEqual(list(products), catalogue.pop("products"))
+            self.assertEqual(header, catalogue)
+
+    def test_ubl_catalogue_stream_other_format(self):
+        source = BytesIO(b"<Other/>")
+        self.assertIsNone(self.env["product.import"]._stream_file("x.xml", source))
+        # The other formats get the file from its start
+        self.assertEqual(source.tell(), 0)
+
+    @mute_logger("odoo.addons.base_ubl.models.ubl")
+    def test_ubl_catalogue_stream_check_schema(self):
+        wiz_model = self.env["product.import"]
+        filename = "UBL-Catalogue_Example2.xml"
+        content = base64.b64decode(get_test_data(self.env)[filename]._as_base64())
+        self.assertTrue(wiz_model._check_stream_file(filename, content))
+        # The whole file is validated, up to its last line
+        head, __, tail = content.rpartition(b"</cac:CatalogueLine>")
+        invalid = head + b"<cbc:Unknown/></cac:CatalogueLine>" + tail
+        with self.assertRaisesRegex(UserError, "XML Schema Definition"):
+            wiz_model._check_stream_file(filename, invalid)
+
+    @mute_logger("odoo.addons.product_import.wizard.product_import")
+    def test_ubl_catalogue_import_chunks(self):
+        filename = "UBL-Catalogue_Example2.xml"
+        expected = get_test_data(self.env)[filename]
+        products_before = self._all_products()
+        wiz = self.env["product.import"].create(
+            {"product_file": expected._as_base64(), "product_filename": filename}
+        )
+        stream_settings = mock.patch.object(
+            type(wiz), "_get_stream_settings", return_value=(0, 3)
+        )
+        with stream_settings, trap_jobs() as trap:
+            wiz.import_button()
+            # The file is read by a job
+            trap.assert_jobs_count(1)
+            [job] = trap.enqueued_jobs
+        attachment = job.args[0]
+        self.assertFalse(attachment.res_model)
+        wiz.unlink()
+        with stream_settings, trap_jobs() as trap:
+            job.perform()
+            trap.assert_jobs_count(2)
+            self.assertEqual(self._all_products(), products_before)
+            trap.perform_enqueued_jobs()
+        self.assertEqual(attachment.res_model, "res.partner")
+        new_products = self._all_products() - products_before
+        self.assertEqual(
+            new_products.mapped("barcode"),
+            [p_expect["barcode"] for p_expect in expected["products"]],
+        )
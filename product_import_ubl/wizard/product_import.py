@@ -1,13 +1,19 @@
 # Copyright 2022 Camptocamp
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+from io import BytesIO
+
 from lxml import etree
 
 from odoo import api, models
-from odoo.tools import str2bool
+from odoo.tools import config, str2bool
 
 CATALOGUE_NS = "urn:oasis:names:specification:ubl:schema:xsd:Catalogue-2"
 CATALOGUE_TAG = "{%s}Catalogue" % CATALOGUE_NS
+CATALOGUE_LINE_TAG = (
+    "{urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2}"
+    "CatalogueLine"
+)
 
 
 class XPathGetter(object):
@@ -36,6 +42,58 @@ class XPathGetter(object):
     text = xpath_text
 
 
+class UBLCatalogueStream(object):
+    """Read a UBL catalogue incrementally.
+
+    The header of the catalogue (everything before the first line) is read
+    by `read_header`, then iterating yields the CatalogueLine elements one by
+    one: each line is cleared and removed from the tree once the next one is
+    requested, so the memory used doesn't depend on the size of the file.
+    """
+
+    def __init__(self, source, huge_tree=False):
+        self._events = etree.iterparse(
+            source, events=("start", "end"), remove_comments=True, huge_tree=huge_tree
+        )
+        self.root = None
+        self.ns = None
+        self._first_line = None
+
+    def read_header(self):
+        """Return the root element, with the header elements only.
+
+        Return None if the file isn't a UBL catalogue.
+        """
+        for event, element in self._events:
+            if self.root is None:
+                if element.tag != CATALOGUE_TAG:
+                    return None
+                self.root = element
+                self.ns = dict(element.nsmap)
+                # Empty namespace prefix is not supported in XPath
+                self.ns["main"] = self.ns.pop(None)
+            elif event == "start" and self._is_line(element):
+                self._first_line = element
+                break
+        return self.root
+
+    def _is_line(self, element):
+        return element.tag == CATALOGUE_LINE_TAG and element.getparent() is self.root
+
+    def __iter__(self):
+        assert self.root is not None, "read_header() must be called first"
+        if self._first_line is None:
+            return
+        for event, element in self._events:
+            if event != "end" or not self._is_line(element):
+                continue
+            yield element
+            element.clear()
+            # Drop the processed lines (and the header) from the tree
+            while element.getprevious() is not None:
+                del self.root[0]
+
+
 class ProductImport(models.TransientModel):
     _inherit = "product.import"
 
@@ -101,7 +159,6 @@ class ProductImport(models.TransientModel):
         # Empty namespace prefix is not supported in XPath
         ns["main"] = ns.pop(None)
         assert ns["main"] == CATALOGUE_NS
-        doc_type = "catalogue"
         document = "Catalogue"
         root_name = f"main:{document}"
         line_name = f"cac:{document}Line"
@@ -114,22 +171,78 @@ class ProductImport(models.TransientModel):
             xml_string, document, version=ubl._ubl_get_version(xml_root, root_name, ns)
         )
         # Parse content
+        res = self.parse_ubl_catalogue_header(xml_root, ns)
+        xroot = XPathGetter(xml_root, ns)
+        res["products"] = [
+            self.parse_ubl_catalogue_line(line, ns)
+            for line in xroot.xpath(f"/{root_name}/{line_name}")
+        ]
+        return res
+
+    @api.model
+    def parse_ubl_catalogue_header(self, xml_root, ns):
+        ubl = self.env["base.ubl"]
+        root_name = "main:Catalogue"
         xroot = XPathGetter(xml_root, ns)
         company_xpath = xroot.get(f"/{root_name}/cac:ReceiverParty")
         company_dict = ubl.ubl_parse_party(company_xpath, ns)
         supplier_xpath = xroot.get(f"/{root_name}/cac:SellerSupplierParty")
         supplier_dict = ubl.ubl_parse_supplier_party(supplier_xpath, ns)
-
-        res_lines = [
-            self.parse_ubl_catalogue_line(line, ns)
-            for line in xroot.xpath(f"/{root_name}/{line_name}")
-        ]
-        res = {
-            "doc_type": doc_type,
+        return {
+            "doc_type": "catalogue",
             "date": xroot.text(f"/{root_name}/cbc:IssueDate"),
             "ref": xroot.text(f"/{root_name}/cbc:ID"),
             "company": company_dict,
             "seller": supplier_dict,
-            "products": res_lines,
         }
-        return res
+
+    @api.model
+    def _ubl_stream_huge_tree(self):
+        # Lift the limits of libxml2 (eg: on the depth of the tree, the size
+        # of the text nodes) only when allowed with the server option
+        return str2bool(str(config.get("product_import_ubl_huge_tree", False)))
+
+    @api.model
+    def _ubl_open_stream(self, source):
+        """Return the stream of the catalogue with its header read,
+        or None if the file isn't a UBL catalogue"""
+        stream = UBLCatalogueStream(
+            BytesIO(source) if isinstance(source, bytes) else source,
+            huge_tree=self._ubl_stream_huge_tree(),
+        )
+        try:
+            xml_root = stream.read_header()
+        except etree.XMLSyntaxError:
+            xml_root = None
+        if xml_root is None and hasattr(source, "seek"):
+            # Give the file from its start to the other formats
+            source.seek(0)
+        return stream if xml_root is not None else None
+
+    @api.model
+    def _check_stream_file(self, filename, source):
+        stream = self._ubl_open_stream(source)
+        if stream is None:
+            return super()._check_stream_file(filename, source)
+        ubl = self.env["base.ubl"]
+        version = ubl._ubl_get_version(stream.root, "main:Catalogue", stream.ns)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        # Validated while reading the file again, without keeping the tree
+        return ubl._ubl_check_xml_schema_stream(
+            BytesIO(source) if isinstance(source, bytes) else source,
+            "Catalogue",
+            version=version,
+            huge_tree=self._ubl_stream_huge_tree(),
+        )
+
+    @api.model
+    def _stream_file(self, filename, source):
+        stream = self._ubl_open_stream(source)
+        if stream is None:
+            return super()._stream_file(filename, source)
+        # NOTE: the file is validated against the XSD schema by
+        # `_check_stream_file`, before the import job reads it.
+        catalogue = self.parse_ubl_catalogue_header(stream.root, stream.ns)
+        products = (self.parse_ubl_catalogue_line(line, stream.ns) for line in stream)
+        return catalogue, products
@@ -8,6 +8,8 @@ from lxml import etree
 
 from odoo import api, fields, models
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 
@@ -189,7 +191,7 @@ class PurchaseOrder(models.Model):
             self.id,
             self.state,
         )
-        logger.debug(xml_string)
+        logger.debug("%s", LazyLogPayload(xml_string))
         return xml_string
 
     def get_ubl_xml_etree(self, doc_type, version="2.1"):
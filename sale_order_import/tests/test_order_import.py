@@ -65,3 +65,33 @@ class TestOrderImport(TestCommon):
             sale_order_import__default_vals=dict(order=default)
         ).create_order(self.parsed_order, "pricelist")
         self.assertEqual(order.client_order_ref, "OVERRIDE")
+
+    def test_prepare_create_order_lines(self):
+        partner = self.env.ref("base.res_partner_2")
+        so_vals = self.env["sale.order"].play_onchanges(
+            {"partner_id": partner.id}, ["partner_id"]
+        )
+        uom = self.env.ref("uom.product_uom_unit")
+        products = self.env["product.product"].search(
+            [("default_code", "in", ("FURN_8888", "FURN_9999"))]
+        )
+        lines = [
+            (products[0], uom, {"qty": 2}),
+            (products[1], uom, {"qty": 1}),
+            (products[0], uom, {"qty": 5}),
+        ]
+        pricelist = self.env["product.pricelist"].browse(so_vals["pricelist_id"])
+        pricelist.discount_policy = "with_discount"
+        vals_list = self.wiz_model._prepare_create_order_lines(
+            lines, so_vals, "pricelist"
+        )
+        self.assertEqual(len(vals_list), 3)
+        for vals, (product, uom, import_line) in zip(vals_list, lines):
+            expected = self.wiz_model._prepare_create_order_line(
+                product, uom, so_vals, import_line, "pricelist"
+            )
+            self.assertEqual(vals["product_id"], product.id)
+            self.assertEqual(vals["product_uom_qty"], import_line["qty"])
+            self.assertAlmostEqual(vals["price_unit"], expected["price_unit"])
+            self.assertEqual(vals["name"], expected["name"])
+            self.assertEqual(set(vals["tax_id"][0][2]), set(expected["tax_id"][0][2]))
@@ -7,6 +7,7 @@
 import logging
 import mimetypes
 from base64 import b64decode, b64encode
+from collections import defaultdict
 
 from lxml import etree
 
@@ -15,6 +16,8 @@ from odoo.exceptions import UserError
 from odoo.osv.expression import AND
 from odoo.tools import config, float_compare, float_is_zero
 
+from odoo.addons.pdf_helper.utils import LazyLogPayload
+
 logger = logging.getLogger(__name__)
 
 
@@ -257,15 +260,23 @@ class SaleOrderImport(models.TransientModel):
             so_vals["partner_invoice_id"] = invoicing_partner.id
         if parsed_order.get("date"):
             so_vals["date_order"] = parsed_order["date"]
-        for line in parsed_order["lines"]:
-            # partner=False because we don't want to use product.supplierinfo
-            product = bdio._match_product(
-                line["product"], parsed_order["chatter_msg"], seller=False
-            )
-            uom = bdio._match_uom(line.get("uom"), parsed_order["chatter_msg"], product)
-            line_vals = self._prepare_create_order_line(
-                product, uom, so_vals, line, price_source
+        # Resolve all the products at once (memoized for the whole import).
+        # seller=False because we don't want to use product.supplierinfo
+        bdio = bdio._with_match_memo()
+        products = bdio._match_products(
+            [line["product"] for line in parsed_order["lines"]],
+            parsed_order["chatter_msg"],
+            seller=False,
+        )
+        lines = [
+            (
+                product,
+                bdio._match_uom(line.get("uom"), parsed_order["chatter_msg"], product),
+                line,
             )
+            for product, line in zip(products, parsed_order["lines"])
+        ]
+        for line_vals in self._prepare_create_order_lines(lines, so_vals, price_source):
             so_vals["order_line"].append((0, 0, line_vals))
 
         defaults = self.env.context.get("sale_order_import__default_vals", {}).get(
@@ -335,7 +346,7 @@ class SaleOrderImport(models.TransientModel):
     @api.model
     def parse_order(self, order_file, order_filename, partner=False):
         parsed_order = self._parse_file(order_filename, order_file)
-        logger.debug("Result of order parsing: %s", parsed_order)
+        logger.debug("Result of order parsing: %s", LazyLogPayload(parsed_order))
         defaults = (
             ("attachments", {}),
             ("chatter_msg", []),
@@ -489,6 +500,128 @@ class SaleOrderImport(models.TransientModel):
         vals.update(defaults)
         return vals
 
+    @api.model
+    def _prepare_create_order_lines(self, lines, order, price_source):
+        """Batch version of `_prepare_create_order_line`.
+
+        With the pricelist as price source, instead of playing the onchanges
+        of each line, the prices of all the lines are computed with one call
+        to the pricelist (per UoM) and only the main defaults are set:
+        description, taxes and price.
+        Pricelists showing the discount to the customer still go through
+        the onchanges, line by line.
+
+        :param lines: list of (product, uom, import_line)
+        :param order: see `_prepare_create_order_line`
+        :return: list of order line values, in the order of lines
+        """
+        pricing = self._get_order_pricing(order)
+        pricelist = pricing["pricelist"]
+        if (
+            price_source != "pricelist"
+            or not pricelist
+            or pricelist.discount_policy != "with_discount"
+        ):
+            return [
+                self._prepare_create_order_line(
+                    product, uom, order, import_line, price_source
+                )
+                for product, uom, import_line in lines
+            ]
+        solo = self.env["sale.order.line"]
+        company = pricing["company"]
+        partner = pricing["partner"]
+        fpos = pricing["fiscal_position"]
+        prices = self._compute_order_lines_prices(lines, pricing)
+        products = (
+            self.env["product.product"]
+            .browse([product.id for product, __, __ in lines])
+            .with_context(lang=partner.lang, partner_id=partner.id)
+        )
+        defaults = self.env.context.get("sale_order_import__default_vals", {}).get(
+            "lines", {}
+        )
+        res = []
+        for product, (__, uom, import_line), price in zip(products, lines, prices):
+            product_taxes = product.taxes_id.filtered(
+                lambda tax: tax.company_id == company
+            )
+            taxes = fpos.map_tax(product_taxes, product, partner)
+            vals = {
+                "product_id": product.id,
+                "product_uom_qty": import_line["qty"],
+                "product_uom": uom.id,
+                "company_id": company.id,
+                "name": product.get_product_multiline_description_sale(),
+                "tax_id": [(6, 0, taxes.ids)],
+                "price_unit": self.env["account.tax"]._fix_tax_included_price_company(
+                    price, product_taxes, taxes, company
+                ),
+            }
+            for k, v in import_line.items():
+                if k not in vals and k in solo._fields:
+                    vals[k] = v
+            vals.update(defaults)
+            res.append(vals)
+        return res
+
+    def _get_order_pricing(self, order):
+        """Return what the prices of the lines depend on.
+
+        The 'order' arg can be a recordset or a dict,
+        see `_prepare_create_order_line`.
+        """
+        if isinstance(order, models.Model):
+            return {
+                "partner": order.partner_id,
+                "pricelist": order.pricelist_id,
+                "fiscal_position": order.fiscal_position_id,
+                "company": order.company_id,
+                "date": order.date_order,
+            }
+        partner = self.env["res.partner"].browse(order.get("partner_id"))
+        pricelist = self.env["product.pricelist"].browse(order.get("pricelist_id"))
+        return {
+            "partner": partner,
+            "pricelist": pricelist or partner.property_product_pricelist,
+            "fiscal_position": self.env["account.fiscal.position"].browse(
+                order.get("fiscal_position_id")
+            ),
+            "company": self.env["res.company"].browse(
+                self._prepare_order_line_get_company_id(order)
+            ),
+            "date": fields.Datetime.to_datetime(order.get("date_order"))
+            or fields.Datetime.now(),
+        }
+
+    def _compute_order_lines_prices(self, lines, pricing):
+        """Compute the pricelist prices of all the lines.
+
+        The pricelist is called once per UoM with all the (product, qty)
+        of the lines: a product appearing several times with the same UoM
+        is priced in another call.
+
+        :return: list of prices, in the order of lines
+        """
+        pricelist = pricing["pricelist"]
+        partner = pricing["partner"]
+        groups = defaultdict(list)
+        occurrences = defaultdict(int)
+        for index, (product, uom, import_line) in enumerate(lines):
+            occurrence = occurrences[(uom.id, product.id)]
+            occurrences[(uom.id, product.id)] += 1
+            groups[(uom.id, occurrence)].append((index, product, import_line["qty"]))
+        prices = [0.0] * len(lines)
+        for (uom_id, __), group in groups.items():
+            res = pricelist._compute_price_rule(
+                [(product, qty, partner) for __, product, qty in group],
+                date=pricing["date"],
+                uom_id=uom_id,
+            )
+            for index, product, __ in group:
+                prices[index] = res[product.id][0]
+        return prices
+
     def _prepare_order_line_get_company_id(self, order):
         company_id = self.env.company.id
         if isinstance(order, models.Model):
@@ -589,21 +722,22 @@ class SaleOrderImport(models.TransientModel):
             )
             compare_res["to_remove"].unlink()
         if compare_res["to_add"]:
-            to_create_label = []
-            for add in compare_res["to_add"]:
-                line_vals = self._prepare_create_order_line(
-                    add["product"], add["uom"], order, add["import_line"], price_source
-                )
+            vals_list = self._prepare_create_order_lines(
+                [
+                    (add["product"], add["uom"], add["import_line"])
+                    for add in compare_res["to_add"]
+                ],
+                order,
+                price_source,
+            )
+            for line_vals in vals_list:
                 line_vals["order_id"] = order.id
-                new_line = solo.create(line_vals)
-                to_create_label.append(
-                    "%s %s x %s"
-                    % (
-                        new_line.product_uom_qty,
-                        new_line.product_uom.name,
-                        new_line.name,
-                    )
-                )
+            new_lines = solo.create(vals_list)
+            to_create_label = [
+                "%s %s x %s"
+                % (new_line.product_uom_qty, new_line.product_uom.name, new_line.name)
+                for new_line in new_lines
+            ]
             chatter.append(
                 _("%d new order line(s) created: %s")
                 % (len(compare_res["to_add"]), ", ".join(to_create_label))